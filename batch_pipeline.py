@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Asynchrone Batch-Pipeline für generate_all_books.py (--pipeline).
+
+Statt jedes Buch vollständig nacheinander zu bauen (Titelbild, Karten, LaTeX-Vorlage, zwei
+xelatex-Läufe, Nachbearbeitung), laufen die Stufen mehrerer Bücher überlappend:
+
+    render  (Prozess-Pool)      Titelbild, Kartenseiten und LaTeX-Vorlage (matplotlib/Cairo, CPU)
+    latex   (Unterprozesse)     xelatex über asyncio.create_subprocess_exec
+    final   (Hauptprozess)      Titelbild einfügen, PDF verschieben, Manifest und Shard-Bericht
+
+Zwischen den Stufen liegen begrenzte Warteschlangen (asyncio.Queue mit maxsize): Ist xelatex
+langsamer als das Rendern, warten die Render-Worker, statt beliebig viele fertige Vorlagen
+anzuhäufen. Der Durchsatz nähert sich so der langsamsten Stufe.
+
+Jede Edition bekommt ein eigenes Kartenverzeichnis (output_maps/editions/<KENNZEICHEN>), weil die
+Kartenseiten aller Bücher sonst dieselben Dateinamen haben und das Rendern von Buch N+1 die
+Karten überschreiben würde, die xelatex für Buch N gerade einbindet.
+
+Die Render-Prozesse sammeln über viele Editionen Speicher an (Zwischenspeicher von matplotlib,
+PIL und Schriften). Jeder Render-Worker wird deshalb nach einer Anzahl Editionen durch einen
+neuen Prozess ersetzt, ebenso wenn ein Watchdog einen Arbeitsspeicher (RSS) über der Grenze misst.
+"""
+
+import os
+import io
+import time
+import shutil
+import asyncio
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import stage_timing
+from memory_guard import configure_image_slots, current_rss_mb
+
+# Stufen, die im Prozess-Pool laufen
+RENDER_STAGES = ["title", "maps", "tex"]
+
+EDITION_MAPS_DIR = os.path.join("output_maps", "editions")
+
+# Ein Render-Worker wird nach so vielen Editionen ersetzt
+DEFAULT_MAX_EDITIONS_PER_WORKER = 20
+
+# Abstand der Messungen des Watchdogs in Sekunden
+WATCHDOG_INTERVAL = 1.0
+
+
+def edition_map_dir(code):
+    """
+    Gibt das Kartenverzeichnis einer Edition zurück (relativ zum Arbeitsverzeichnis).
+    """
+    return os.path.join(EDITION_MAPS_DIR, code)
+
+
+def default_workers():
+    """
+    Teilt die Prozessorkerne auf Render-Worker und xelatex-Läufe auf (jeweils mindestens einer).
+
+    Returns:
+        tuple: (render_workers, latex_workers)
+    """
+    cpus = os.cpu_count() or 1
+    render_workers = max(1, (cpus + 1) // 2)
+    latex_workers = max(1, cpus - render_workers)
+    return render_workers, latex_workers
+
+
+def _init_render_worker(max_images):
+    """
+    Initialisiert einen Render-Prozess: Begrenzung der Seiten in voller Auflösung.
+    """
+    configure_image_slots(max_images)
+
+
+class RenderWorker:
+    """
+    Ein Render-Prozess (ProcessPoolExecutor mit einem Worker), der nach max_editions Editionen
+    oder bei zu viel Arbeitsspeicher durch einen neuen Prozess ersetzt wird.
+    """
+
+    def __init__(self, index, max_images=None):
+        self.index = index
+        self.max_images = max_images
+        self.executor = None
+        self.pid = None
+        self.editions = 0
+        self.busy = False
+        self.edition_peak_mb = 0.0
+        self.recycle_reason = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.executor = ProcessPoolExecutor(max_workers=1, initializer=_init_render_worker,
+                                            initargs=(self.max_images,))
+        self.pid = await loop.run_in_executor(self.executor, os.getpid)
+        self.editions = 0
+        self.recycle_reason = None
+
+    async def stop(self):
+        if self.executor is not None:
+            await asyncio.to_thread(self.executor.shutdown)
+            self.executor = None
+
+    async def restart(self, reason):
+        print(f"Ersetze Render-Worker {self.index} (PID {self.pid}): {reason}")
+        await self.stop()
+        await self.start()
+
+    def sample(self, max_rss_mb=None):
+        """
+        Misst den Arbeitsspeicher des Prozesses (Watchdog). Liegt er über max_rss_mb, wird der
+        Worker nach der laufenden Edition ersetzt.
+        """
+        rss = current_rss_mb(self.pid)
+        if rss is None:
+            return None
+        self.edition_peak_mb = max(self.edition_peak_mb, rss)
+        if max_rss_mb and rss > max_rss_mb and self.recycle_reason is None:
+            self.recycle_reason = f"{rss:.0f} MB Arbeitsspeicher (Grenze {max_rss_mb} MB)"
+            print(f"Watchdog: Render-Worker {self.index} belegt {self.recycle_reason}")
+        return rss
+
+
+async def _watchdog(workers, max_rss_mb, interval=WATCHDOG_INTERVAL):
+    """
+    Misst regelmäßig den Arbeitsspeicher der beschäftigten Render-Worker.
+    """
+    while True:
+        for worker in workers:
+            if worker.busy:
+                worker.sample(max_rss_mb)
+        await asyncio.sleep(interval)
+
+
+def render_book(code, stages, map_dir):
+    """
+    Rendert Titelbild, Karten und LaTeX-Vorlage eines Buchs (läuft in einem Worker-Prozess).
+    Die Ausgaben werden gesammelt, damit sich die Logs paralleler Bücher nicht vermischen.
+
+    Returns:
+        tuple: (Erfolg, Ausgabe des Workers)
+    """
+    import generate_kfz_maps_neu
+    from generate_all_books import create_title_image_for_code
+
+    output = io.StringIO()
+    success = False
+    with contextlib.redirect_stdout(output):
+        try:
+            stage_timing.configure(edition=code)
+            if "title" in stages:
+                print(f"Erstelle Titelbild für Kennzeichen {code}...")
+                title_path = create_title_image_for_code(code)
+                if not title_path or not os.path.exists(title_path):
+                    print(f"FEHLER: Titelbild für Kennzeichen {code} konnte nicht erstellt werden.")
+                    return False, output.getvalue()
+            book_stages = [stage for stage in stages if stage in ("maps", "tex")]
+            success = True
+            if book_stages:
+                success = generate_kfz_maps_neu.main(home_code=code, stages=book_stages, map_dir=map_dir)
+        except Exception:
+            traceback.print_exc(file=output)
+            success = False
+    return success, output.getvalue()
+
+
+async def compile_latex_async(tex_file, runs=2, edition=None):
+    """
+    Kompiliert ein LaTeX-Dokument wie compile_latex_document, aber ohne den Event-Loop zu blockieren.
+    Mit edition wird jeder Lauf in den Zeitmessungen der Edition aufgezeichnet.
+
+    Returns:
+        str: Pfad zum PDF oder None bei Fehler
+    """
+    if shutil.which("xelatex") is None:
+        print("WARNUNG: xelatex ist nicht installiert oder nicht im PATH. Das PDF kann nicht erstellt werden.")
+        return None
+
+    for run in range(runs):
+        start_time = time.time()
+        process = await asyncio.create_subprocess_exec(
+            "xelatex", "-interaction=nonstopmode", tex_file,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        if await process.wait() != 0:
+            print(f"Fehler beim Kompilieren von {tex_file} (Lauf {run + 1})")
+            return None
+        if edition:
+            stage_timing.record(edition, "xelatex", start_time, time.time() - start_time, run=run + 1)
+
+    pdf_file = tex_file.replace(".tex", ".pdf")
+    return pdf_file if os.path.exists(pdf_file) else None
+
+
+async def _run_workers(count, inbox, outbox, outbox_workers, handler):
+    """
+    Startet count Worker, die Aufträge aus inbox mit handler bearbeiten und das Ergebnis in outbox
+    legen (ohne outbox ist es die letzte Stufe). None beendet einen Worker; sind alle fertig,
+    erhält jeder nachfolgende Worker ein None.
+    """
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is None:
+                return
+            result = await handler(item)
+            if outbox is not None:
+                # put wartet, wenn die nächste Stufe voll ist (Gegendruck)
+                await outbox.put(result)
+
+    await asyncio.gather(*(worker() for _ in range(count)))
+    for _ in range(outbox_workers):
+        await outbox.put(None)
+
+
+async def run_pipeline(plan, on_done, render_workers=None, latex_workers=None, queue_size=2,
+                       max_editions_per_worker=DEFAULT_MAX_EDITIONS_PER_WORKER, max_worker_rss_mb=None,
+                       max_images=None):
+    """
+    Baut die Bücher des Plans überlappend (siehe Modulbeschreibung).
+
+    Args:
+        plan (dict): Kennzeichen -> {Stufe: Grund} (siehe generate_all_books.plan_builds)
+        on_done (callable): on_done(code, stages, success, map_dir) wird im Hauptprozess aufgerufen,
+                            sobald ein Buch fertig ist (Manifest, Shard-Bericht, Fortschritt)
+        render_workers (int, optional): Anzahl der Render-Prozesse (Standard: siehe default_workers)
+        latex_workers (int, optional): Anzahl der gleichzeitigen xelatex-Läufe
+        queue_size (int): Maximale Anzahl wartender Bücher zwischen zwei Stufen
+        max_editions_per_worker (int): Render-Worker nach so vielen Editionen ersetzen (0 = nie)
+        max_worker_rss_mb (float, optional): Render-Worker ersetzen, sobald sein Arbeitsspeicher
+                                             diese Grenze überschreitet
+        max_images (int, optional): Höchstens so viele Kartenseiten pro Render-Worker gleichzeitig
+                                    in voller Auflösung
+    """
+    from generate_kfz_maps_neu import load_config, process_pdf
+
+    default_render, default_latex = default_workers()
+    render_workers = render_workers or default_render
+    latex_workers = latex_workers or default_latex
+    print(f"Pipeline: {render_workers} Render-Worker, {latex_workers} xelatex-Worker, Warteschlangen mit {queue_size} Plätzen")
+
+    loop = asyncio.get_running_loop()
+    render_queue = asyncio.Queue()
+    latex_queue = asyncio.Queue(maxsize=queue_size)
+    final_queue = asyncio.Queue(maxsize=queue_size)
+
+    for code, stale in plan.items():
+        render_queue.put_nowait((code, list(stale), True))
+    for _ in range(render_workers):
+        render_queue.put_nowait(None)
+
+    workers = [RenderWorker(index + 1, max_images) for index in range(render_workers)]
+    idle_workers = asyncio.Queue()
+    for worker in workers:
+        await worker.start()
+        idle_workers.put_nowait(worker)
+    watchdog = asyncio.create_task(_watchdog(workers, max_worker_rss_mb))
+
+    try:
+        async def render(item):
+            code, stages, success = item
+            if not any(stage in stages for stage in RENDER_STAGES):
+                return code, stages, success
+
+            worker = await idle_workers.get()
+            worker.busy = True
+            worker.edition_peak_mb = 0.0
+            start = time.perf_counter()
+            try:
+                success, output = await loop.run_in_executor(worker.executor, render_book, code, stages,
+                                                             edition_map_dir(code))
+            except BrokenProcessPool:
+                # z.B. vom OOM-Killer beendet
+                success, output = False, "Der Render-Worker wurde unerwartet beendet."
+                worker.recycle_reason = "Prozess unerwartet beendet"
+            worker.sample(max_worker_rss_mb)
+            worker.busy = False
+            worker.editions += 1
+
+            if success:
+                print(f"{code}: gerendert in {time.perf_counter() - start:.1f} s "
+                      f"(Worker {worker.index}, bis zu {worker.edition_peak_mb:.0f} MB)")
+            else:
+                print(f"Fehler beim Rendern von {code}:\n{output[-2000:]}")
+
+            if worker.recycle_reason is None and max_editions_per_worker and worker.editions >= max_editions_per_worker:
+                worker.recycle_reason = f"nach {worker.editions} Editionen"
+            if worker.recycle_reason:
+                await worker.restart(worker.recycle_reason)
+            idle_workers.put_nowait(worker)
+            return code, stages, success
+
+        async def latex(item):
+            code, stages, success = item
+            if success and "pdf" in stages:
+                start = time.perf_counter()
+                tex_file = f"kfz_sammelbuch_{code}_printerfriendly.tex"
+                success = await compile_latex_async(tex_file, edition=code) is not None
+                if success:
+                    print(f"{code}: xelatex in {time.perf_counter() - start:.1f} s")
+            return code, stages, success
+
+        async def final(item):
+            code, stages, success = item
+            if success and "final" in stages:
+                pdf_file = f"kfz_sammelbuch_{code}_printerfriendly.pdf"
+                if os.path.exists(pdf_file):
+                    config = load_config()
+                    config['home'] = code
+                    final_pdf = f"kfz_sammelbuch_{code}_printerfriendly_final.pdf"
+                    start_time = time.time()
+                    await asyncio.to_thread(process_pdf, pdf_file, final_pdf, config, True)
+                    stage_timing.record(code, "pdf_postprocess", start_time, time.time() - start_time)
+                else:
+                    print(f"Fehler: PDF-Datei {pdf_file} wurde nicht gefunden.")
+                    success = False
+            on_done(code, stages, success, edition_map_dir(code))
+
+        await asyncio.gather(
+            _run_workers(render_workers, render_queue, latex_queue, latex_workers, render),
+            _run_workers(latex_workers, latex_queue, final_queue, 1, latex),
+            _run_workers(1, final_queue, None, 0, final),
+        )
+    finally:
+        watchdog.cancel()
+        for worker in workers:
+            await worker.stop()
+
+
+def build_all(plan, on_done, render_workers=None, latex_workers=None, queue_size=2,
+              max_editions_per_worker=DEFAULT_MAX_EDITIONS_PER_WORKER, max_worker_rss_mb=None, max_images=None):
+    """
+    Synchroner Einstiegspunkt für generate_all_books.main.
+    """
+    asyncio.run(run_pipeline(plan, on_done, render_workers, latex_workers, queue_size,
+                             max_editions_per_worker, max_worker_rss_mb, max_images))
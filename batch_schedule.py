@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kostenmodell und Reihenfolge für Batch-Builds (generate_all_books.py).
+
+Die Editionen sind unterschiedlich teuer: große Home-Regionen, Kennzeichen auf mehreren
+Kartenseiten oder in mehreren Regionen bedeuten mehr Infoboxen und größere Karten. Werden die
+Bücher in CSV-Reihenfolge gebaut, bleibt am Ende oft ein einzelnes teures Buch übrig. Deshalb
+werden die Kosten jeder Edition aus den Zeitmessungen früherer Läufe (timings/<KENNZEICHEN>.jsonl,
+siehe stage_timing.py) geschätzt und die teuersten Bücher zuerst gestartet (longest job first).
+Dieselben Schätzungen liefern die Restzeit im Fortschrittsbalken.
+"""
+
+import time
+
+from build_manifest import STAGES
+
+# Oberste Stufen der Zeitmessung, die zu einer Stufe des Builds gehören
+TIMING_STAGES = {
+    "title": ["title_image"],
+    "maps": ["maps"],
+    "tex": ["latex"],
+    "pdf": ["xelatex"],
+    "final": ["pdf_postprocess"],
+}
+
+# Laden von Shapefile und Kennzeichen, fällt im sequentiellen Build für jedes Buch an, in der
+# Pipeline nur einmal pro Render-Worker
+LOAD_STAGES = ["shapefile_load", "code_extraction"]
+
+# Schätzung in Sekunden, solange es für eine Stufe noch keine Zeitmessungen gibt
+# (Größenordnung aus den Benchmarks mit dem synthetischen Datensatz)
+DEFAULT_STAGE_SECONDS = {"load": 1.0, "title": 5.0, "maps": 30.0, "tex": 2.0, "pdf": 20.0, "final": 1.0}
+
+
+def edition_stage_costs(records):
+    """
+    Bestimmt für jede Edition die zuletzt gemessene Dauer jeder Stufe.
+    Eine Stufe kann mehrere Einträge haben (z.B. zwei xelatex-Läufe); gezählt werden alle
+    Einträge des Prozesses, der die Stufe zuletzt ausgeführt hat.
+
+    Returns:
+        dict: Edition -> {Stufe (aus STAGES oder "load"): Sekunden}
+    """
+    timing_to_stage = {name: stage for stage, names in TIMING_STAGES.items() for name in names}
+    timing_to_stage.update({name: "load" for name in LOAD_STAGES})
+
+    # (Edition, Stufe) -> Prozess -> (Name, Lauf) -> (Start, Sekunden)
+    runs = {}
+    for record in records:
+        if record.get("parent") is not None or not record.get("ok", True):
+            continue
+        stage = timing_to_stage.get(record.get("stage"))
+        edition = record.get("edition")
+        if stage is None or not edition:
+            continue
+        entries = runs.setdefault((edition, stage), {}).setdefault(record.get("pid"), {})
+        name = (record["stage"], str((record.get("meta") or {}).get("run")))
+        start = record.get("start") or 0
+        if name not in entries or start > entries[name][0]:
+            entries[name] = (start, record["wall_s"])
+
+    costs = {}
+    for (edition, stage), by_pid in runs.items():
+        latest = max(by_pid.values(), key=lambda entries: max(start for start, _ in entries.values()))
+        costs.setdefault(edition, {})[stage] = sum(wall for _, wall in latest.values())
+    return costs
+
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def _stage_medians(history):
+    """
+    Median jeder Stufe über alle Editionen (ohne Messung DEFAULT_STAGE_SECONDS).
+    """
+    medians = {}
+    for stage in ["load"] + STAGES:
+        median = _median([stages[stage] for stages in history.values() if stage in stages])
+        medians[stage] = median if median is not None else DEFAULT_STAGE_SECONDS[stage]
+    return medians
+
+
+def load_seconds(records):
+    """
+    Schätzt die Dauer, Shapefile und Kennzeichen einmal zu laden.
+    """
+    return _stage_medians(edition_stage_costs(records))["load"]
+
+
+def estimate_costs(plan, records, per_book_load=True):
+    """
+    Schätzt die Kosten jedes Buchs im Plan als Summe seiner veralteten Stufen.
+    Für Stufen ohne eigene Messung der Edition wird der Median aller Editionen verwendet,
+    ohne jede Messung DEFAULT_STAGE_SECONDS.
+
+    Args:
+        plan (dict): Kennzeichen -> {Stufe: Grund} (siehe generate_all_books.plan_builds)
+        records (list): Zeitmessungen (siehe stage_timing.load_records)
+        per_book_load (bool): Das Laden zu jedem Buch zählen (sequentieller Build). In der Pipeline
+                              lädt jeder Render-Worker nur einmal (siehe load_seconds).
+
+    Returns:
+        tuple: (Kennzeichen -> geschätzte Sekunden, Anzahl der Editionen mit eigener Messung)
+    """
+    history = edition_stage_costs(records)
+    medians = _stage_medians(history)
+    counted = ["load"] if per_book_load else []
+
+    costs = {}
+    measured = 0
+    for code, stale in plan.items():
+        known = history.get(code, {})
+        if known:
+            measured += 1
+        costs[code] = sum(known.get(stage, medians[stage]) for stage in counted + list(stale))
+    return costs, measured
+
+
+def order_longest_first(plan, costs):
+    """
+    Sortiert den Plan absteigend nach den geschätzten Kosten (bei gleichen Kosten stabil).
+    """
+    return dict(sorted(plan.items(), key=lambda item: -costs.get(item[0], 0.0)))
+
+
+def format_duration(seconds):
+    """
+    Formatiert eine Dauer als H:MM:SS bzw. M:SS.
+    """
+    seconds = max(0, int(round(seconds)))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class BatchEta:
+    """
+    Schätzt die Restzeit eines Batches aus den geschätzten Kosten der verbleibenden Bücher.
+    Sobald so viele Bücher fertig sind, wie Worker laufen, wird die Schätzung mit dem Verhältnis
+    aus tatsächlicher und geschätzter Zeit korrigiert (das auch die Parallelität der Worker
+    enthält). Vorher steckt der größte Teil der vergangenen Zeit in Büchern, die noch laufen, und
+    das Verhältnis wäre bis zu workers-mal zu hoch.
+
+    overhead (Sekunden) wird einmal zu Beginn eingerechnet, z.B. das Laden der Daten in jedem
+    Render-Worker der Pipeline.
+    """
+
+    def __init__(self, costs, workers=1, overhead=0.0):
+        self.costs = dict(costs)
+        self.workers = max(1, workers)
+        self.remaining = sum(self.costs.values())
+        self.overhead = overhead
+        self.done_estimate = 0.0
+        self.finished = 0
+        self.start = time.time()
+
+    def done(self, code, success=True):
+        """
+        Markiert ein Buch als fertig. Fehlgeschlagene Bücher zählen nicht zur erledigten Arbeit,
+        da sie meist weit vor ihren geschätzten Kosten abbrechen.
+        """
+        cost = self.costs.pop(code, 0.0)
+        self.remaining -= cost
+        if success:
+            self.done_estimate += cost
+            self.finished += 1
+
+    def eta_seconds(self):
+        elapsed = time.time() - self.start
+        if self.finished >= self.workers and self.done_estimate > 0:
+            return max(0.0, self.remaining * elapsed / self.done_estimate)
+        return max(0.0, self.overhead - elapsed) + self.remaining / self.workers
+
+    def describe(self):
+        return f"Restzeit ca. {format_duration(self.eta_seconds())}"
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vergleicht das Rendern der Kartenseiten nacheinander, in einem Thread-Pool und in
+mehreren Prozessen.
+
+Threads teilen sich die geladenen Daten (GeoDataFrame, Regionspfade, Hintergrundebenen)
+und bauen nur ihre eigene Figur auf. Prozesse werden mit fork gestartet und erben die
+Daten, zahlen aber für den Start und das Kopieren beim Schreiben. Gemessen wird die
+Gesamtzeit für alle Seiten eines Layouts.
+
+Beispiel:
+    python benchmarks/compare_map_workers.py --pages 20 --workers 2,4
+"""
+
+import os
+import time
+import argparse
+import statistics
+import multiprocessing
+
+from run_benchmarks import DEFAULT_WORKDIR, BenchmarkContext, ensure_dataset
+
+# Render-Funktion der aktuellen Messung, wird von den geforkten Prozessen geerbt
+_render = None
+
+
+def _render_chunk(chunk):
+    return _render(chunk)
+
+
+def render_pages_in_processes(render_pages, pages, processes=1):
+    """
+    Gegenstück zu map_creator.render_pages_in_threads mit einem Prozess-Pool (fork).
+    """
+    global _render
+    if not pages:
+        return []
+    processes = max(1, min(int(processes or 1), len(pages)))
+    if processes == 1:
+        return render_pages(pages)
+    _render = render_pages
+    chunks = [pages[i::processes] for i in range(processes)]
+    with multiprocessing.get_context("fork").Pool(processes) as pool:
+        results = pool.map(_render_chunk, chunks)
+    return sorted((item for result in results for item in result), key=lambda item: item[0])
+
+
+def run_layout(ctx, layout, mode, workers):
+    """
+    Rendert alle Seiten eines Layouts und gibt die Zeit in Sekunden zurück.
+    """
+    import map_creator
+
+    regular_codes, _, code_to_region, code_to_name, code_to_state, code_to_other_codes, _ = ctx.codes
+    page_codes = ctx.page_codes()
+    create = {
+        "home": map_creator.create_map_pages_for_home_printer,
+        "professional": map_creator.create_map_pages_for_professional_print,
+    }[layout]
+
+    # Für den Prozess-Modus wird die Verteilung der Seiten ausgetauscht, alles andere bleibt gleich
+    render_pages_in_threads = map_creator.render_pages_in_threads
+    if mode == "prozesse":
+        map_creator.render_pages_in_threads = render_pages_in_processes
+    try:
+        start = time.perf_counter()
+        create(ctx.gdf, page_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes,
+               ctx.config, threads=workers)
+        return time.perf_counter() - start
+    finally:
+        map_creator.render_pages_in_threads = render_pages_in_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kartenseiten mit Threads und Prozessen rendern und vergleichen")
+    parser.add_argument("--pages", type=int, default=20, help="Anzahl der Kartenseiten")
+    parser.add_argument("--workers", type=str, default="2,4", help="Kommagetrennte Anzahl von Threads bzw. Prozessen")
+    parser.add_argument("--layout", type=str, default="home,professional", help="Layouts: home, professional")
+    parser.add_argument("--repeat", type=int, default=1, help="Wiederholungen pro Messung, der Median zählt")
+    parser.add_argument("--regions", type=int, default=400, help="Anzahl der synthetischen Regionen")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für den synthetischen Datensatz")
+    parser.add_argument("--workdir", type=str, default=DEFAULT_WORKDIR, help="Arbeitsverzeichnis für Daten und Ausgaben")
+
+    args = parser.parse_args()
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("Dieses System unterstützt fork nicht, der Prozess-Modus wird übersprungen.")
+
+    workdir = os.path.abspath(args.workdir)
+    ensure_dataset(workdir, args.regions, args.seed)
+    os.chdir(workdir)
+
+    import stage_timing
+    stage_timing.configure(enabled=False)
+
+    ctx = BenchmarkContext(args.pages)
+    worker_counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    layouts = [l.strip() for l in args.layout.split(",") if l.strip()]
+
+    # Ein Durchlauf zum Aufwärmen (Pfade und Hintergrundebenen in cache/, Schriften)
+    for layout in layouts:
+        run_layout(ctx, layout, "nacheinander", 1)
+
+    rows = []
+    for layout in layouts:
+        runs = [("nacheinander", 1)]
+        for workers in worker_counts:
+            runs.append(("threads", workers))
+            if "fork" in multiprocessing.get_all_start_methods():
+                runs.append(("prozesse", workers))
+        for mode, workers in runs:
+            print(f"{layout}: {mode} mit {workers} Worker(n)...")
+            times = [run_layout(ctx, layout, mode, workers) for _ in range(max(1, args.repeat))]
+            rows.append((layout, mode, workers, statistics.median(times)))
+
+    print(f"\n{'Layout':<14}{'Modus':<14}{'Worker':>7}{'Gesamt s':>10}{'s/Seite':>9}{'Speedup':>9}")
+    sequential = {layout: t for layout, mode, _, t in rows if mode == "nacheinander"}
+    for layout, mode, workers, t in rows:
+        print(f"{layout:<14}{mode:<14}{workers:>7}{t:>10.2f}{t / args.pages:>9.3f}{sequential[layout] / t:>8.2f}x")
+    print(f"\nCPU-Kerne: {os.cpu_count()}")
+
+
+if __name__ == "__main__":
+    main()
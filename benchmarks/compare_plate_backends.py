@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vergleicht die beiden Backends von generate_license_plate.py: das Rastern der ganzen
+SVG-Vorlage mit cairosvg und das Setzen des Textes mit PIL und EuroPlate.ttf auf die
+vorgerasterte Vorlage.
+
+Gemessen werden die Zeit pro Kennzeichen und die Abweichung der Bilder (mittlere
+Differenz der Kanäle und Anteil der Pixel, die sich um mehr als --tolerance unterscheiden).
+Liegt dieser Anteil über --max-diff, endet das Skript mit Fehlercode 1.
+
+Beispiel:
+    python benchmarks/compare_plate_backends.py --codes HH,M,NWP,BÖ --height 190
+"""
+
+import os
+import io
+import sys
+import time
+import argparse
+import statistics
+from contextlib import redirect_stdout
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+DEFAULT_CODES = "A,B,M,HH,BÖ,KA,NWP,MYK,WAF,LDS"
+
+
+def render_svg(code, height, workdir):
+    """
+    Rendert ein Kennzeichen mit dem SVG-Backend und gibt das Bild als RGBA zurück.
+    """
+    from PIL import Image
+    from generate_license_plate import generate_license_plate
+
+    output_path = os.path.join(workdir, f"svg_{code}.png")
+    with redirect_stdout(io.StringIO()):
+        generate_license_plate(code, output_path=output_path, height=height)
+    with Image.open(output_path) as image:
+        return image.convert("RGBA")
+
+
+def pixel_diff(a, b, tolerance):
+    """
+    Gibt (mittlere Differenz 0..255, Anteil der Pixel mit einer Differenz über tolerance) zurück.
+    """
+    import numpy as np
+
+    if a.size != b.size:
+        b = b.resize(a.size)
+    diff = np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16))
+    return float(diff.mean()), float((diff.max(axis=2) > tolerance).mean())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SVG- und Schrift-Backend der Kennzeichen vergleichen")
+    parser.add_argument("--codes", type=str, default=DEFAULT_CODES, help="Kommagetrennte Kennzeichen")
+    parser.add_argument("--height", type=int, default=190, help="Höhe der Bilder in Pixeln")
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen pro Kennzeichen, der Median zählt")
+    parser.add_argument("--tolerance", type=int, default=64, help="Differenz eines Kanals, ab der ein Pixel abweicht")
+    parser.add_argument("--max-diff", type=float, default=0.02, help="Erlaubter Anteil abweichender Pixel")
+    parser.add_argument("--workdir", type=str, default=os.path.join(REPO_DIR, "benchmarks", "workdir", "plates"),
+                        help="Verzeichnis für die Bilder")
+
+    args = parser.parse_args()
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(REPO_DIR)
+
+    from generate_license_plate import render_plate_image, plate_frame, plate_template_path
+
+    codes = [c.strip() for c in args.codes.split(",") if c.strip()]
+
+    # Die Vorlagen werden einmal gerastert, das zählt nicht zur Zeit pro Kennzeichen
+    for code in codes:
+        plate_frame(plate_template_path(code), args.height)
+
+    rows = []
+    for code in codes:
+        svg_times, font_times = [], []
+        for _ in range(max(1, args.repeat)):
+            start = time.perf_counter()
+            svg_image = render_svg(code, args.height, args.workdir)
+            svg_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            font_image = render_plate_image(code, args.height)
+            font_times.append(time.perf_counter() - start)
+        font_image.save(os.path.join(args.workdir, f"font_{code}.png"))
+        mean_diff, share = pixel_diff(svg_image, font_image, args.tolerance)
+        rows.append((code, statistics.median(svg_times), statistics.median(font_times), mean_diff, share))
+
+    print(f"\n{'Kennzeichen':<12}{'svg ms':>9}{'font ms':>9}{'Speedup':>9}{'mittl. Diff':>12}{'abweichend':>12}")
+    failed = []
+    for code, svg_t, font_t, mean_diff, share in rows:
+        print(f"{code:<12}{svg_t * 1000:>9.1f}{font_t * 1000:>9.2f}{svg_t / font_t:>8.0f}x{mean_diff:>12.2f}{share:>11.2%}")
+        if share > args.max_diff:
+            failed.append(code)
+
+    print(f"\nBilder in {args.workdir}")
+    if failed:
+        print(f"Mehr als {args.max_diff:.1%} abweichende Pixel: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
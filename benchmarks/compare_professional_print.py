@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Vergleicht das professionelle A3-Drucklayout mit Vektor-Hintergrund und im Hybrid-Modus
+(gerasterter Hintergrund, Regionen und Labels als Vektoren).
+
+Pro Seite werden die Renderzeit, die Dateigröße des Seiten-PDFs und der Anteil der darin
+eingebetteten Rasterbilder gemessen. Im Hybrid-Modus trägt jedes Seiten-PDF eine eigene Kopie
+des Hintergrunds; ein Buch mit n Seiten enthält ihn also n-mal. Wenn xelatex verfügbar ist, wird
+zusätzlich ein Dokument kompiliert, das alle Seiten einbindet.
+
+Beispiel:
+    python benchmarks/compare_professional_print.py --pages 3
+"""
+
+import os
+import time
+import shutil
+import argparse
+import subprocess
+import statistics
+
+from run_benchmarks import DEFAULT_WORKDIR, BenchmarkContext, ensure_dataset
+
+LATEX_TEMPLATE = r"""\documentclass{article}
+\usepackage[paperwidth=420mm,paperheight=297mm,margin=0mm]{geometry}
+\usepackage{graphicx}
+\begin{document}
+%s
+\end{document}
+"""
+
+
+def render_pages(ctx, hybrid, target_dir):
+    """
+    Rendert die Seiten in einem Modus und verschiebt sie nach target_dir.
+
+    Returns:
+        tuple: (Renderzeit pro Seite in s, Liste der Seiten-PDFs)
+    """
+    import map_creator
+
+    regular_codes, _, code_to_region, code_to_name, code_to_state, code_to_other_codes, _ = ctx.codes
+    page_codes = ctx.page_codes()
+
+    os.makedirs(target_dir, exist_ok=True)
+    page_times = []
+    paths = []
+    for page in range(ctx.map_pages):
+        codes = page_codes[page * map_creator.CODES_PER_PAGE:(page + 1) * map_creator.CODES_PER_PAGE]
+        start = time.perf_counter()
+        map_creator.create_map_pages_for_professional_print(ctx.gdf, codes, code_to_region, code_to_name,
+                                                            code_to_state, code_to_other_codes, ctx.config,
+                                                            hybrid=hybrid)
+        page_times.append(time.perf_counter() - start)
+        target = os.path.join(target_dir, f"seite_{page + 1:02d}.pdf")
+        shutil.move(os.path.join(map_creator.OUTPUT_DIR, "kfz_professional_print_seite_01.pdf"), target)
+        paths.append(target)
+    return page_times, paths
+
+
+def image_bytes(pdf_path):
+    """
+    Gibt die Größe der in einem PDF eingebetteten Rasterbilder (mit Alphamasken) in Bytes zurück.
+    """
+    from PyPDF2 import PdfReader
+
+    total = 0
+    for page in PdfReader(pdf_path).pages:
+        xobjects = page["/Resources"].get("/XObject", {})
+        xobjects = xobjects.get_object() if xobjects else {}
+        for ref in xobjects.values():
+            xobject = ref.get_object()
+            if xobject.get("/Subtype") != "/Image":
+                continue
+            total += len(xobject._data)
+            if "/SMask" in xobject:
+                total += len(xobject["/SMask"].get_object()._data)
+    return total
+
+
+def compile_time(pdf_paths, target_dir):
+    """
+    Kompiliert ein LaTeX-Dokument, das alle Seiten einbindet, und gibt die Zeit zurück.
+    Gibt None zurück, wenn xelatex nicht verfügbar ist.
+    """
+    if not shutil.which("xelatex"):
+        return None
+    body = "\n".join(r"\noindent\includegraphics[width=420mm,height=297mm]{%s}\newpage" % os.path.basename(p)
+                     for p in pdf_paths)
+    tex_path = os.path.join(target_dir, "seiten.tex")
+    with open(tex_path, "w", encoding="utf-8") as f:
+        f.write(LATEX_TEMPLATE % body)
+    start = time.perf_counter()
+    result = subprocess.run(["xelatex", "-interaction=nonstopmode", "seiten.tex"], cwd=target_dir,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(f"xelatex fehlgeschlagen in {target_dir}")
+        return None
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vektor- und Hybrid-Modus des A3-Drucklayouts vergleichen")
+    parser.add_argument("--pages", type=int, default=3, help="Anzahl der Seiten")
+    parser.add_argument("--regions", type=int, default=400, help="Anzahl der synthetischen Regionen")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für den synthetischen Datensatz")
+    parser.add_argument("--workdir", type=str, default=DEFAULT_WORKDIR, help="Arbeitsverzeichnis für Daten und Ausgaben")
+
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    ensure_dataset(workdir, args.regions, args.seed)
+    os.chdir(workdir)
+
+    import stage_timing
+    stage_timing.configure(enabled=False)
+
+    ctx = BenchmarkContext(args.pages)
+    results = {}
+    for mode, hybrid in (("vektor", False), ("hybrid", True)):
+        target_dir = os.path.join(workdir, "professional_print", mode)
+        shutil.rmtree(target_dir, ignore_errors=True)
+        # Die Rasterbilder werden einmal pro Lauf erzeugt und zählen nicht zur Seite
+        if hybrid:
+            import map_creator
+            start = time.perf_counter()
+            map_creator.render_background_rasters(map_creator.PAGE_WIDTH, map_creator.PAGE_HEIGHT)
+            print(f"Hintergrund gerastert in {time.perf_counter() - start:.2f} s (einmalig, danach aus cache/)")
+        print(f"Rendere {args.pages} Seite(n) im Modus {mode}...")
+        page_times, paths = render_pages(ctx, hybrid, target_dir)
+        sizes = [os.path.getsize(p) for p in paths]
+        results[mode] = {
+            "render_s": statistics.median(page_times),
+            "size_kb": statistics.mean(sizes) / 1024,
+            "image_kb": statistics.mean(image_bytes(p) for p in paths) / 1024,
+            "compile_s": compile_time(paths, target_dir),
+        }
+
+    print(f"\n{'Modus':<10}{'Rendern s/Seite':>17}{'Größe KB/Seite':>16}{'davon Raster KB':>17}{'xelatex s':>11}")
+    for mode, r in results.items():
+        compile_text = f"{r['compile_s']:.2f}" if r["compile_s"] is not None else "-"
+        print(f"{mode:<10}{r['render_s']:>17.2f}{r['size_kb']:>16.0f}{r['image_kb']:>17.0f}{compile_text:>11}")
+    vector, hybrid = results["vektor"], results["hybrid"]
+    print(f"\nHybrid gegenüber Vektor: Renderzeit {hybrid['render_s'] / vector['render_s'] - 1:+.0%}, "
+          f"Dateigröße {hybrid['size_kb'] / vector['size_kb'] - 1:+.0%}")
+    if vector["compile_s"] is None:
+        print("xelatex nicht gefunden, Kompilierzeit nicht gemessen.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prüft die Importzeit der Einstiegspunkte mit `python -X importtime`.
+Schwere Bibliotheken (geopandas, matplotlib, fiona, PyPDF2, PIL, reportlab, wordcloud)
+sollen erst in den Funktionen geladen werden, die sie brauchen. Kleine Aufgaben wie das
+Rendern eines Kennzeichens oder das Neuerzeugen der Rätsel starten dadurch deutlich
+unter einer Sekunde.
+
+Überschreitet ein Modul sein Budget, werden die teuersten Importe angezeigt und das
+Skript endet mit Fehlercode 1.
+
+Beispiel:
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --repeat 5 --top 10
+"""
+
+import os
+import sys
+import re
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Budget der kumulierten Importzeit pro Modul in Millisekunden
+IMPORT_BUDGETS_MS = {
+    "generate_license_plate": 150,
+    "generate_kfz_puzzles": 100,
+    "kfz_puzzle_generator": 100,
+    "generate_home_print_latex_template": 100,
+    "build_manifest": 50,
+    "stage_timing": 50,
+    "main": 100,
+    "generate_kfz_maps_neu": 300,
+    "generate_all_books": 300,
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module, python=sys.executable):
+    """
+    Importiert ein Modul in einem frischen Interpreter und wertet die Ausgabe von -X importtime aus.
+
+    Returns:
+        tuple: (kumulierte Zeit des Moduls in ms, Liste von (Modul, kumulierte ms) der direkten Importe)
+    """
+    result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Import von {module} fehlgeschlagen:\n{result.stderr.strip().splitlines()[-1]}")
+
+    total_ms = None
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us = int(match.group(2))
+        depth = len(match.group(3)) - 1
+        name = match.group(4)
+        entries.append((depth, name, cumulative_us / 1000))
+        if name == module and depth == 0:
+            total_ms = cumulative_us / 1000
+    if total_ms is None:
+        raise RuntimeError(f"Keine Importzeit für {module} gefunden")
+
+    # Die Importe unterhalb des Moduls stehen in der Ausgabe direkt davor und sind eine Ebene tiefer
+    index = max(i for i, (depth, name, _) in enumerate(entries) if depth == 0 and name == module)
+    children = []
+    for depth, name, ms in reversed(entries[:index]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children.append((name, ms))
+    return total_ms, sorted(children, key=lambda item: -item[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importzeit-Budget der Einstiegspunkte prüfen")
+    parser.add_argument("modules", nargs="*", help="Zu prüfende Module (Standard: alle mit Budget)")
+    parser.add_argument("--repeat", type=int, default=3, help="Messungen pro Modul, der schnellste Lauf zählt")
+    parser.add_argument("--top", type=int, default=5, help="Anzahl der teuersten Importe bei Überschreitung")
+
+    args = parser.parse_args()
+
+    modules = args.modules or list(IMPORT_BUDGETS_MS)
+    over_budget = []
+    print(f"{'Modul':<38}{'Import ms':>11}{'Budget ms':>11}")
+    for module in modules:
+        budget = IMPORT_BUDGETS_MS.get(module)
+        try:
+            runs = [measure_import(module) for _ in range(max(1, args.repeat))]
+        except RuntimeError as e:
+            print(f"{module:<38}{'Fehler':>11}")
+            print(f"  {e}")
+            over_budget.append(module)
+            continue
+        total_ms, children = min(runs, key=lambda run: run[0])
+        marker = ""
+        if budget is not None and total_ms > budget:
+            marker = "  ÜBER BUDGET"
+            over_budget.append(module)
+        budget_text = f"{budget}" if budget is not None else "-"
+        print(f"{module:<38}{total_ms:>11.1f}{budget_text:>11}{marker}")
+        if marker:
+            for name, ms in children[:args.top]:
+                print(f"    {name:<34}{ms:>11.1f}")
+
+    if over_budget:
+        print(f"\n{len(over_budget)} Modul(e) über dem Budget: {', '.join(over_budget)}")
+        sys.exit(1)
+    print("\nAlle Module innerhalb des Budgets.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark-Suite für die rechenintensiven Teile der Buch-Erstellung.
+Verwendet einen synthetischen Datensatz (siehe synthetic_data.py), damit Messungen
+ohne die externen Downloads reproduzierbar sind.
+
+Gemessen werden:
+    extract_kfz_codes, create_map_pages_for_home_printer, create_map_pages_for_professional_print,
+    create_title_image, generate_kfz_puzzles, finde_woerter_aus_kennzeichen,
+    generate_latex_template und process_pdf.
+
+Die Ergebnisse werden als JSON in benchmarks/results/ gespeichert und mit dem
+vorherigen Lauf (oder --baseline) verglichen, sodass Regressionen sichtbar werden.
+
+Beispiel:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --only extract_kfz_codes,map_pages_home --repeat 5
+"""
+
+import os
+import sys
+import gc
+import io
+import json
+import time
+import socket
+import argparse
+import platform
+import subprocess
+import statistics
+from contextlib import redirect_stdout
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_WORKDIR = os.path.join(BENCH_DIR, "workdir")
+DEFAULT_THRESHOLD = 0.10  # Ab 10 % langsamer gilt ein Benchmark als Regression
+
+sys.path.insert(0, REPO_DIR)
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+
+class BenchmarkContext:
+    """
+    Hält die geladenen Daten, die von mehreren Benchmarks verwendet werden.
+    Die Daten werden beim ersten Zugriff geladen und nicht mitgemessen.
+    """
+
+    def __init__(self, map_pages):
+        self.map_pages = map_pages
+        self._cache = {}
+
+    def _get(self, key, loader):
+        if key not in self._cache:
+            with redirect_stdout(io.StringIO()):
+                self._cache[key] = loader()
+        return self._cache[key]
+
+    @property
+    def gdf(self):
+        from generate_kfz_maps_neu import load_shapefile, SHAPEFILE_PATH
+        return self._get("gdf", lambda: load_shapefile(SHAPEFILE_PATH))
+
+    @property
+    def codes(self):
+        from generate_kfz_maps_neu import extract_kfz_codes
+        return self._get("codes", lambda: extract_kfz_codes(self.gdf))
+
+    @property
+    def title_data(self):
+        from create_title_image import load_shapefile, extract_codes_from_shapefile
+        from generate_kfz_maps_neu import SHAPEFILE_PATH
+
+        def load():
+            gdf = load_shapefile(SHAPEFILE_PATH)
+            return (gdf,) + tuple(extract_codes_from_shapefile(gdf))
+        return self._get("title_data", load)
+
+    @property
+    def home_code(self):
+        regular_codes = self.codes[0]
+        return regular_codes[len(regular_codes) // 2]
+
+    @property
+    def config(self):
+        return {"home": self.home_code, "version": "Benchmark"}
+
+    def page_codes(self):
+        from map_creator import CODES_PER_PAGE
+        return self.codes[0][:self.map_pages * CODES_PER_PAGE]
+
+
+def bench_extract_kfz_codes(ctx):
+    from generate_kfz_maps_neu import extract_kfz_codes
+    gdf = ctx.gdf
+    return lambda: extract_kfz_codes(gdf)
+
+
+def bench_map_pages_home(ctx):
+    from map_creator import create_map_pages_for_home_printer
+    regular_codes, _, code_to_region, code_to_name, code_to_state, code_to_other_codes, _ = ctx.codes
+    gdf, page_codes, config = ctx.gdf, ctx.page_codes(), ctx.config
+    return lambda: create_map_pages_for_home_printer(gdf, page_codes, code_to_region, code_to_name,
+                                                     code_to_state, code_to_other_codes, config)
+
+
+def bench_map_pages_professional(ctx):
+    from map_creator import create_map_pages_for_professional_print
+    regular_codes, _, code_to_region, code_to_name, code_to_state, code_to_other_codes, _ = ctx.codes
+    gdf, page_codes, config = ctx.gdf, ctx.page_codes(), ctx.config
+    return lambda: create_map_pages_for_professional_print(gdf, page_codes, code_to_region, code_to_name,
+                                                           code_to_state, code_to_other_codes, config)
+
+
+def bench_home_region_map(ctx):
+    from map_creator import create_home_region_map
+    _, _, code_to_region, code_to_name, _, _, _ = ctx.codes
+    gdf, config = ctx.gdf, ctx.config
+    return lambda: create_home_region_map(gdf, code_to_region, code_to_name, config)
+
+
+def bench_title_image(ctx):
+    from create_title_image import create_title_image
+    gdf, all_codes, code_to_region, code_to_geometry, region_to_codes = ctx.title_data
+    home_code = ctx.home_code
+    output_path = os.path.join("output_maps", f"kfz_titelbild_{home_code}.pdf")
+    os.makedirs("output_maps", exist_ok=True)
+    return lambda: create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_to_codes,
+                                      output_path, home_code)
+
+
+def bench_title_image_vector(ctx):
+    from create_title_image import create_title_image
+    gdf, all_codes, code_to_region, code_to_geometry, region_to_codes = ctx.title_data
+    home_code = ctx.home_code
+    output_path = os.path.join("output_maps", f"kfz_titelbild_{home_code}_vector.pdf")
+    os.makedirs("output_maps", exist_ok=True)
+    return lambda: create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_to_codes,
+                                      output_path, home_code, vector=True)
+
+
+def bench_generate_kfz_puzzles(ctx):
+    from generate_kfz_puzzles import generate_kfz_puzzles
+    regular_codes, _, _, code_to_name, _, _, _ = ctx.codes
+    return lambda: generate_kfz_puzzles(regular_codes, code_to_name)
+
+
+def bench_finde_woerter(ctx):
+    from kfz_puzzle_generator import finde_woerter_aus_kennzeichen
+    regular_codes, _, _, code_to_name, _, _, _ = ctx.codes
+    return lambda: finde_woerter_aus_kennzeichen(regular_codes, code_to_name)
+
+
+def bench_generate_latex_template(ctx):
+    from generate_home_print_latex_template import generate_latex_template
+    (regular_codes, rare_codes, code_to_region, code_to_name, code_to_state,
+     code_to_other_codes, code_to_name_multi) = ctx.codes
+    gdf, config = ctx.gdf, ctx.config
+    return lambda: generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_state,
+                                           code_to_other_codes, gdf, code_to_region, code_to_name_multi,
+                                           config, output_file="benchmark.tex")
+
+
+def _write_dummy_pdf(path, pages):
+    """
+    Erstellt ein einfaches mehrseitiges PDF als Eingabe für process_pdf.
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
+    c = canvas.Canvas(path, pagesize=A4)
+    for page in range(pages):
+        c.setFont("Helvetica", 12)
+        for line in range(60):
+            c.drawString(40, 800 - line * 12, f"Seite {page + 1}, Zeile {line + 1}: Kennzeichen zum Ankreuzen")
+        c.showPage()
+    c.save()
+
+
+def bench_process_pdf(ctx):
+    from generate_kfz_maps_neu import process_pdf
+    config = ctx.config
+    _write_dummy_pdf("benchmark_input.pdf", 48)
+    os.makedirs("output_maps", exist_ok=True)
+    title_path = os.path.join("output_maps", f"kfz_titelbild_{config['home']}.pdf")
+    if not os.path.exists(title_path):
+        _write_dummy_pdf(title_path, 1)
+    return lambda: process_pdf("benchmark_input.pdf", "benchmark_final.pdf", config, home_printer=False)
+
+
+BENCHMARKS = {
+    "extract_kfz_codes": bench_extract_kfz_codes,
+    "map_pages_home": bench_map_pages_home,
+    "map_pages_professional": bench_map_pages_professional,
+    "home_region_map": bench_home_region_map,
+    "title_image": bench_title_image,
+    "title_image_vector": bench_title_image_vector,
+    "generate_kfz_puzzles": bench_generate_kfz_puzzles,
+    "finde_woerter_aus_kennzeichen": bench_finde_woerter,
+    "generate_latex_template": bench_generate_latex_template,
+    "process_pdf": bench_process_pdf,
+}
+
+
+def ensure_dataset(workdir, regions, seed):
+    """
+    Erzeugt den synthetischen Datensatz im Arbeitsverzeichnis, falls er noch nicht existiert
+    oder mit anderen Parametern erzeugt wurde.
+    """
+    from synthetic_data import DATASET_VERSION, generate_dataset
+
+    stamp_path = os.path.join(workdir, "dataset.json")
+    params = {"regions": regions, "seed": seed, "version": DATASET_VERSION}
+    if os.path.exists(stamp_path):
+        with open(stamp_path, "r", encoding="utf-8") as f:
+            stamp = json.load(f)
+        if stamp.get("params") == params:
+            return stamp["stats"]
+
+    print(f"Erzeuge synthetischen Datensatz in {workdir} ({regions} Regionen, Seed {seed})...")
+    os.makedirs(workdir, exist_ok=True)
+    stats = generate_dataset(workdir, regions, seed)
+    with open(stamp_path, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "stats": stats}, f, indent=2)
+    return stats
+
+
+def run_benchmark(name, factory, ctx, repeat, verbose=False):
+    """
+    Führt einen Benchmark repeat-mal aus und gibt die Laufzeiten in Sekunden zurück.
+    """
+    out = sys.stdout if verbose else io.StringIO()
+    with redirect_stdout(out):
+        func = factory(ctx)
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        with redirect_stdout(out):
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+        if not verbose:
+            out.seek(0)
+            out.truncate()
+    return runs
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def latest_result(exclude=None):
+    """
+    Gibt den Pfad des neuesten gespeicherten Ergebnisses zurück (außer exclude).
+    """
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith(".json"))
+    files = [os.path.join(RESULTS_DIR, f) for f in files]
+    files = [f for f in files if exclude is None or os.path.abspath(f) != os.path.abspath(exclude)]
+    return files[-1] if files else None
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Vergleicht zwei Ergebnisse anhand des Medians und gibt die Regressionen zurück.
+    """
+    print(f"\nVergleich mit {baseline.get('timestamp')} (Commit {baseline.get('git_commit')}):")
+    if current.get("params") != baseline.get("params"):
+        print(f"  Achtung: unterschiedliche Parameter {baseline.get('params')} -> {current.get('params')}")
+    regressions = []
+    print(f"{'Benchmark':<32}{'vorher s':>10}{'jetzt s':>10}{'Änderung':>10}")
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            print(f"{name:<32}{'-':>10}{result['median_s']:>10.3f}{'neu':>10}")
+            continue
+        change = result["median_s"] / before["median_s"] - 1 if before["median_s"] else 0.0
+        marker = ""
+        if change > threshold:
+            marker = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<32}{before['median_s']:>10.3f}{result['median_s']:>10.3f}{change:>+10.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks mit synthetischen Geodaten")
+    parser.add_argument("--only", type=str, help=f"Kommagetrennte Auswahl aus: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Anzahl der Wiederholungen pro Benchmark")
+    parser.add_argument("--map-pages", type=int, default=3, help="Anzahl der Kartenseiten pro Karten-Benchmark")
+    parser.add_argument("--regions", type=int, default=400, help="Anzahl der synthetischen Regionen")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für den synthetischen Datensatz")
+    parser.add_argument("--workdir", type=str, default=DEFAULT_WORKDIR, help="Arbeitsverzeichnis für Daten und Ausgaben")
+    parser.add_argument("--baseline", type=str, help="Ergebnisdatei, mit der verglichen wird (Standard: letzter Lauf)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Schwelle für Regressionen (0.1 = 10 %%)")
+    parser.add_argument("--no-save", action="store_true", help="Ergebnis nicht speichern")
+    parser.add_argument("--verbose", action="store_true", help="Ausgaben der gemessenen Funktionen anzeigen")
+
+    args = parser.parse_args()
+
+    names = list(BENCHMARKS)
+    if args.only:
+        names = [name.strip() for name in args.only.split(",") if name.strip()]
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            parser.error(f"Unbekannte Benchmarks: {', '.join(unknown)}")
+
+    workdir = os.path.abspath(args.workdir)
+    dataset_stats = ensure_dataset(workdir, args.regions, args.seed)
+    os.chdir(workdir)
+
+    import stage_timing
+    stage_timing.configure(enabled=False)
+
+    ctx = BenchmarkContext(args.map_pages)
+    results = {}
+    for name in names:
+        print(f"Benchmark {name}...", end=" ", flush=True)
+        runs = run_benchmark(name, BENCHMARKS[name], ctx, args.repeat, args.verbose)
+        results[name] = {
+            "runs_s": [round(r, 4) for r in runs],
+            "min_s": min(runs),
+            "median_s": statistics.median(runs),
+            "mean_s": statistics.mean(runs),
+        }
+        if name.startswith("map_pages"):
+            results[name]["per_page_s"] = statistics.median(runs) / args.map_pages
+        print(f"Median {results[name]['median_s']:.3f} s (min {results[name]['min_s']:.3f} s)")
+
+    current = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "git_commit": _git_commit(),
+        "params": {"regions": args.regions, "seed": args.seed, "map_pages": args.map_pages, "repeat": args.repeat},
+        "dataset": dataset_stats,
+        "results": results,
+    }
+
+    result_path = None
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        result_path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{current['host']}.json")
+        with open(result_path, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\nErgebnis gespeichert: {result_path}")
+
+    baseline_path = args.baseline or latest_result(exclude=result_path)
+    regressions = []
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(current, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} Regression(en): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Erzeugt synthetische Geodaten für Benchmarks.
+Das echte KFZ250-Shapefile und die CSV-Dateien sind externe Downloads. Dieses Skript
+erzeugt reproduzierbar (fester Seed) Ersatzdaten mit realistischen Mengen:
+ca. 400 Regionen in EPSG:25832 innerhalb der Ausdehnung Deutschlands, mehrere
+Kennzeichen pro Region, beide CSV-Dateien und die Hintergrund-Shapefiles in basisdaten/.
+"""
+
+import os
+import random
+import string
+import argparse
+
+import numpy as np
+import geopandas as gpd
+from shapely import segmentize
+from shapely.affinity import scale, translate
+from shapely.geometry import Point, MultiPoint, MultiPolygon, Polygon
+from shapely.ops import voronoi_diagram, unary_union
+
+# Ausdehnung Deutschlands in EPSG:25832 (ungefähr)
+GERMANY_CENTER = (600000, 5650000)
+GERMANY_RADIUS_X = 310000
+GERMANY_RADIUS_Y = 430000
+
+BUNDESLAENDER = [
+    "Baden-Württemberg", "Bayern", "Berlin", "Brandenburg", "Bremen", "Hamburg", "Hessen",
+    "Mecklenburg-Vorpommern", "Niedersachsen", "Nordrhein-Westfalen", "Rheinland-Pfalz",
+    "Saarland", "Sachsen", "Sachsen-Anhalt", "Schleswig-Holstein", "Thüringen",
+]
+
+SHAPEFILE_RELPATH = os.path.join("kfz250.utm32s.shape", "kfz250", "KFZ250.shp")
+CSV_RELPATH = "kfz-kennz-d.csv"
+CSV_OCTOATE_RELPATH = "kfzkennzeichen-deutschland.csv"
+
+# Wird erhöht, wenn sich der erzeugte Datensatz ändert, damit Benchmarks ihn neu erzeugen
+DATASET_VERSION = 2
+COASTLINE_STEP = 50.0  # Abstand der Stützpunkte der synthetischen Küstenlinie in Metern
+
+
+def _germany_outline(rng):
+    """
+    Erzeugt eine unregelmäßige, Deutschland-ähnliche Umrissform.
+    """
+    outline = scale(Point(0, 0).buffer(1.0, quad_segs=64), GERMANY_RADIUS_X, GERMANY_RADIUS_Y)
+    coords = np.asarray(outline.exterior.coords)
+    # Unregelmäßiger Rand durch radiales Rauschen
+    noise = 1.0 + 0.08 * np.sin(np.linspace(0, 14 * np.pi, len(coords))) + rng.normal(0, 0.01, len(coords))
+    noise[-1] = noise[0]
+    coords = coords * noise[:, None]
+    outline = Polygon(coords).buffer(0)
+    return translate(outline, *GERMANY_CENTER)
+
+
+def _make_codes(rng, count):
+    """
+    Erzeugt eindeutige Kennzeichen mit 1-3 Buchstaben (überwiegend 2-3 Buchstaben wie in der Realität).
+    """
+    letters = string.ascii_uppercase
+    codes = set()
+    codes.update(rng.sample(letters, 20))
+    while len(codes) < count:
+        length = rng.choice([2, 2, 3, 3, 3])
+        codes.add("".join(rng.choice(letters) for _ in range(length)))
+    codes = sorted(codes)
+    rng.shuffle(codes)
+    return codes
+
+
+def generate_regions(n_regions=400, seed=42, segment_length=400.0):
+    """
+    Erzeugt die Regionen als Voronoi-Zellen innerhalb des Umrisses.
+    Die Kanten werden verdichtet, damit die Stützpunktzahl in der Größenordnung des
+    KFZ250-Datensatzes liegt. Einige Regionen erhalten vorgelagerte Inseln (MultiPolygon).
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    outline = _germany_outline(np_rng)
+    minx, miny, maxx, maxy = outline.bounds
+
+    points = []
+    while len(points) < n_regions:
+        x = rng.uniform(minx, maxx)
+        y = rng.uniform(miny, maxy)
+        if outline.contains(Point(x, y)):
+            points.append(Point(x, y))
+
+    cells = voronoi_diagram(MultiPoint(points), envelope=outline.envelope.buffer(50000))
+    geometries = []
+    for cell in cells.geoms:
+        clipped = cell.intersection(outline)
+        if clipped.is_empty:
+            continue
+        geometries.append(clipped)
+    geometries = geometries[:n_regions]
+
+    # Vorgelagerte Inseln für einige Regionen im Norden
+    for i, geom in enumerate(geometries):
+        cx, cy = geom.centroid.x, geom.centroid.y
+        if cy > maxy - (maxy - miny) * 0.15 and rng.random() < 0.4:
+            islands = [Point(cx + rng.uniform(-20000, 20000), maxy + rng.uniform(5000, 30000)).buffer(rng.uniform(2000, 6000))
+                       for _ in range(rng.randint(1, 3))]
+            geometries[i] = MultiPolygon([geom] + islands) if geom.geom_type == "Polygon" else unary_union([geom] + islands)
+
+    geometries = [segmentize(geom, segment_length) for geom in geometries]
+    return geometries, outline
+
+
+def generate_dataset(target_dir, n_regions=400, seed=42, csv_only_codes=60, segment_length=400.0):
+    """
+    Schreibt den kompletten synthetischen Datensatz in target_dir:
+    Shapefile, beide CSV-Dateien und die Hintergrund-Shapefiles.
+
+    Returns:
+        dict: Kennzahlen des Datensatzes
+    """
+    rng = random.Random(seed)
+    geometries, outline = generate_regions(n_regions, seed, segment_length)
+
+    # Ein Hauptkennzeichen pro Region, etwa 40 % der Regionen haben zusätzlich Altkennzeichen
+    n_extra = int(len(geometries) * 0.7)
+    all_codes = _make_codes(rng, len(geometries) + n_extra + csv_only_codes)
+    primary_codes = all_codes[:len(geometries)]
+    extra_pool = all_codes[len(geometries):len(geometries) + n_extra]
+    csv_only = all_codes[len(geometries) + n_extra:]
+
+    records = []
+    extra_index = 0
+    region_codes = []
+    for i, geom in enumerate(geometries):
+        codes = [primary_codes[i]]
+        if rng.random() < 0.4:
+            for _ in range(rng.randint(1, 3)):
+                if extra_index < len(extra_pool):
+                    codes.append(extra_pool[extra_index])
+                    extra_index += 1
+        region_codes.append(codes)
+        records.append({
+            "KFZ": ", ".join(codes),
+            "NAME": f"Landkreis Beispiel {i + 1:03d}",
+            "geometry": geom,
+        })
+
+    # Einige Kennzeichen kommen in zwei Regionen vor
+    for i in rng.sample(range(len(records)), 5):
+        j = (i + 1) % len(records)
+        records[j]["KFZ"] += ", " + region_codes[i][0]
+
+    gdf = gpd.GeoDataFrame(records, geometry="geometry", crs="EPSG:25832")
+    shapefile_path = os.path.join(target_dir, SHAPEFILE_RELPATH)
+    os.makedirs(os.path.dirname(shapefile_path), exist_ok=True)
+    gdf.to_file(shapefile_path, encoding="utf-8")
+
+    # kfz-kennz-d.csv: alle Hauptkennzeichen, ein Teil der Altkennzeichen und Kennzeichen nur in der CSV
+    used_extra = extra_pool[:extra_index]
+    csv_codes = primary_codes + rng.sample(used_extra, int(len(used_extra) * 0.6)) + csv_only
+    with open(os.path.join(target_dir, CSV_RELPATH), "w", encoding="utf-8") as f:
+        f.write("Kennzeichen,Stadt/Landkreis,Bundesland\n")
+        for code in sorted(csv_codes):
+            f.write(f"{code},Kreis {code},{rng.choice(BUNDESLAENDER)}\n")
+
+    # kfzkennzeichen-deutschland.csv (Octoate): alle Kennzeichen, ohne Kopfzeile
+    with open(os.path.join(target_dir, CSV_OCTOATE_RELPATH), "w", encoding="utf-8") as f:
+        for code in sorted(all_codes):
+            f.write(f"{code},Altkreis {code}\n")
+
+    write_background_layers(target_dir, outline, seed)
+
+    return {
+        "regions": len(records),
+        "shapefile_codes": len(primary_codes) + extra_index,
+        "csv_codes": len(csv_codes),
+        "octoate_codes": len(all_codes),
+        "vertices": int(sum(len(np.asarray(g.exterior.coords)) if g.geom_type == "Polygon"
+                            else sum(len(np.asarray(p.exterior.coords)) for p in g.geoms)
+                            for g in gdf.geometry)),
+    }
+
+
+def write_background_layers(target_dir, outline, seed=42):
+    """
+    Schreibt die Hintergrundebenen für das professionelle Drucklayout nach basisdaten/:
+    Europa-Küstenlinie, Wasser, Deutschland-Umriss und Seen (in EPSG:4326 wie im Original).
+    """
+    rng = random.Random(seed)
+    base_dir = os.path.join(target_dir, "basisdaten")
+    os.makedirs(base_dir, exist_ok=True)
+
+    # Europa als großes, fein aufgelöstes Polygon um Deutschland herum
+    europe = segmentize(outline.buffer(900000, quad_segs=256), 2000.0)
+    # Nord- und Ostsee mit fein aufgelöster, unregelmäßiger Küstenlinie, die durch den Kartenausschnitt läuft
+    np_rng = np.random.default_rng(seed)
+    coast_x = np.arange(GERMANY_CENTER[0] - 500000, GERMANY_CENTER[0] + 400000, COASTLINE_STEP)
+    coast_y = (GERMANY_CENTER[1] + 420000 + 25000 * np.sin(coast_x / 40000.0)
+               + np.cumsum(np_rng.normal(0, COASTLINE_STEP * 0.3, len(coast_x))))
+    top = GERMANY_CENTER[1] + 900000
+    water = Polygon(list(zip(coast_x, coast_y)) + [(coast_x[-1], top), (coast_x[0], top)]).buffer(0)
+    lakes = [Point(rng.uniform(-250000, 250000) + GERMANY_CENTER[0],
+                   rng.uniform(-350000, 350000) + GERMANY_CENTER[1]).buffer(rng.uniform(1500, 8000), quad_segs=64)
+             for _ in range(150)]
+
+    layers = {
+        "europecoastline.shp": gpd.GeoDataFrame(geometry=[europe], crs="EPSG:25832"),
+        "secondbackground.shp": gpd.GeoDataFrame(geometry=[water], crs="EPSG:25832"),
+        "germanyshape.shp": gpd.GeoDataFrame(geometry=[outline], crs="EPSG:25832"),
+        "lakes.shp": gpd.GeoDataFrame(geometry=lakes, crs="EPSG:25832").to_crs(epsg=4326),
+    }
+    for file_name, layer in layers.items():
+        layer.to_file(os.path.join(base_dir, file_name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erzeugt synthetische Geodaten für Benchmarks")
+    parser.add_argument("target_dir", help="Zielverzeichnis")
+    parser.add_argument("--regions", type=int, default=400, help="Anzahl der Regionen")
+    parser.add_argument("--seed", type=int, default=42, help="Seed für den Zufallsgenerator")
+
+    args = parser.parse_args()
+
+    os.makedirs(args.target_dir, exist_ok=True)
+    stats = generate_dataset(args.target_dir, args.regions, args.seed)
+    print(f"Synthetischer Datensatz in {args.target_dir} erstellt: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Build-Manifest für inkrementelle Batch-Builds.
+Speichert für jede Edition und jede Stufe (title, maps, tex, pdf, final) die Hashes
+der Eingaben und die erzeugten Ausgabedateien. Bei einem erneuten Lauf werden nur
+die Stufen neu gebaut, deren Eingaben oder Ausgaben sich verändert haben.
+"""
+
+import os
+import json
+import glob
+import hashlib
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(BASE_DIR, "build_manifest.json")
+MANIFEST_VERSION = 1
+
+# Reihenfolge der Stufen eines Buchs
+STAGES = ["title", "maps", "tex", "pdf", "final"]
+
+# Stufen, die von generate_kfz_maps_neu.py ausgeführt werden (das Titelbild entsteht vorher)
+BOOK_STAGES = ["maps", "tex", "pdf", "final"]
+
+# Eingabedateien (relativ zum Projektverzeichnis)
+SHAPEFILE_INPUTS = [
+    "kfz250.utm32s.shape/kfz250/KFZ250.shp",
+    "kfz250.utm32s.shape/kfz250/KFZ250.dbf",
+    "kfz250.utm32s.shape/kfz250/KFZ250.shx",
+    "kfz250.utm32s.shape/kfz250/KFZ250.prj",
+]
+CSV_INPUTS = ["kfz-kennz-d.csv", "kfzkennzeichen-deutschland.csv"]
+
+STAGE_INPUTS = {
+    "title": SHAPEFILE_INPUTS + ["kfz-kennz-d.csv", "create_title_image.py", "generate_license_plate.py",
+                                 "region_renderer.py", "geo_cache.py", "raw1.svg", "raw2.svg", "raw3.svg",
+                                 "EuroPlate.ttf"],
+    "maps": SHAPEFILE_INPUTS + CSV_INPUTS + ["generate_kfz_maps_neu.py", "map_creator.py", "geo_cache.py",
+                                             "region_renderer.py", "cairo_map_renderer.py", "normalizer.py"],
+    "tex": SHAPEFILE_INPUTS + CSV_INPUTS + ["generate_kfz_maps_neu.py", "generate_home_print_latex_template.py",
+                                            "book_sections.py", "kfz_puzzle_generator.py", "normalizer.py",
+                                            "locator_maps.py", "region_renderer.py", "geo_cache.py",
+                                            "plate_atlas.py", "generate_license_plate.py", "raw1.svg", "raw2.svg",
+                                            "raw3.svg", "EuroPlate.ttf"],
+    "pdf": ["generate_kfz_maps_neu.py"],
+    "final": ["generate_kfz_maps_neu.py"],
+}
+
+# Die Konfiguration geht als Parameter in die Schlüssel ein (siehe stage_params), nicht als Datei.
+# Das Titelbild hängt von "title_vector" ab.
+CONFIG_INPUTS = ["config.json"]
+CONFIG_STAGES = ["title", "maps", "tex"]
+
+# Stufen, deren Ausgaben als Eingaben in eine andere Stufe eingehen
+STAGE_DEPENDENCIES = {
+    "title": [],
+    "maps": [],
+    "tex": [],
+    "pdf": ["maps", "tex"],
+    "final": ["title", "pdf"],
+}
+
+# Einstellungen, die nur bestimmen, wo, mit wie viel Speicher oder mit wie vielen Threads gebaut
+# wird, nicht was entsteht
+NON_OUTPUT_CONFIG_KEYS = ["home", "map_dir", "map_threads", "max_full_res_images"]
+
+# Zwischenspeicher für Dateihashes, damit das Shapefile nicht für jede Edition neu gehasht wird
+_hash_cache = {}
+
+
+def _abs_path(path):
+    """
+    Wandelt einen Pfad relativ zum Projektverzeichnis in einen absoluten Pfad um.
+    """
+    if os.path.isabs(path):
+        return path
+    return os.path.join(BASE_DIR, path)
+
+
+def _rel_path(path):
+    """
+    Wandelt einen absoluten Pfad in einen Pfad relativ zum Projektverzeichnis um.
+    """
+    path = os.path.abspath(_abs_path(path))
+    try:
+        return os.path.relpath(path, BASE_DIR)
+    except ValueError:
+        return path
+
+
+def file_hash(path):
+    """
+    Berechnet den SHA-256-Hash einer Datei. Gibt None zurück, wenn die Datei nicht existiert.
+    Der Hash wird anhand von Größe und Änderungszeit zwischengespeichert.
+    """
+    abs_path = _abs_path(path)
+    try:
+        stat = os.stat(abs_path)
+    except OSError:
+        return None
+
+    cache_key = (abs_path, stat.st_size, stat.st_mtime_ns)
+    if cache_key in _hash_cache:
+        return _hash_cache[cache_key]
+
+    h = hashlib.sha256()
+    with open(abs_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _hash_cache[cache_key] = digest
+    return digest
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """
+    Lädt das Build-Manifest. Gibt ein leeres Manifest zurück, wenn keines existiert
+    oder die Version nicht passt.
+    """
+    empty = {"version": MANIFEST_VERSION, "editions": {}}
+    if not os.path.exists(manifest_path):
+        return empty
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"Fehler beim Laden des Build-Manifests {manifest_path}: {e}")
+        return empty
+    if manifest.get("version") != MANIFEST_VERSION:
+        print("Build-Manifest hat eine andere Version, alle Stufen werden neu gebaut.")
+        return empty
+    manifest.setdefault("editions", {})
+    return manifest
+
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """
+    Speichert das Build-Manifest atomar (erst in eine temporäre Datei, dann umbenennen).
+    """
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+
+def watched_inputs():
+    """
+    Gibt alle Eingabedateien der Stufen und die Konfiguration zurück (relativ zum Projektverzeichnis).
+    """
+    return sorted({path for inputs in STAGE_INPUTS.values() for path in inputs} | set(CONFIG_INPUTS))
+
+
+def affected_stages(paths, stages=STAGES):
+    """
+    Bestimmt die Stufen, die von geänderten Eingabedateien betroffen sind: die Stufen, zu deren
+    Eingaben eine der Dateien gehört, und alle Stufen, die von diesen abhängen.
+
+    Returns:
+        list: Stufen in der Reihenfolge von STAGES (nur aus stages)
+    """
+    changed = {_rel_path(path) for path in paths}
+    direct = {stage for stage, inputs in STAGE_INPUTS.items() if changed & set(inputs)}
+    if changed & set(CONFIG_INPUTS):
+        direct.update(CONFIG_STAGES)
+
+    affected = []
+    for stage in STAGES:
+        if stage in direct or any(dep in affected for dep in STAGE_DEPENDENCIES[stage]):
+            affected.append(stage)
+    return [stage for stage in affected if stage in stages]
+
+
+def stage_params(stage, code, config=None):
+    """
+    Gibt die Parameter zurück, die neben den Eingabedateien in den Schlüssel einer Stufe eingehen.
+    Das Home-Kennzeichen betrifft alle Stufen, die übrige Konfiguration (z.B. die Version) nur
+    die Stufen, die aus generate_kfz_maps_neu.py heraus laufen. Das Titelbild hängt nur von
+    "title_vector" ab (nur wenn gesetzt, damit bestehende Schlüssel gültig bleiben). Das
+    Verzeichnis der Karten ("map_dir") steckt bereits in den Pfaden der Ausgaben, Speichergrenzen
+    und die Anzahl der Threads ändern die Ausgaben nicht (siehe NON_OUTPUT_CONFIG_KEYS).
+    """
+    params = {"home": code}
+    if stage != "title" and config:
+        params["config"] = {k: v for k, v in config.items() if k not in NON_OUTPUT_CONFIG_KEYS}
+    if stage == "title" and config and config.get("title_vector"):
+        params["title_vector"] = True
+    return params
+
+
+def compute_stage_key(manifest, code, stage, config=None):
+    """
+    Berechnet den Schlüssel einer Stufe aus den Hashes der Eingabedateien, den Parametern
+    und den aufgezeichneten Ausgaben der vorgelagerten Stufen.
+    """
+    h = hashlib.sha256()
+    h.update(stage.encode("utf-8"))
+    for path in STAGE_INPUTS[stage]:
+        h.update(path.encode("utf-8"))
+        h.update((file_hash(path) or "missing").encode("utf-8"))
+    h.update(json.dumps(stage_params(stage, code, config), sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+    edition = manifest["editions"].get(code, {})
+    for dep in STAGE_DEPENDENCIES[stage]:
+        dep_entry = edition.get(dep)
+        dep_outputs = dep_entry["outputs"] if dep_entry else None
+        h.update(json.dumps(dep_outputs, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _outputs_intact(entry):
+    """
+    Prüft, ob alle aufgezeichneten Ausgaben einer Stufe noch unverändert vorhanden sind.
+    """
+    outputs = entry.get("outputs") or {}
+    if not outputs:
+        return False
+    for path, digest in outputs.items():
+        if file_hash(path) != digest:
+            return False
+    return True
+
+
+def stale_stages(manifest, code, config=None, stages=STAGES):
+    """
+    Bestimmt die Stufen, die für eine Edition neu gebaut werden müssen.
+    Eine Stufe ist veraltet, wenn sich ihr Schlüssel geändert hat, ihre Ausgaben fehlen oder
+    verändert wurden, oder eine vorgelagerte Stufe neu gebaut wird.
+
+    Returns:
+        dict: Stufe -> Grund, in der Reihenfolge von STAGES
+    """
+    edition = manifest["editions"].get(code, {})
+    stale = {}
+    for stage in STAGES:
+        if stage not in stages:
+            continue
+        entry = edition.get(stage)
+        stale_deps = [dep for dep in STAGE_DEPENDENCIES[stage] if dep in stale]
+        if stale_deps:
+            stale[stage] = f"abhängig von {', '.join(stale_deps)}"
+        elif entry is None:
+            stale[stage] = "noch nie gebaut"
+        elif entry.get("key") != compute_stage_key(manifest, code, stage, config):
+            stale[stage] = "Eingaben geändert"
+        elif not _outputs_intact(entry):
+            stale[stage] = "Ausgaben fehlen oder wurden überschrieben"
+    return stale
+
+
+def record_stage(manifest, code, stage, outputs, config=None):
+    """
+    Zeichnet eine erfolgreich gebaute Stufe im Manifest auf.
+    Muss in der Reihenfolge von STAGES aufgerufen werden, damit die Schlüssel der
+    nachgelagerten Stufen die neuen Ausgaben berücksichtigen.
+    """
+    recorded_outputs = {}
+    for path in outputs:
+        digest = file_hash(path)
+        if digest is not None:
+            recorded_outputs[_rel_path(path)] = digest
+
+    edition = manifest["editions"].setdefault(code, {})
+    edition[stage] = {
+        "key": compute_stage_key(manifest, code, stage, config),
+        "outputs": recorded_outputs,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return edition[stage]
+
+
+def stage_outputs(stage, code, output_suffix="", books_dir=None, maps_dir="output_maps"):
+    """
+    Gibt die Ausgabedateien einer Stufe für eine Edition zurück (im Heimdruck-Layout).
+    Für die Karten werden die aktuell vorhandenen Seiten in maps_dir gesammelt.
+    """
+    if stage == "title":
+        return [os.path.join("output_maps", f"kfz_titelbild_{code}.pdf")]
+    if stage == "maps":
+        outputs = sorted(_rel_path(p) for p in glob.glob(os.path.join(_abs_path(maps_dir), "kfz_karte_seite_*.png")))
+        if code:
+            outputs.append(os.path.join(maps_dir, f"kfz_umgebung_{code}.png"))
+        return outputs
+    if stage == "tex":
+        return [f"kfz_sammelbuch_{code}{output_suffix}_printerfriendly.tex"]
+    if stage == "pdf":
+        return [f"kfz_sammelbuch_{code}{output_suffix}_printerfriendly.pdf"]
+    if stage == "final":
+        final_name = f"kfz_sammelbuch_{code}{output_suffix}_printerfriendly_final.pdf"
+        if books_dir:
+            return [os.path.join(books_dir, final_name)]
+        return [final_name]
+    raise ValueError(f"Unbekannte Stufe: {stage}")
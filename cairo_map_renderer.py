@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zeichnet die Kartenseiten für den Heimdrucker direkt mit Cairo statt mit matplotlib.
+
+Die Seiten bestehen nur aus gefüllten Regionen, Verbindungslinien, Punkten und Labels
+mit abgerundetem Rahmen. Die vorberechneten Pfade aus dem RegionRenderer werden direkt
+auf eine Cairo-Fläche gezeichnet, die Grundkarte nur einmal pro Lauf. Das Layout folgt
+denselben Regeln wie create_map_pages_for_home_printer (Seitengröße, Achsenbereich,
+Linienbreiten in Punkt, Position und Abstand der Labels, Rand wie bbox_inches='tight').
+
+Verwendet cairocffi (wird von cairosvg mitgebracht) oder, falls nicht vorhanden, pycairo.
+Aktiviert wird der Renderer mit "map_engine": "cairo" in config.json.
+"""
+
+import os
+import math
+
+from matplotlib.path import Path
+from matplotlib.colors import to_rgba
+
+from stage_timing import stage
+from memory_guard import full_res_image
+from map_creator import (OUTPUT_DIR, PAGE_WIDTH, PAGE_HEIGHT, collect_home_printer_page,
+                         home_printer_label_text, home_region_centroid)
+
+try:
+    import cairocffi as cairo
+except (ImportError, OSError):
+    import cairo
+
+DPI = 300
+FONT_FACE = "DejaVu Sans"  # Standardschrift von matplotlib
+FONT_SIZE = 6  # Punkt
+LINE_SPACING = 1.2  # Zeilenabstand wie bei matplotlib
+LABEL_PAD = 0.8  # Innenabstand des Labelrahmens in Schriftgrößen (boxstyle='round,pad=0.8')
+TIGHT_PAD = 0.1  # Rand um den Inhalt in Zoll (wie pad_inches bei bbox_inches='tight')
+
+# Achsenbereich einer matplotlib-Figur mit Standardrändern (links 0.125, rechts 0.9, unten 0.11, oben 0.88)
+AXES_WIDTH = PAGE_WIDTH * (0.9 - 0.125)
+AXES_HEIGHT = PAGE_HEIGHT * (0.88 - 0.11)
+
+
+class _PageLayout:
+    """
+    Abbildung von Kartenkoordinaten auf Pixel, wie bei einer matplotlib-Achse mit
+    aspect='equal' und den Grenzen aus create_map_pages_for_home_printer.
+    """
+
+    def __init__(self, bounds, dpi=DPI):
+        self.bounds = bounds
+        self.dpi = dpi
+        self.pt = dpi / 72.0
+        self.x0, self.x1 = bounds[0] - 0.1, bounds[2] + 1.0
+        self.y0, self.y1 = bounds[1] - 0.1, bounds[3] + 0.1
+        self.scale = min(AXES_WIDTH * dpi / (self.x1 - self.x0), AXES_HEIGHT * dpi / (self.y1 - self.y0))
+        self.width = (self.x1 - self.x0) * self.scale
+        self.height = (self.y1 - self.y0) * self.scale
+
+    def to_px(self, x, y):
+        return (x - self.x0) * self.scale, (self.y1 - y) * self.scale
+
+
+def _append_path(ctx, path, layout, offset):
+    """
+    Fügt einen matplotlib-Pfad (MOVETO, LINETO, CLOSEPOLY) dem aktuellen Cairo-Pfad hinzu.
+    """
+    vertices = (path.vertices - (layout.x0, layout.y1)) * (layout.scale, -layout.scale) + offset
+    for (x, y), code in zip(vertices.tolist(), path.codes.tolist()):
+        if code == Path.MOVETO:
+            ctx.move_to(x, y)
+        elif code == Path.CLOSEPOLY:
+            ctx.close_path()
+        else:
+            ctx.line_to(x, y)
+
+
+def _fill_and_stroke(ctx, facecolor, edgecolor, linewidth, alpha=1.0):
+    r, g, b, a = to_rgba(facecolor)
+    ctx.set_source_rgba(r, g, b, a * alpha)
+    ctx.fill_preserve()
+    r, g, b, a = to_rgba(edgecolor)
+    ctx.set_source_rgba(r, g, b, a * alpha)
+    ctx.set_line_width(linewidth)
+    ctx.stroke()
+
+
+def _circle(ctx, x, y, area_pt2, facecolor, edgecolor, linewidth, pt, alpha=1.0):
+    """
+    Zeichnet einen Punkt wie ax.scatter (area_pt2 ist die Fläche s in Punkt²).
+    """
+    ctx.arc(x, y, math.sqrt(area_pt2) * pt / 2, 0, 2 * math.pi)
+    _fill_and_stroke(ctx, facecolor, edgecolor, linewidth * pt, alpha)
+
+
+def _rounded_rectangle(ctx, x, y, width, height, radius):
+    ctx.new_sub_path()
+    ctx.arc(x + width - radius, y + radius, radius, -math.pi / 2, 0)
+    ctx.arc(x + width - radius, y + height - radius, radius, 0, math.pi / 2)
+    ctx.arc(x + radius, y + height - radius, radius, math.pi / 2, math.pi)
+    ctx.arc(x + radius, y + radius, radius, math.pi, 3 * math.pi / 2)
+    ctx.close_path()
+
+
+def _set_font(ctx, layout):
+    ctx.select_font_face(FONT_FACE, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+    ctx.set_font_size(FONT_SIZE * layout.pt)
+
+
+def _layout_labels(measure_ctx, layout, centroids_and_codes, code_to_name, code_to_other_codes):
+    """
+    Berechnet Position und Größe aller Labels einer Seite in Pixeln (ohne Rand).
+
+    Returns:
+        list: dicts mit centroid, color, lines, text_x, text_y, box (x, y, Breite, Höhe)
+    """
+    bounds = layout.bounds
+    font_size = FONT_SIZE * layout.pt
+    ascent, descent = measure_ctx.font_extents()[:2]
+    line_step = LINE_SPACING * font_size
+    pad = LABEL_PAD * font_size
+
+    # Berechne die Position für die Labels am rechten Rand (wie im matplotlib-Layout)
+    text_x = bounds[2] + 0.1
+    label_spacing = (bounds[3] - bounds[1]) / (len(centroids_and_codes) + 1)
+
+    labels = []
+    for i, (centroid, code, color) in enumerate(centroids_and_codes):
+        text_y = bounds[3] - (i + 1) * label_spacing
+        lines = home_printer_label_text(code, code_to_name, code_to_other_codes).split("\n")
+        width = max(measure_ctx.text_extents(line)[4] for line in lines)
+        height = ascent + descent + (len(lines) - 1) * line_step
+        px, py = layout.to_px(text_x, text_y)
+        labels.append({
+            "centroid": centroid,
+            "code": code,
+            "color": color,
+            "lines": lines,
+            "text_x": text_x,
+            "text_y": text_y,
+            "top": py - height / 2,
+            "box": (px - pad, py - height / 2 - pad, width + 2 * pad, height + 2 * pad),
+        })
+    return labels
+
+
+def _content_extent(layout, labels):
+    """
+    Gibt die Ausdehnung (links, oben, rechts, unten) von Karte und Labels in Pixeln zurück,
+    entsprechend der engen Begrenzung von bbox_inches='tight'.
+    """
+    b = layout.bounds
+    left, top = layout.to_px(b[0], b[3])
+    right, bottom = layout.to_px(b[2], b[1])
+    for label in labels:
+        x, y, w, h = label["box"]
+        left, top = min(left, x), min(top, y)
+        right, bottom = max(right, x + w), max(bottom, y + h)
+    return left, top, right, bottom
+
+
+def _draw_base(ctx, renderer, layout, offset):
+    """
+    Zeichnet die Grundkarte: alle Regionen weiß mit hellgrauen Grenzen und den Umriss.
+    """
+    ctx.set_line_join(cairo.LINE_JOIN_ROUND)
+    for path in renderer.paths:
+        if path is not None:
+            _append_path(ctx, path, layout, offset)
+            _fill_and_stroke(ctx, "white", "lightgray", 0.3 * layout.pt)
+    if renderer.outline_path is not None:
+        _append_path(ctx, renderer.outline_path, layout, offset)
+        r, g, b, a = to_rgba("black")
+        ctx.set_source_rgba(r, g, b, a)
+        ctx.set_line_width(2.0 * layout.pt)
+        ctx.stroke()
+
+
+def _draw_page(ctx, renderer, layout, offset, highlight_rows, highlight_colors, labels, home_centroid, home_code):
+    """
+    Zeichnet alles, was sich von Seite zu Seite ändert, in der Reihenfolge der matplotlib-zorder:
+    Regionen, Verbindungslinien, Labels und zuletzt die Punkte.
+    """
+    pt = layout.pt
+    ox, oy = offset
+
+    # Hervorgehobene Regionen (alpha=0.7, schwarze Grenzen)
+    for row, color in zip(highlight_rows, highlight_colors):
+        path = renderer.paths[row]
+        if path is not None:
+            _append_path(ctx, path, layout, offset)
+            _fill_and_stroke(ctx, color, "black", 0.5 * pt, alpha=0.7)
+
+    # Verbindungslinien vom Zentroid zum Label
+    ctx.set_source_rgba(0, 0, 0, 1)
+    ctx.set_line_width(1.0 * pt)
+    for label in labels:
+        x, y = layout.to_px(label["centroid"].x, label["centroid"].y)
+        ex, ey = layout.to_px(label["text_x"] - 0.2, label["text_y"])
+        ctx.move_to(x + ox, y + oy)
+        ctx.line_to(ex + ox, ey + oy)
+        ctx.stroke()
+
+    # Labels mit abgerundetem Rahmen in der Farbe der Region
+    ascent = ctx.font_extents()[0]
+    line_step = LINE_SPACING * FONT_SIZE * pt
+    for label in labels:
+        x, y, w, h = label["box"]
+        _rounded_rectangle(ctx, x + ox, y + oy, w, h, LABEL_PAD * FONT_SIZE * pt)
+        _fill_and_stroke(ctx, (1, 1, 1, 0.9), label["color"], 1.0 * pt)
+        text_x = layout.to_px(label["text_x"], label["text_y"])[0] + ox
+        ctx.set_source_rgba(0, 0, 0, 1)
+        for i, line in enumerate(label["lines"]):
+            ctx.move_to(text_x, label["top"] + oy + ascent + i * line_step)
+            ctx.show_text(line)
+
+    # Home-Marker und farbige Punkte (zorder 10 im matplotlib-Layout)
+    if home_centroid is not None:
+        x, y = layout.to_px(home_centroid.x, home_centroid.y)
+        _circle(ctx, x + ox, y + oy, 120, "red", "black", 1.5, pt)
+    for label in labels:
+        if home_code and home_code == str(label["code"]).strip():
+            x, y = layout.to_px(label["centroid"].x, label["centroid"].y)
+            _circle(ctx, x + ox, y + oy, 120, "red", "black", 1.5, pt)
+        x, y = layout.to_px(label["text_x"] - 0.05, label["text_y"])
+        _circle(ctx, x + ox, y + oy, 100, label["color"], "black", 0.5, pt, alpha=0.9)
+
+
+def render_home_printer_pages_cairo(pages, renderer, code_to_region, code_to_name, code_to_other_codes, region_to_color, home_code=None, output_format="png", dpi=DPI, output_dir=OUTPUT_DIR):
+    """
+    Gegenstück zu map_creator.render_home_printer_pages mit Cairo.
+
+    Bei output_format="png" wird die Grundkarte einmal auf eine Bildfläche gezeichnet und
+    für jede Seite nur noch kopiert. Bei output_format="pdf" entstehen Vektor-PDFs.
+
+    Parameter:
+    - pages: Liste von (Seitennummer, Kennzeichen der Seite)
+    - region_to_color: Farbe jeder Region (Index als String)
+    - output_dir: Verzeichnis der Dateien
+
+    Rückgabe: Liste von (Seitennummer, Pfad der Datei)
+    """
+    layout = _PageLayout(renderer.bounds, dpi)
+    home_centroid = home_region_centroid(renderer, code_to_region, home_code)
+
+    # Kontext nur zum Messen der Texte
+    measure_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1)
+    measure_ctx = cairo.Context(measure_surface)
+    _set_font(measure_ctx, layout)
+
+    # Grundkarte einmal als Bild (mit etwas Rand für die Umrisslinie)
+    base_margin = int(math.ceil(2.0 * layout.pt))
+    base_surface = None
+    if output_format == "png":
+        base_surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(math.ceil(layout.width)) + 2 * base_margin,
+                                          int(math.ceil(layout.height)) + 2 * base_margin)
+        _draw_base(cairo.Context(base_surface), renderer, layout, (base_margin, base_margin))
+
+    output_files = []
+    for page, page_codes in pages:
+        with stage("map_page", page=page, layout="home_printer", engine="cairo"):
+            print(f"Erstelle Karte für Seite {page} mit Kennzeichen: " + ", ".join(page_codes))
+
+            highlight_rows, highlight_colors, centroids_and_codes = collect_home_printer_page(
+                renderer, page_codes, code_to_region, region_to_color)
+            labels = _layout_labels(measure_ctx, layout, centroids_and_codes, code_to_name, code_to_other_codes)
+
+            # Seitengröße aus Karte und Labels plus Rand (wie bbox_inches='tight')
+            left, top, right, bottom = _content_extent(layout, labels)
+            pad = TIGHT_PAD * dpi
+            width = int(math.ceil(right - left + 2 * pad))
+            height = int(math.ceil(bottom - top + 2 * pad))
+            offset = (round(pad - left), round(pad - top))
+
+            output_file = os.path.join(output_dir, f"kfz_karte_seite_{page:02d}.{output_format}")
+            # Der Puffer belegt bei 300 dpi ca. 35 MB, finish() gibt ihn sofort wieder frei
+            with full_res_image():
+                if output_format == "pdf":
+                    surface = cairo.PDFSurface(output_file, width * 72.0 / dpi, height * 72.0 / dpi)
+                    ctx = cairo.Context(surface)
+                    ctx.scale(72.0 / dpi, 72.0 / dpi)
+                else:
+                    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+                    ctx = cairo.Context(surface)
+                _set_font(ctx, layout)
+
+                # Weißer Hintergrund wie bei savefig
+                ctx.set_source_rgb(1, 1, 1)
+                ctx.paint()
+
+                if base_surface is not None:
+                    ctx.set_source_surface(base_surface, offset[0] - base_margin, offset[1] - base_margin)
+                    ctx.paint()
+                else:
+                    _draw_base(ctx, renderer, layout, offset)
+
+                _draw_page(ctx, renderer, layout, offset, highlight_rows, highlight_colors, labels,
+                           home_centroid, home_code)
+
+                if output_format == "pdf":
+                    surface.finish()
+                else:
+                    surface.write_to_png(output_file)
+                    surface.finish()
+            output_files.append((page, output_file))
+
+            print(f"Karte gespeichert als: {output_file}")
+
+    return output_files
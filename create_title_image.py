@@ -6,26 +6,53 @@ import sys
 import numpy as np
 import pandas as pd
 import geopandas as gpd
-import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.patches import Patch
 from matplotlib.font_manager import FontProperties
-import fiona
-from PIL import Image, ImageDraw, ImageFont
-from wordcloud import WordCloud
 import random
+import json
+import pickle
+import hashlib
+import importlib.util
+import importlib.metadata
 from shapely.geometry import box
 import subprocess
-# Import ReportLab für PDF-Erstellung
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import cm
+import shutil
+import tempfile
+from region_renderer import RegionRenderer
+
+CACHE_DIR = "cache"  # Verzeichnis für zwischengespeicherte Daten
+WORDCLOUD_LAYOUT_VERSION = 1
+
+# Parameter der WordCloud (die Größe bestimmt nur das Layout, gerendert wird in Zielgröße)
+WORDCLOUD_PARAMS = {
+    "width": 2000,
+    "height": 1600,  # Größere Dimensionen für bessere Sichtbarkeit
+    "max_words": 300,  # Mehr Wörter für bessere Abdeckung
+    "prefer_horizontal": 0.6,
+    "relative_scaling": 0.7,
+    "min_font_size": 10,
+    "max_font_size": 120,  # Größere maximale Schriftgröße
+    "random_state": 42,
+}
+
+# Farbe und Deckkraft der Wörter im Hintergrund des Titelbilds
+WORDCLOUD_GRAY = 200
+WORDCLOUD_ALPHA = 60
+
+# Zwischenspeicher im Speicher: Schlüssel -> Layout
+_wordcloud_layout_cache = {}
 
 def load_shapefile(shapefile_path):
     """
     Lädt ein Shapefile und gibt es als GeoDataFrame zurück.
     Versucht verschiedene Kodierungen und Methoden.
     """
+    import fiona
+
     try:
         print("Versuche mit fiona zu laden...")
         with fiona.open(shapefile_path) as f:
@@ -98,12 +125,390 @@ def extract_codes_from_shapefile(gdf):
     
     return all_codes, code_to_region, code_to_geometry, region_to_codes
 
-def create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_to_codes, output_path, region_code=None, csv_region_name=None):
+def wordcloud_font_path():
+    """
+    Gibt die Schriftart der WordCloud zurück (Helvetica, falls vorhanden, sonst die Schrift von wordcloud).
+    Die Schrift von wordcloud wird wie in wordcloud.wordcloud.FONT_PATH bestimmt, ohne das Paket
+    zu importieren.
+    """
+    font_path = '/System/Library/Fonts/Helvetica.ttc'
+    if os.path.exists(font_path):
+        return font_path
+    if os.environ.get('FONT_PATH'):
+        return os.environ['FONT_PATH']
+    spec = importlib.util.find_spec('wordcloud')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return os.path.join(list(spec.submodule_search_locations)[0], 'DroidSansMono.ttf')
+
+def wordcloud_layout_key(frequencies, font_path):
+    """
+    Berechnet den Schlüssel des WordCloud-Layouts aus den Gewichten, den Parametern und der Schrift.
+    Die Version von wordcloud stammt aus den Paket-Metadaten, damit ein Treffer im Cache das Paket
+    nicht importiert.
+    """
+    try:
+        wordcloud_version = importlib.metadata.version('wordcloud')
+    except importlib.metadata.PackageNotFoundError:
+        wordcloud_version = None
+    
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": WORDCLOUD_LAYOUT_VERSION, "wordcloud": wordcloud_version,
+                         "params": WORDCLOUD_PARAMS, "font": font_path,
+                         "frequencies": sorted(frequencies.items())}, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+def _gray_level(color):
+    """
+    Gibt den Grauwert (0..255) einer Farbe der WordCloud zurück (z.B. "rgb(120, 120, 120)").
+    """
+    from PIL import ImageColor
+    return int(round(sum(ImageColor.getrgb(color)[:3]) / 3))
+
+def load_wordcloud_layout(frequencies, base_dir='.'):
+    """
+    Gibt das Layout der WordCloud zurück (Position, Schriftgröße und Ausrichtung jedes Wortes).
+    Das Layout wird nur berechnet, wenn es weder im Speicher noch in cache/ vorliegt, und ist
+    unabhängig von der Auflösung, in der die WordCloud später gezeichnet wird.
+    
+    Rückgabe: dict mit "width", "height", "font_path" und "words", einer Liste von
+    (Wort, Schriftgröße, (x, y), Ausrichtung, Grauwert) in Pixeln des Layouts
+    """
+    font_path = wordcloud_font_path()
+    key = wordcloud_layout_key(frequencies, font_path)
+    if key in _wordcloud_layout_cache:
+        return _wordcloud_layout_cache[key]
+    
+    cache_path = os.path.join(base_dir, CACHE_DIR, f"wordcloud_layout_{key[:16]}.pkl")
+    layout = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                layout = pickle.load(f)
+            if layout.get("key") != key:
+                layout = None
+        except Exception as e:
+            print(f"Fehler beim Laden des Caches {cache_path}: {e}")
+            layout = None
+    
+    if layout is None:
+        from wordcloud import WordCloud
+        
+        print("Berechne das Layout der WordCloud...")
+        cloud = WordCloud(background_color='white', colormap='Greys', font_path=font_path,
+                          **WORDCLOUD_PARAMS).generate_from_frequencies(frequencies)
+        words = [(word, font_size, (int(position[1]), int(position[0])), orientation, _gray_level(color))
+                 for (word, _), font_size, position, orientation, color in cloud.layout_]
+        layout = {"key": key, "width": cloud.width, "height": cloud.height,
+                  "font_path": font_path, "words": words}
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(layout, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            print(f"Fehler beim Speichern des Caches {cache_path}: {e}")
+    
+    _wordcloud_layout_cache[key] = layout
+    return layout
+
+def render_wordcloud_overlay(layout, size):
+    """
+    Zeichnet die WordCloud direkt in der Zielgröße als hellgraue, transparente Ebene.
+    Jedes Wort wird in der Höhe der Zielgröße gesetzt und nur in der Breite angepasst, wenn das
+    Seitenverhältnis vom Layout abweicht (wie bisher beim Strecken des ganzen Bildes).
+    """
+    from PIL import Image, ImageDraw, ImageFont, ImageChops
+    
+    width, height = size
+    scale_x = width / layout["width"]
+    scale_y = height / layout["height"]
+    
+    mask = Image.new('L', size, 0)
+    for word, font_size, (x, y), orientation, gray in layout["words"]:
+        font = ImageFont.truetype(layout["font_path"], max(1, int(round(font_size * scale_y))))
+        font = ImageFont.TransposedFont(font, orientation=orientation)
+        
+        # Das Wort einzeln setzen, in der Breite anpassen und in die Maske übernehmen
+        draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+        right, bottom = draw.textbbox((0, 0), word, font=font)[2:]
+        word_img = Image.new('L', (max(1, int(right)), max(1, int(bottom))), 0)
+        ImageDraw.Draw(word_img).text((0, 0), word, fill=255, font=font)
+        # Helle Wörter decken weniger ab (bisher wurden nur Pixel dunkler als 240 übernommen)
+        word_img = word_img.point(lambda v: v * (255 - gray) // 255)
+        if scale_x != scale_y:
+            word_img = word_img.resize((max(1, int(round(word_img.width * scale_x / scale_y))), word_img.height),
+                                       Image.BILINEAR)
+        
+        left, top = int(round(x * scale_x)), int(round(y * scale_y))
+        target = (left, top, min(width, left + word_img.width), min(height, top + word_img.height))
+        if target[2] <= target[0] or target[3] <= target[1]:
+            continue
+        word_img = word_img.crop((0, 0, target[2] - target[0], target[3] - target[1]))
+        mask.paste(ImageChops.lighter(mask.crop(target), word_img), target)
+    
+    # Alle gesetzten Pixel werden hellgrau mit geringer Deckkraft (wie bisher die nicht-weißen Pixel)
+    overlay = Image.new('RGBA', size, (WORDCLOUD_GRAY, WORDCLOUD_GRAY, WORDCLOUD_GRAY, 0))
+    overlay.putalpha(mask.point(lambda v: WORDCLOUD_ALPHA if v > 15 else 0))
+    return overlay
+
+def title_pdf_path(output_path):
+    """
+    Stellt sicher, dass die Ausgabedatei die Endung .pdf hat.
+    """
+    if not output_path.lower().endswith('.pdf'):
+        return output_path.rsplit('.', 1)[0] + '.pdf'
+    return output_path
+
+def title_region_text(region_code, csv_region_name, code_to_region):
+    """
+    Gibt den Text der Edition für das Titelbild zurück (z.B. "Hamburg Edition"), sonst "".
+    """
+    if not region_code:
+        return ""
+    # Bevorzuge den Namen aus der CSV-Datei, wenn vorhanden
+    if csv_region_name:
+        region_name = csv_region_name
+    elif region_code in code_to_region:
+        region_name = code_to_region[region_code]
+    else:
+        region_name = None
+    return f"{region_name} Edition" if region_name else ""
+
+def draw_title_text(c, width, height, region_text):
+    """
+    Setzt Titel, Untertitel, Edition und Autor auf die Seite eines ReportLab-Canvas.
+    """
+    from reportlab.lib.units import cm
+    
+    # Titel
+    c.setFont("Helvetica-Bold", 36)
+    c.drawCentredString(width/2, height - 3*cm, "Mein großes Kennzeichen Buch")
+    
+    # Untertitel
+    c.setFont("Helvetica", 24)
+    c.drawCentredString(width/2, height - 4*cm, "Ein Sammelbuch für deutsche Autokennzeichen")
+    
+    # Wenn eine Region angegeben wurde, füge sie unten ein
+    if region_text:
+        c.setFont("Helvetica", 18)
+        c.drawCentredString(width/2, 3*cm, region_text)
+    
+    # Füge den Autor hinzu
+    c.setFont("Helvetica", 12)
+    c.drawCentredString(width/2, 2*cm, "von Lukas Ruge")
+
+def is_south_region(region_code, code_to_geometry, gdf):
+    """
+    Bestimmt, ob der Ort des Kennzeichens in der südlichen Hälfte der Karte liegt.
+    """
+    geom = code_to_geometry.get(region_code) if region_code else None
+    if geom is None:
+        return False
+    # Bestimme, ob der Ort in Süddeutschland liegt (y-Koordinate kleiner als Mittelpunkt)
+    map_center_y = gdf.total_bounds[1] + (gdf.total_bounds[3] - gdf.total_bounds[1]) / 2
+    return geom.centroid.y < map_center_y
+
+def plate_center_y(map_top, map_height, is_south):
+    """
+    Gibt die Mitte des oberen (Süden) oder unteren (Norden) Drittels der Karte zurück,
+    damit das Kennzeichen den Ort nicht verdeckt.
+    """
+    map_third = map_height / 3
+    if is_south:
+        return map_top + map_third / 2
+    return map_top + map_height - map_third / 2
+
+def create_title_plate_image(region_code):
+    """
+    Erzeugt das Kennzeichen für das Titelbild mit generate_license_plate.py und gibt es als
+    RGBA-Bild zurück, oder None, wenn das nicht gelingt.
+    """
+    from PIL import Image
+    
+    # Eigene temporäre Datei pro Aufruf, da mehrere Titelbilder gleichzeitig entstehen können
+    fd, temp_license_plate = tempfile.mkstemp(prefix=f"temp_license_plate_{region_code}_", suffix=".png")
+    os.close(fd)
+    try:
+        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate_license_plate.py')
+        # Führe das Skript aus - die SVG-Vorlage wird automatisch basierend auf der Länge des Kennzeichens ausgewählt
+        cmd = [sys.executable, script_path, region_code, '--output', temp_license_plate]
+        subprocess.run(cmd, check=True)
+        with Image.open(temp_license_plate) as license_img:
+            return license_img.convert('RGBA')
+    except Exception as e:
+        print(f"Fehler beim Erstellen des Kennzeichen-Bildes: {e}")
+        return None
+    finally:
+        if os.path.exists(temp_license_plate):
+            os.remove(temp_license_plate)
+
+def title_map_geometry(bounds):
+    """
+    Bildet die Platzierung der Karte im gerasterten Titelbild nach: die Figur in DIN A4 mit
+    300 dpi, die Achse mit 5 % Rand um die Daten, auf 70 % verkleinert und unten mittig eingefügt.
+    
+    Rückgabe: (Breite, Höhe des Bildes in Pixeln, (a, b, c, d)) mit Pixel = (a * x + b, c - d * y)
+    """
+    minx, miny, maxx, maxy = bounds
+    data_w, data_h = (maxx - minx) * 1.1, (maxy - miny) * 1.1
+    # Pixel pro Einheit bei gleichem Seitenverhältnis in der Standard-Achse (77,5 % x 77 % der Figur)
+    scale = min(0.775 * 8.27 * 300 / data_w, 0.77 * 11.69 * 300 / data_h)
+    img_w, img_h = int(round(data_w * scale)), int(round(data_h * scale))
+    paste_x = (img_w - int(img_w * 0.7)) // 2
+    paste_y = img_h - int(img_h * 0.7) - 210
+    left, top = minx - (maxx - minx) * 0.05, maxy + (maxy - miny) * 0.05
+    return img_w, img_h, (0.7 * scale, paste_x - 0.7 * scale * left, paste_y + 0.7 * scale * top, 0.7 * scale)
+
+def _pdf_path(c, path, sx, ox, sy, oy):
+    """
+    Übersetzt einen matplotlib-Pfad mit x' = sx * x + ox, y' = sy * y + oy in einen ReportLab-Pfad.
+    """
+    from matplotlib.path import Path
+    
+    vertices = path.vertices * (sx, sy) + (ox, oy)
+    pdf_path = c.beginPath()
+    for (x, y), code in zip(vertices.tolist(), path.codes.tolist()):
+        if code == Path.MOVETO:
+            pdf_path.moveTo(x, y)
+        elif code == Path.CLOSEPOLY:
+            pdf_path.close()
+        else:
+            pdf_path.lineTo(x, y)
+    return pdf_path
+
+def draw_wordcloud_vector(c, layout, width, height):
+    """
+    Setzt die WordCloud als Text mit geringer Deckkraft auf die Seite (wie render_wordcloud_overlay,
+    aber als Vektoren). Die Wörter werden wie im gerasterten Titelbild in der Breite gestreckt.
+    """
+    from PIL import Image, ImageFont
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    
+    font_name = "WordCloud"
+    if font_name not in pdfmetrics.getRegisteredFontNames():
+        font_path = layout["font_path"]
+        subfont = {"subfontIndex": 0} if font_path.lower().endswith('.ttc') else {}
+        pdfmetrics.registerFont(TTFont(font_name, font_path, **subfont))
+    # Oberlänge wie bei PIL, damit die Wörter auf derselben Grundlinie stehen wie im Layout
+    ascent = ImageFont.truetype(layout["font_path"], 1000).getmetrics()[0] / 1000
+    
+    scale_x = width / layout["width"]
+    scale_y = height / layout["height"]
+    c.saveState()
+    c.setFillGray(WORDCLOUD_GRAY / 255)
+    c.setFillAlpha(WORDCLOUD_ALPHA / 255)
+    for word, font_size, (x, y), orientation, gray in layout["words"]:
+        # Sehr helle Wörter fielen im gerasterten Titelbild unter die Schwelle
+        if 255 - gray <= 15:
+            continue
+        size = font_size * scale_y
+        c.saveState()
+        c.setFont(font_name, size)
+        if orientation == Image.ROTATE_90:
+            # Von unten nach oben gelesen, die Grundlinie liegt rechts der oberen Kante des Wortes
+            text_width = pdfmetrics.stringWidth(word, font_name, size)
+            c.translate(x * scale_x + ascent * size * scale_x / scale_y, height - y * scale_y - text_width)
+            c.scale(scale_x / scale_y, 1)
+            c.rotate(90)
+        else:
+            c.translate(x * scale_x, height - y * scale_y - ascent * size)
+            c.scale(scale_x / scale_y, 1)
+        c.drawString(0, 0, word)
+        c.restoreState()
+    c.restoreState()
+
+def compose_title_pdf_vector(pdf_output_path, renderer, region_rows, region_colors, marker_point,
+                             cloud_layout, region_text, license_img=None, is_south=False):
+    """
+    Setzt das Titelbild direkt als Vektorgrafik: Regionen und Marker als Pfade, die WordCloud als
+    Text und nur das Kennzeichen als kleines Bild. Die Platzierung entspricht dem gerasterten
+    Titelbild, die Datei ist aber deutlich kleiner und schneller erstellt als eine Seite mit 300 dpi.
+    """
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    
+    c = canvas.Canvas(pdf_output_path, pagesize=A4, pageCompression=1)
+    width, height = A4  # A4 ist 210 x 297 mm
+    
+    # Das gerasterte Titelbild wird auf die Seite gestreckt, hier genauso
+    img_w, img_h, (a, b, top, d) = title_map_geometry(renderer.bounds)
+    px_x, px_y = width / img_w, height / img_h
+    sx, ox = a * px_x, b * px_x
+    sy, oy = d * px_y, height - top * px_y
+    # Linienbreite in Punkten: 300 dpi, auf 70 % verkleinert
+    line_scale = 300 / 72 * 0.7 * px_y
+    
+    # Hintergrund: die WordCloud
+    draw_wordcloud_vector(c, cloud_layout, width, height)
+    
+    # Grundkarte in hellgrau
+    c.saveState()
+    c.setFillColor(mcolors.to_hex('lightgray'))
+    c.setStrokeColor(mcolors.to_hex('gray'))
+    c.setLineWidth(0.3 * line_scale)
+    c.setLineJoin(1)
+    for path in renderer.paths:
+        if path is not None:
+            c.drawPath(_pdf_path(c, path, sx, ox, sy, oy), fill=1, stroke=1)
+    
+    # Regionen in ihren Farben mit weißem Rand
+    c.setStrokeColorRGB(1, 1, 1)
+    c.setLineWidth(0.2 * line_scale)
+    c.setFillAlpha(0.8)
+    c.setStrokeAlpha(0.8)
+    for row, color in zip(region_rows, region_colors):
+        path = renderer.paths[row]
+        if path is not None:
+            c.setFillColorRGB(*mcolors.to_rgb(color))
+            c.drawPath(_pdf_path(c, path, sx, ox, sy, oy), fill=1, stroke=1)
+    c.restoreState()
+    
+    # Marker des Ortes
+    if marker_point is not None:
+        c.saveState()
+        c.setFillColorRGB(1, 0, 0)
+        c.setStrokeColorRGB(0, 0, 0)
+        c.setLineWidth(1.5 * line_scale)
+        c.circle(sx * marker_point[0] + ox, sy * marker_point[1] + oy, np.sqrt(120) / 2 * line_scale,
+                 fill=1, stroke=1)
+        c.restoreState()
+    
+    # Das Kennzeichen (ca. 60% der Kartenbreite) im oberen oder unteren Drittel der Karte
+    if license_img is not None:
+        map_top = img_h - int(img_h * 0.7) - 210
+        plate_w = int(int(img_w * 0.7) * 0.6) * px_x
+        plate_h = plate_w * license_img.height / license_img.width
+        center_y = height - plate_center_y(map_top, int(img_h * 0.7), is_south) * px_y
+        
+        # Wähle einen zufälligen Neigungswinkel zwischen -10 und +10 Grad
+        rotation_angle = random.uniform(-10, 10)
+        c.saveState()
+        c.translate(width / 2, center_y)
+        c.rotate(rotation_angle)
+        c.drawImage(ImageReader(license_img), -plate_w / 2, -plate_h / 2, plate_w, plate_h, mask='auto')
+        c.restoreState()
+    
+    draw_title_text(c, width, height, region_text)
+    c.save()
+    return pdf_output_path
+
+def create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_to_codes, output_path, region_code=None, csv_region_name=None, vector=False):
     """
     Erstellt ein Titelbild mit farbiger Deutschlandkarte und TagCloud der Regionen.
     Speichert das Ergebnis als PDF-Datei.
-    """
     
+    Mit vector=True wird die Seite als Vektorgrafik gesetzt (siehe compose_title_pdf_vector),
+    sonst als Bild mit 300 dpi.
+    """
+    # PIL und ReportLab werden nur für das Titelbild gebraucht (WordCloud nur für ein neues Layout)
+    from PIL import Image
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+
     # Debug-Ausgabe für das übergebene Kennzeichen
     if region_code:
         print(f"\nDEBUG: Informationen für Kennzeichen {region_code}:")
@@ -138,66 +543,47 @@ def create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_
         
         print(f"DEBUG: Ausgewählte Region für Markierung: {selected_region_for_marker}")
 
-    # Erstelle eine Figur in DIN A4-Größe (210 x 297 mm)
-    # Wir verwenden ein Seitenverhältnis von 1:sqrt(2) für DIN A4
-    plt.figure(figsize=(8.27, 11.69))  # 8.27 x 11.69 Zoll = 210 x 297 mm (DIN A4)
-    
     # Erstelle zuerst die WordCloud der Regionen
     print("Erstelle WordCloud der Regionen...")
     
-    # Erstelle eine Farbpalette mit genügend Farben
-    num_colors = len(all_codes)
-    cmap_name = 'tab20'  # Eine Farbpalette mit 20 unterschiedlichen Farben
-    cmap = plt.colormaps.get_cmap(cmap_name)
-    
-    # Wenn wir mehr als 20 Farben benötigen, erweitern wir die Palette
-    if num_colors > 20:
-        # Erstelle eine erweiterte Farbpalette durch Kombination mehrerer Farbpaletten
-        colors1 = plt.colormaps['tab20'](np.linspace(0, 1, 20))
-        colors2 = plt.colormaps['tab20b'](np.linspace(0, 1, 20))
-        colors3 = plt.colormaps['tab20c'](np.linspace(0, 1, 20))
-        colors4 = plt.colormaps['Set3'](np.linspace(0, 1, 12))
-        colors5 = plt.colormaps['Paired'](np.linspace(0, 1, 12))
-        
-        # Kombiniere die Farben
-        all_colors = np.vstack([colors1, colors2, colors3, colors4, colors5])
-        
-        # Mische die Farben für mehr Variation
-        np.random.seed(42)  # Für reproduzierbare Ergebnisse
-        np.random.shuffle(all_colors)
-        
-        # Erstelle eine benutzerdefinierte Farbpalette
-        cmap = mcolors.ListedColormap(all_colors)
+    # Erstelle eine erweiterte Farbpalette durch Kombination mehrerer Farbpaletten
+    colors1 = colormaps['tab20'](np.linspace(0, 1, 20))
+    colors2 = colormaps['tab20b'](np.linspace(0, 1, 20))
+    colors3 = colormaps['tab20c'](np.linspace(0, 1, 20))
+    colors4 = colormaps['Set3'](np.linspace(0, 1, 12))
+    colors5 = colormaps['Paired'](np.linspace(0, 1, 12))
     
-    # Erstelle eine Zuordnung von Codes zu Farben
-    code_to_color = {}
-    for i, code in enumerate(all_codes):
-        color_idx = i % cmap.N  # Wiederhole die Farben, wenn nötig
-        code_to_color[code] = cmap(color_idx)
+    # Kombiniere die Farben
+    all_colors = np.vstack([colors1, colors2, colors3, colors4, colors5])
     
-    # Zeichne die Grundkarte von Deutschland in hellgrau
-    ax = plt.gca()
-    gdf.plot(ax=ax, color='lightgray', edgecolor='gray', linewidth=0.3)
+    # Mische die Farben für mehr Variation
+    np.random.seed(42)  # Für reproduzierbare Ergebnisse
+    np.random.shuffle(all_colors)
     
-    # Zeichne jede Region in der Farbe ihres ersten Kennzeichens
+    # Pfade der Regionen (einmal berechnet, für Raster- und Vektor-Modus)
+    renderer = RegionRenderer(gdf)
+    
+    # Farbtabelle der Regionen mit dieser Palette (benachbarte Regionen unterschiedlich,
+    # einmal berechnet und in cache/ für alle Editionen abgelegt)
+    row_colors = renderer.region_colors(all_colors)
+    
+    # Sammle für jede Region die Geometrien in der Farbe ihrer ersten Geometrie
+    region_rows = []
+    region_colors = []
     for region_name, codes in region_to_codes.items():
         if codes:
-            # Verwende das erste Kennzeichen für die Farbe
-            code = codes[0]
-            color = code_to_color.get(code, 'lightgray')
-            
             # Finde alle Geometrien für diese Region
             geometries = [code_to_geometry.get(c) for c in codes if c in code_to_geometry]
             geometries = [g for g in geometries if g is not None]
             
-            # Zeichne alle Geometrien dieser Region
-            if geometries:
-                for geom in geometries:
-                    if geom is not None:
-                        # Zeichne die Geometrie mit der Farbe des Kennzeichens
-                        gpd.GeoSeries([geom], crs=gdf.crs).plot(ax=ax, facecolor=color, edgecolor='white', linewidth=0.2, alpha=0.8)
-    
-    # Setze einen Marker für die ausgewählte Region, falls eine gefunden wurde
+            rows = [renderer.row_for_geometry(g) for g in geometries]
+            rows = [row for row in rows if row is not None]
+            if rows:
+                region_rows.extend(rows)
+                region_colors.extend([row_colors[rows[0]]] * len(rows))
+    
+    # Bestimme den Marker für die ausgewählte Region, falls eine gefunden wurde
+    marker_point = None
     if region_code and selected_region_for_marker:
         # Hole die Codes für die ausgewählte Region
         region_codes = region_to_codes.get(selected_region_for_marker, [])
@@ -209,20 +595,12 @@ def create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_
                 try:
                     centroid = geom.centroid
                     print(f"DEBUG: Markiere Punkt für Region {selected_region_for_marker} mit Kennzeichen {region_code} bei Koordinaten {centroid.x}, {centroid.y}")
-                    ax.scatter(centroid.x, centroid.y, s=120, color='red', marker='o', edgecolors='black', linewidths=1.5, zorder=10)
+                    marker_point = (centroid.x, centroid.y)
                 except Exception as e:
-                    print(f"Fehler beim Zeichnen des Markers: {e}")
+                    print(f"Fehler beim Bestimmen des Markers: {e}")
         else:
             print(f"DEBUG: Keine Geometrie für Kennzeichen {region_code} in Region {selected_region_for_marker} gefunden")
     
-    # Entferne Achsen und Rahmen
-    ax.set_axis_off()
-    
-    # Speichere die Karte als temporäre PNG-Datei mit transparentem Hintergrund
-    temp_map_path = "temp_map.png"
-    plt.savefig(temp_map_path, bbox_inches='tight', pad_inches=0, dpi=300, transparent=True)
-    plt.close()
-    
     # Erstelle eine TagCloud der Regionen
     # Gewichte basierend auf der Anzahl der Kennzeichen pro Region
     region_weights = {region: len(codes) for region, codes in region_to_codes.items()}
@@ -233,246 +611,150 @@ def create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_
         if region:  # Überspringe leere Regionen
             wordcloud_dict[region] = weight * 10  # Verstärke die Gewichtung
     
-    # Erstelle die WordCloud
-    # Versuche, die Schriftart zu laden, oder verwende eine Standardschriftart
-    try:
-        font_path = '/System/Library/Fonts/Helvetica.ttc'
-        # Prüfe, ob die Schriftart existiert
-        if not os.path.exists(font_path):
-            font_path = None
-    except:
-        font_path = None
-        
-    wordcloud = WordCloud(
-        width=2000, 
-        height=1600,  # Größere Dimensionen für bessere Sichtbarkeit
-        background_color='white',
-        max_words=300,  # Mehr Wörter für bessere Abdeckung
-        prefer_horizontal=0.6,
-        colormap='Greys',  # Graustufen für hellgrauen Hintergrund
-        font_path=font_path,  # Verwende die Schriftart, wenn verfügbar
-        relative_scaling=0.7,
-        min_font_size=10,
-        max_font_size=120,  # Größere maximale Schriftgröße
-        random_state=42
-    ).generate_from_frequencies(wordcloud_dict)
-    
-    # Speichere die WordCloud als temporäre Datei
-    temp_cloud_path = "temp_cloud.png"
-    wordcloud.to_file(temp_cloud_path)
-    
-    # Lade die beiden Bilder mit PIL
-    map_img = Image.open(temp_map_path)
-    cloud_img = Image.open(temp_cloud_path)
-    
-    # Erstelle ein neues Bild mit der Größe der Karte
-    final_img = Image.new('RGBA', map_img.size, (255, 255, 255, 255))
-    
-    # Füge die WordCloud als Hintergrund hinzu (skaliert auf die Größe der Karte)
-    cloud_img = cloud_img.resize(map_img.size, Image.LANCZOS)
-    cloud_img = cloud_img.convert('RGBA')
-    
-    # Mache den Hintergrund der WordCloud transparent und die Wörter hellgrau
-    data = cloud_img.getdata()
-    new_data = []
-    for item in data:
-        # Wenn es sich um einen weißen Pixel handelt, mache ihn transparent
-        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-            new_data.append((255, 255, 255, 0))
-        else:
-            # Mache nicht-weiße Pixel hellgrau und teilweise transparent
-            # Hellgrau mit Alpha = 60 (sehr transparent)
-            gray_value = 200  # Hellgrauer Farbwert
-            new_data.append((gray_value, gray_value, gray_value, 60))
-    
-    cloud_img.putdata(new_data)
-    
-    # Füge die WordCloud als Hintergrund ein
-    final_img.paste(cloud_img, (0, 0), cloud_img)
-    
-    # Konvertiere die Karte zu RGBA, falls sie es noch nicht ist
-    map_img = map_img.convert("RGBA")
-    
-    # Mache weiße Pixel in der Karte transparent
-    map_data = map_img.getdata()
-    new_map_data = []
-    for item in map_data:
-        # Wenn es sich um einen weißen oder sehr hellen Pixel handelt, mache ihn transparent
-        if item[0] > 240 and item[1] > 240 and item[2] > 240:
-            new_map_data.append((255, 255, 255, 0))  # Vollständig transparent
-        else:
-            new_map_data.append(item)  # Behalte die Originalfarbe und -transparenz
+    # Layout der WordCloud (einmal berechnet und in cache/ für alle Editionen abgelegt)
+    cloud_layout = load_wordcloud_layout(wordcloud_dict)
     
-    map_img.putdata(new_map_data)
+    # Im Vektor-Modus werden Karte und WordCloud direkt ins PDF gezeichnet, ohne matplotlib-Figur
+    if vector:
+        pdf_output_path = compose_title_pdf_vector(
+            title_pdf_path(output_path), renderer, region_rows, region_colors, marker_point, cloud_layout,
+            title_region_text(region_code, csv_region_name, code_to_region),
+            create_title_plate_image(region_code) if region_code and len(region_code) <= 3 else None,
+            is_south_region(region_code, code_to_geometry, gdf))
+        print(f"Titelbild erfolgreich als PDF erstellt: {pdf_output_path}")
+        return pdf_output_path
     
-    # Verkleinere die Deutschlandkarte auf 70% der Originalgröße
-    map_width, map_height = map_img.size
-    new_width = int(map_width * 0.7)
-    new_height = int(map_height * 0.7)
-    map_img = map_img.resize((new_width, new_height), Image.LANCZOS)
+    # Erstelle eine Figur in DIN A4-Größe (210 x 297 mm)
+    # Wir verwenden ein Seitenverhältnis von 1:sqrt(2) für DIN A4
+    # Ohne pyplot, damit mehrere Titelbilder im selben Prozess (auch in Threads) entstehen können
+    fig = Figure(figsize=(8.27, 11.69))  # 8.27 x 11.69 Zoll = 210 x 297 mm (DIN A4)
+    FigureCanvasAgg(fig)
     
-    # Positioniere die Karte unten bündig und mittig, aber 4 cm (ca. 160 Pixel) höher
-    paste_x = (final_img.width - new_width) // 2
-    paste_y = final_img.height - new_height - 210  # 210 Pixel Abstand vom unteren Rand (50 + 160)
+    # Zeichne die Grundkarte von Deutschland in hellgrau
+    ax = fig.add_subplot()
+    renderer.draw(ax, facecolors='lightgray', edgecolors='gray', linewidths=0.3)
     
-    # Füge die verkleinerte Karte mit Transparenz ein
-    final_img.paste(map_img, (paste_x, paste_y), map_img)
+    # Zeichne alle Regionen in einem Durchgang mit den vorberechneten Pfaden
+    if region_rows:
+        renderer.draw(ax, rows=region_rows, facecolors=region_colors, edgecolors='white', linewidths=0.2, alpha=0.8)
+    ax.set_aspect('equal')
+    ax.autoscale_view()
     
-    # Erstelle ein Kennzeichen-Bild, wenn ein Kennzeichen angegeben wurde
-    if region_code and len(region_code) <= 3:
-        try:
-            # Bestimme die Position des Ortes (Nord/Süd)
-            is_south = False
-            if region_code in code_to_geometry:
-                geom = code_to_geometry[region_code]
-                if geom is not None:
-                    # Berechne den Schwerpunkt der Geometrie
-                    centroid = geom.centroid
-                    # Bestimme, ob der Ort in Süddeutschland liegt (y-Koordinate kleiner als Mittelpunkt)
-                    # Die genaue Grenze hängt vom Koordinatensystem ab, hier ein Beispielwert
-                    map_center_y = gdf.total_bounds[1] + (gdf.total_bounds[3] - gdf.total_bounds[1]) / 2
-                    is_south = centroid.y < map_center_y
-            
-            # Generiere das Kennzeichen-Bild mit unserem Skript
-            temp_license_plate = 'temp_license_plate.png'
-            script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate_license_plate.py')
-            
-            # Führe das Skript aus - die SVG-Vorlage wird automatisch basierend auf der Länge des Kennzeichens ausgewählt
-            cmd = [sys.executable, script_path, region_code, '--output', temp_license_plate]
-            subprocess.run(cmd, check=True)
+    # Setze den Marker für die ausgewählte Region
+    if marker_point:
+        ax.scatter(*marker_point, s=120, color='red', marker='o', edgecolors='black', linewidths=1.5, zorder=10)
+    
+    # Entferne Achsen und Rahmen
+    ax.set_axis_off()
+    
+    # Temporäre Dateien in einem eigenen Verzeichnis pro Aufruf, da mehrere Titelbilder
+    # gleichzeitig im selben Arbeitsverzeichnis entstehen können (batch_pipeline.py)
+    temp_dir = tempfile.mkdtemp(prefix="kfz_title_")
+    try:
+        # Speichere die Karte als temporäre PNG-Datei mit transparentem Hintergrund
+        temp_map_path = os.path.join(temp_dir, "temp_map.png")
+        fig.savefig(temp_map_path, bbox_inches='tight', pad_inches=0, dpi=300, transparent=True)
+    
+        # Lade die Karte mit PIL
+        map_img = Image.open(temp_map_path)
+    
+        # Erstelle ein neues Bild mit der Größe der Karte
+        final_img = Image.new('RGBA', map_img.size, (255, 255, 255, 255))
+    
+        # Zeichne die WordCloud direkt in der Größe der Karte als hellgrauen, transparenten Hintergrund
+        cloud_img = render_wordcloud_overlay(cloud_layout, map_img.size)
+        final_img.paste(cloud_img, (0, 0), cloud_img)
+    
+        # Konvertiere die Karte zu RGBA, falls sie es noch nicht ist
+        map_img = map_img.convert("RGBA")
+    
+        # Mache weiße Pixel in der Karte transparent
+        map_data = map_img.getdata()
+        new_map_data = []
+        for item in map_data:
+            # Wenn es sich um einen weißen oder sehr hellen Pixel handelt, mache ihn transparent
+            if item[0] > 240 and item[1] > 240 and item[2] > 240:
+                new_map_data.append((255, 255, 255, 0))  # Vollständig transparent
+            else:
+                new_map_data.append(item)  # Behalte die Originalfarbe und -transparenz
+    
+        map_img.putdata(new_map_data)
+    
+        # Verkleinere die Deutschlandkarte auf 70% der Originalgröße
+        map_width, map_height = map_img.size
+        new_width = int(map_width * 0.7)
+        new_height = int(map_height * 0.7)
+        map_img = map_img.resize((new_width, new_height), Image.LANCZOS)
+    
+        # Positioniere die Karte unten bündig und mittig, aber 4 cm (ca. 160 Pixel) höher
+        paste_x = (final_img.width - new_width) // 2
+        paste_y = final_img.height - new_height - 210  # 210 Pixel Abstand vom unteren Rand (50 + 160)
+    
+        # Füge die verkleinerte Karte mit Transparenz ein
+        final_img.paste(map_img, (paste_x, paste_y), map_img)
+    
+        # Erstelle ein Kennzeichen-Bild, wenn ein Kennzeichen angegeben wurde
+        if region_code and len(region_code) <= 3:
+            license_img = create_title_plate_image(region_code)
+            if license_img is not None:
+                # Bestimme die Position des Ortes (Nord/Süd)
+                is_south = is_south_region(region_code, code_to_geometry, gdf)
             
-            # Lade das Kennzeichen-Bild
-            if os.path.exists(temp_license_plate):
-                license_img = Image.open(temp_license_plate)
-                license_img = license_img.convert('RGBA')
-                
                 # Skaliere das Kennzeichen auf eine angemessene Größe (ca. 60% der Kartenbreite)
                 license_width = int(new_width * 0.6)
                 license_height = int(license_width * license_img.height / license_img.width)
                 license_img = license_img.resize((license_width, license_height), Image.LANCZOS)
-                
+            
                 # Wähle einen zufälligen Neigungswinkel zwischen -10 und +10 Grad
                 rotation_angle = random.uniform(-10, 10)
                 license_img = license_img.rotate(rotation_angle, resample=Image.BICUBIC, expand=True, fillcolor=(0, 0, 0, 0))
-                
+            
                 # Nach der Rotation könnte sich die Größe geändert haben
                 rotated_width, rotated_height = license_img.size
-                
-                # Positioniere das Kennzeichen abhängig von der Position der Deutschlandkarte
-                # und ob der Ort im Norden oder Süden liegt
-                
+            
                 # Horizontale Zentrierung
                 license_x = (final_img.width - rotated_width) // 2
-                
-                # Die Position der Deutschlandkarte ist durch paste_y und new_height definiert
-                # paste_y ist die obere Kante der Karte
-                # new_height ist die Höhe der Karte
-                
-                # Teile die Karte in Drittel
-                map_top = paste_y
-                map_bottom = paste_y + new_height
-                map_height = new_height
-                map_third = map_height / 3
-                
-                if is_south:
-                    # Für süddeutsche Kennzeichen: Platziere im oberen Drittel der Karte
-                    # Mitte des oberen Drittels = obere Kante + 1/6 der Höhe
-                    target_center_y = map_top + map_third / 2
-                else:
-                    # Für norddeutsche Kennzeichen: Platziere im unteren Drittel der Karte
-                    # Mitte des unteren Drittels = obere Kante + 5/6 der Höhe
-                    target_center_y = map_bottom - map_third / 2
-                
+            
+                # Positioniere das Kennzeichen im oberen (Süden) oder unteren (Norden) Drittel der Karte
+                target_center_y = plate_center_y(paste_y, new_height, is_south)
+            
                 # Positioniere das Kennzeichen so, dass seine Mitte auf der berechneten Position liegt
                 license_y = int(target_center_y - rotated_height / 2)
-                
+            
                 # Füge das Kennzeichen ein
                 final_img.paste(license_img, (license_x, license_y), license_img)
-        except Exception as e:
-            print(f"Fehler beim Erstellen des Kennzeichen-Bildes: {e}")
-    
-    # Erstelle ein Draw-Objekt für das Bild (wird für andere Operationen benötigt)
-    draw = ImageDraw.Draw(final_img)
-    
-    # Wir laden keine Schriftarten für das Bild, da wir den Text direkt ins PDF einfügen werden
-    # Der Titel und Untertitel werden später im PDF-Teil hinzugefügt
-    
-    # Wir zeichnen keinen Text auf das Bild, da wir den Text direkt ins PDF einfügen werden
-    # Bestimme den Regionsnamen, wenn ein Kennzeichen angegeben wurde
-    region_text = ""
-    if region_code:
-        # Bevorzuge den Namen aus der CSV-Datei, wenn vorhanden
-        if csv_region_name:
-            region_name = csv_region_name
-        elif region_code in code_to_region:
-            region_name = code_to_region[region_code]
-        else:
-            region_name = None
-            
-        if region_name:
-            region_text = f"{region_name} Edition"
-    
-    # Autor-Text
-    author_text = "von Lukas Ruge"
-    
-    # Speichere das finale Bild als temporäre Datei
-    temp_img_path = "temp_final_img.png"
-    try:
-        final_img.save(temp_img_path, format='PNG', dpi=(300, 300))
-    except Exception as e:
-        print(f"Fehler beim Speichern mit DPI: {e}")
-        # Fallback ohne DPI-Angabe
-        final_img.save(temp_img_path, format='PNG')
-    
-    # Erstelle ein PDF mit ReportLab
-    # Stelle sicher, dass die Ausgabedatei die Endung .pdf hat
-    if not output_path.lower().endswith('.pdf'):
-        pdf_output_path = output_path.rsplit('.', 1)[0] + '.pdf'
-    else:
-        pdf_output_path = output_path
     
-    # Erstelle ein neues PDF in DIN A4-Größe
-    c = canvas.Canvas(pdf_output_path, pagesize=A4)
-    width, height = A4  # A4 ist 210 x 297 mm
+        # Der Titel und Untertitel werden später im PDF-Teil hinzugefügt
+        region_text = title_region_text(region_code, csv_region_name, code_to_region)
     
-    # Füge das Bild ins PDF ein
-    # Konvertiere zu RGB für PDF-Kompatibilität
-    img = Image.open(temp_img_path)
-    if img.mode == 'RGBA':
-        img = img.convert('RGB')
+        # Speichere das finale Bild als temporäre Datei
+        temp_img_path = os.path.join(temp_dir, "temp_final_img.png")
+        try:
+            final_img.save(temp_img_path, format='PNG', dpi=(300, 300))
+        except Exception as e:
+            print(f"Fehler beim Speichern mit DPI: {e}")
+            # Fallback ohne DPI-Angabe
+            final_img.save(temp_img_path, format='PNG')
     
-    # Füge das Bild ins PDF ein (ohne Text)
-    c.drawImage(temp_img_path, 0, 0, width, height)
+        # Erstelle ein PDF mit ReportLab
+        pdf_output_path = title_pdf_path(output_path)
     
-    # Füge den Text direkt ins PDF ein
-    # Titel
-    c.setFont("Helvetica-Bold", 36)
-    c.drawCentredString(width/2, height - 3*cm, "Mein großes Kennzeichen Buch")
+        # Erstelle ein neues PDF in DIN A4-Größe
+        c = canvas.Canvas(pdf_output_path, pagesize=A4)
+        width, height = A4  # A4 ist 210 x 297 mm
     
-    # Untertitel
-    c.setFont("Helvetica", 24)
-    c.drawCentredString(width/2, height - 4*cm, "Ein Sammelbuch für deutsche Autokennzeichen")
+        # Füge das Bild ins PDF ein (ohne Text)
+        c.drawImage(temp_img_path, 0, 0, width, height)
     
-    # Wenn eine Region angegeben wurde, füge sie unten ein
-    if region_text:
-        c.setFont("Helvetica", 18)
-        c.drawCentredString(width/2, 3*cm, region_text)
-    
-    # Füge den Autor hinzu
-    c.setFont("Helvetica", 12)
-    c.drawCentredString(width/2, 2*cm, author_text)
+        # Füge den Text direkt ins PDF ein
+        draw_title_text(c, width, height, region_text)
     
-    # Speichere das PDF
-    c.save()
+        # Speichere das PDF
+        c.save()
     
-    # Lösche temporäre Dateien
-    os.remove(temp_map_path)
-    os.remove(temp_cloud_path)
-    os.remove(temp_img_path)
-    
-    # Lösche temporäre Kennzeichen-Datei, falls vorhanden
-    if 'temp_license_plate.png' in locals() and os.path.exists('temp_license_plate.png'):
-        os.remove('temp_license_plate.png')
+    finally:
+        # Lösche temporäre Dateien
+        shutil.rmtree(temp_dir, ignore_errors=True)
     
     print(f"Titelbild erfolgreich als PDF erstellt: {pdf_output_path}")
     return pdf_output_path
@@ -484,9 +766,13 @@ def main():
     output_path = os.path.join(output_dir, "kfz_titelbild.pdf")
     region_code = None
     
+    # --vector setzt das Titelbild als Vektorgrafik statt als Bild mit 300 dpi
+    args = [arg for arg in sys.argv[1:] if arg != '--vector']
+    vector = '--vector' in sys.argv[1:]
+    
     # Prüfe, ob ein Kennzeichen als Argument übergeben wurde
-    if len(sys.argv) > 1:
-        region_code = sys.argv[1]
+    if args:
+        region_code = args[0]
         # Wenn ein Kennzeichen angegeben wurde, passe den Ausgabepfad an
         output_path = os.path.join(output_dir, f"kfz_titelbild_{region_code}.pdf")
     
@@ -514,7 +800,8 @@ def main():
         region_code = None
     
     # Erstelle Titelbild
-    title_image_path = create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_to_codes, output_path, region_code)
+    title_image_path = create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_to_codes, output_path, region_code,
+                                          vector=vector)
     
     print(f"Titelbild wurde erstellt: {title_image_path}")
     print("Dieses Bild kann nun als Titelbild für das Sammelbuch verwendet werden.")
@@ -7,18 +7,26 @@ Das jeweilige Kennzeichen wird als Home markiert.
 
 import os
 import sys
-import pandas as pd
 import subprocess
 import time
+import json
+import hashlib
 import concurrent.futures
 from tqdm import tqdm
-import geopandas as gpd
-from create_title_image import load_shapefile, extract_codes_from_shapefile, create_title_image
+from build_manifest import (STAGES, MANIFEST_PATH, load_manifest, save_manifest, stale_stages,
+                            record_stage, stage_outputs)
+from batch_schedule import estimate_costs, load_seconds, order_longest_first, format_duration, BatchEta
+from batch_pipeline import edition_map_dir
+from generate_kfz_maps_neu import load_config
+import stage_timing
+from stage_timing import stage
 
 # Pfade zu den Dateien
 CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kfz-kennz-d.csv")
 SHAPEFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kfz250.utm32s.shape/kfz250/KFZ250.shp")
 OUTPUT_MAPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output_maps")
+BOOKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "all_books")
+SHARD_REPORTS_DIRNAME = "shard_reports"
 
 def load_csv_data(csv_path):
     """
@@ -28,6 +36,8 @@ def load_csv_data(csv_path):
     Returns:
         dict: Dictionary mit Kennzeichen als Schlüssel und Regionsnamen als Werte
     """
+    import pandas as pd
+
     try:
         # Versuche, die CSV-Datei zu laden - die Datei verwendet Kommas als Trennzeichen und hat eine Kopfzeile
         df = pd.read_csv(csv_path, encoding='utf-8', sep=',', header=0)
@@ -67,18 +77,23 @@ def create_title_image_for_code(code):
     Returns:
         str: Pfad zum erstellten Titelbild oder None bei Fehler.
     """
+    # Erst hier importieren, damit --dry-run und --merge ohne wordcloud und geopandas starten
+    from create_title_image import load_shapefile, extract_codes_from_shapefile, create_title_image
+
     try:
         # Stelle sicher, dass das Ausgabeverzeichnis existiert
         os.makedirs(OUTPUT_MAPS_DIR, exist_ok=True)
         
         # Lade das Shapefile
-        gdf = load_shapefile(SHAPEFILE_PATH)
+        with stage("shapefile_load"):
+            gdf = load_shapefile(SHAPEFILE_PATH)
         if gdf is None:
             print(f"Fehler beim Laden des Shapefiles für Titelbild {code}.")
             return None
         
         # Extrahiere die Kennzeichen aus dem Shapefile
-        all_codes, code_to_region, code_to_geometry, region_to_codes = extract_codes_from_shapefile(gdf)
+        with stage("code_extraction"):
+            all_codes, code_to_region, code_to_geometry, region_to_codes = extract_codes_from_shapefile(gdf)
         
         # Prüfe, ob das angegebene Kennzeichen gültig ist
         if code not in code_to_region:
@@ -95,8 +110,10 @@ def create_title_image_for_code(code):
         
         # Erstelle das Titelbild als PDF
         output_path = os.path.join(OUTPUT_MAPS_DIR, f"kfz_titelbild_{code}.pdf")
-        title_image_path = create_title_image(gdf, all_codes, code_to_region, code_to_geometry, 
-                                             region_to_codes, output_path, code, csv_region_name)
+        with stage("title_image"):
+            title_image_path = create_title_image(gdf, all_codes, code_to_region, code_to_geometry, 
+                                                 region_to_codes, output_path, code, csv_region_name,
+                                                 vector=load_config().get('title_vector', False))
         
         print(f"Titelbild für {code} erfolgreich erstellt: {title_image_path}")
         return title_image_path
@@ -104,28 +121,59 @@ def create_title_image_for_code(code):
         print(f"Fehler beim Erstellen des Titelbildes für {code}: {e}")
         return None
 
-def generate_book_for_code(code, max_retries=3):
+def create_title_image_process(code):
+    """
+    Erstellt das Titelbild eines Kennzeichens in einem Worker-Prozess (mit Zeitmessung der Edition).
+    """
+    stage_timing.configure(edition=code)
+    return create_title_image_for_code(code)
+
+def generate_book_for_code(code, max_retries=3, stages=None):
     """
     Generiert ein Sammelbuch für ein bestimmtes Kennzeichen.
     
     Args:
         code (str): Das Kennzeichen, das als Home markiert werden soll.
         max_retries (int): Maximale Anzahl von Wiederholungsversuchen bei Fehlern.
+        stages (list, optional): Auszuführende Stufen aus STAGES. Standardmäßig alle.
     
     Returns:
         bool: True bei Erfolg, False bei Fehler.
     """
-    # Erstelle zuerst das Titelbild für dieses Kennzeichen
-    print(f"Erstelle Titelbild für Kennzeichen {code}...")
-    create_title_image_for_code(code)
+    if stages is None:
+        stages = STAGES
+    stage_timing.configure(edition=code)
+    
+    # Erstelle zuerst das Titelbild für dieses Kennzeichen. Es läuft wie die übrigen Stufen in
+    # einem eigenen Prozess, damit der Speicher von Shapefile, matplotlib und PIL nicht über
+    # alle Editionen im langlebigen Hauptprozess anwächst.
+    if "title" in stages:
+        print(f"Erstelle Titelbild für Kennzeichen {code}...")
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                title_path = executor.submit(create_title_image_process, code).result()
+        except Exception as e:
+            print(f"Unerwarteter Fehler beim Titelbild für {code}: {str(e)}")
+            title_path = None
+        if not title_path or not os.path.exists(title_path):
+            print(f"Titelbild für {code} konnte nicht erstellt werden. Überspringe {code}.")
+            return False
+    
+    book_stages = [stage_name for stage_name in stages if stage_name != "title"]
+    if not book_stages:
+        return True
     
     # Führe das Hauptskript mit dem Kennzeichen als Home aus
-    # Wir lassen das Suffix leer, da das Hauptskript bereits das Kennzeichen im Dateinamen verwendet
+    # Wir lassen das Suffix leer, da das Hauptskript bereits das Kennzeichen im Dateinamen verwendet.
+    # Jede Edition bekommt wie in der Pipeline ein eigenes Kartenverzeichnis, sonst überschreibt
+    # die nächste Edition die Karten, deren Hashes im Manifest für diese Edition stehen.
     cmd = [
         sys.executable,
         "generate_kfz_maps_neu.py",
         "--home", code,
-        "--suffix", ""
+        "--suffix", "",
+        "--stages", ",".join(book_stages),
+        "--map-dir", edition_map_dir(code)
     ]
     
     print(f"Starte Generierung für Kennzeichen {code}...")
@@ -151,85 +199,409 @@ def generate_book_for_code(code, max_retries=3):
             print(f"Maximale Anzahl von Versuchen erreicht. Überspringe {code}.")
             return False
 
-def main():
+def move_final_pdf(code, output_dir):
+    """
+    Verschiebt das fertige PDF eines Kennzeichens in den Ausgabeordner.
+    
+    Returns:
+        str: Zielpfad des PDFs oder None, wenn keine Datei gefunden wurde.
+    """
+    # Das Format ist kfz_sammelbuch_CODE_printerfriendly_final.pdf bzw. kfz_sammelbuch_CODE_final.pdf
+    for pdf_file in [f"kfz_sammelbuch_{code}_printerfriendly_final.pdf", f"kfz_sammelbuch_{code}_final.pdf"]:
+        if os.path.exists(pdf_file):
+            target_path = os.path.join(output_dir, pdf_file)
+            os.replace(pdf_file, target_path)
+            print(f"PDF {pdf_file} in {output_dir} verschoben.")
+            return target_path
+    
+    print(f"Warnung: Keine PDF-Datei für Kennzeichen {code} gefunden.")
+    return None
+
+def plan_builds(codes, manifest, config, force=False):
+    """
+    Bestimmt für jedes Kennzeichen die veralteten Stufen.
+    
+    Returns:
+        dict: Kennzeichen -> {Stufe: Grund} (nur Kennzeichen mit veralteten Stufen)
+    """
+    plan = {}
+    for code in codes:
+        if force:
+            stale = {stage_name: "erzwungen" for stage_name in STAGES}
+        else:
+            stale = stale_stages(manifest, code, config)
+        if stale:
+            plan[code] = stale
+    return plan
+
+def print_build_plan(plan, total):
+    """
+    Gibt aus, welche Stufen für welche Kennzeichen neu gebaut würden.
+    """
+    print(f"\n{len(plan)} von {total} Editionen müssen (teilweise) neu gebaut werden.")
+    for code, stale in plan.items():
+        reasons = ", ".join(f"{stage_name} ({reason})" for stage_name, reason in stale.items())
+        print(f"  {code}: {reasons}")
+    for stage_name in STAGES:
+        count = sum(1 for stale in plan.values() if stage_name in stale)
+        print(f"Stufe {stage_name}: {count} Editionen")
+
+def record_book(manifest, code, stages, config, output_dir, manifest_path=MANIFEST_PATH, maps_dir="output_maps"):
+    """
+    Zeichnet die gebauten Stufen eines Kennzeichens im Manifest auf.
+    """
+    for stage_name in STAGES:
+        if stage_name not in stages:
+            continue
+        outputs = stage_outputs(stage_name, code, books_dir=output_dir if stage_name == "final" else None,
+                                maps_dir=maps_dir)
+        record_stage(manifest, code, stage_name, outputs, config)
+    save_manifest(manifest, manifest_path)
+
+def parse_shard(shard_text):
+    """
+    Liest eine Shard-Angabe im Format "i/n" (1 <= i <= n).
+    
+    Returns:
+        tuple: (i, n)
+    """
+    try:
+        index_text, count_text = shard_text.split("/")
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Ungültige Shard-Angabe '{shard_text}', erwartet wird z.B. '1/4'")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Ungültige Shard-Angabe '{shard_text}', es muss 1 <= i <= n gelten")
+    return index, count
+
+def shard_for_code(code, shard_count):
+    """
+    Ordnet ein Kennzeichen über einen stabilen Hash einem Shard (1..n) zu.
+    Die Zuordnung hängt nur vom Kennzeichen ab, nicht von der Reihenfolge oder Anzahl der Kennzeichen,
+    sodass mehrere Rechner unabhängig voneinander disjunkte Teilmengen bauen können.
+    """
+    digest = hashlib.sha1(code.encode("utf-8")).hexdigest()
+    return int(digest, 16) % shard_count + 1
+
+def select_codes(all_codes, codes=None, shard=None, exclude_done=False, output_dir=BOOKS_DIR):
+    """
+    Wählt die zu bauenden Kennzeichen aus.
+    
+    Args:
+        all_codes (list): Alle Kennzeichen aus der CSV-Datei
+        codes (list, optional): Nur diese Kennzeichen bauen (None = alle)
+        shard (tuple, optional): (i, n) - nur die Kennzeichen des i-ten von n Shards bauen
+        exclude_done (bool): Kennzeichen überspringen, deren fertiges PDF bereits im Ausgabeordner liegt
+        output_dir (str): Ausgabeordner der fertigen PDFs
+    
+    Returns:
+        tuple: (ausgewählte Kennzeichen, wegen exclude_done übersprungene Kennzeichen) oder
+               (None, None), wenn ein angegebenes Kennzeichen unbekannt ist
+    """
+    if codes is not None:
+        unknown_codes = [code for code in codes if code not in all_codes]
+        if unknown_codes:
+            print(f"Kennzeichen nicht gefunden: {', '.join(unknown_codes)}")
+            return None, None
+        selected = list(dict.fromkeys(codes))
+    else:
+        selected = list(all_codes)
+    
+    if shard is not None:
+        index, count = shard
+        selected = [code for code in selected if shard_for_code(code, count) == index]
+        print(f"Shard {index}/{count}: {len(selected)} Kennzeichen")
+    
+    done = []
+    if exclude_done:
+        done = [code for code in selected if find_final_pdf(code, output_dir)]
+        if done:
+            print(f"Überspringe {len(done)} bereits fertige Kennzeichen")
+        selected = [code for code in selected if code not in done]
+    
+    return selected, done
+
+def find_final_pdf(code, output_dir):
+    """
+    Sucht das fertige PDF eines Kennzeichens im Ausgabeordner.
+    
+    Returns:
+        str: Pfad zum PDF oder None
+    """
+    for pdf_file in [f"kfz_sammelbuch_{code}_printerfriendly_final.pdf", f"kfz_sammelbuch_{code}_final.pdf"]:
+        pdf_path = os.path.join(output_dir, pdf_file)
+        if os.path.exists(pdf_path):
+            return pdf_path
+    return None
+
+def shard_report_path(output_dir, shard):
+    """
+    Gibt den Pfad des Berichts eines Shards zurück. Ohne Sharding gilt der Lauf als Shard 1/1.
+    """
+    index, count = shard if shard else (1, 1)
+    return os.path.join(output_dir, SHARD_REPORTS_DIRNAME, f"shard_{index}_of_{count}.json")
+
+def write_shard_report(report_path, report):
+    """
+    Speichert den Bericht eines Shards (gebaute, unveränderte und fehlgeschlagene Kennzeichen).
+    """
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    temp_path = report_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, report_path)
+
+def merge_shard_reports(all_codes, output_dir=BOOKS_DIR):
+    """
+    Führt die Berichte aller Shards zusammen und prüft, dass jedes Kennzeichen
+    genau einmal gebaut wurde und sein fertiges PDF im Ausgabeordner liegt.
+    
+    Returns:
+        bool: True, wenn alle Kennzeichen genau einmal gebaut wurden
+    """
+    reports_dir = os.path.join(output_dir, SHARD_REPORTS_DIRNAME)
+    if not os.path.isdir(reports_dir):
+        print(f"Fehler: Keine Shard-Berichte in {reports_dir} gefunden.")
+        return False
+    
+    reports = []
+    for file_name in sorted(os.listdir(reports_dir)):
+        if file_name.startswith("shard_") and file_name.endswith(".json"):
+            with open(os.path.join(reports_dir, file_name), "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+    if not reports:
+        print(f"Fehler: Keine Shard-Berichte in {reports_dir} gefunden.")
+        return False
+    
+    ok = True
+    shard_counts = {report["shard"][1] for report in reports}
+    if len(shard_counts) > 1:
+        print(f"Fehler: Berichte mit unterschiedlicher Shard-Anzahl gefunden: {sorted(shard_counts)}")
+        ok = False
+    else:
+        count = shard_counts.pop()
+        missing_shards = sorted(set(range(1, count + 1)) - {report["shard"][0] for report in reports})
+        if missing_shards:
+            print(f"Fehler: Berichte für Shards {missing_shards} von {count} fehlen.")
+            ok = False
+    
+    # Ein Kennzeichen gilt als gebaut, wenn es in diesem oder einem früheren Lauf des Shards gebaut wurde
+    built_by = {}
+    for report in reports:
+        shard_name = f"{report['shard'][0]}/{report['shard'][1]}"
+        for code in report["built"] + report["up_to_date"]:
+            built_by.setdefault(code, []).append(shard_name)
+    
+    duplicates = {code: shards for code, shards in built_by.items() if len(shards) > 1}
+    missing = [code for code in all_codes if code not in built_by]
+    without_pdf = [code for code in built_by if not find_final_pdf(code, output_dir)]
+    failed = sorted({code for report in reports for code in report["failed"]})
+    
+    if duplicates:
+        ok = False
+        print(f"Fehler: {len(duplicates)} Kennzeichen wurden mehrfach gebaut:")
+        for code, shards in sorted(duplicates.items()):
+            print(f"  {code}: Shards {', '.join(shards)}")
+    if missing:
+        ok = False
+        print(f"Fehler: {len(missing)} Kennzeichen wurden nicht gebaut: {', '.join(missing)}")
+    if without_pdf:
+        ok = False
+        print(f"Fehler: Für {len(without_pdf)} Kennzeichen fehlt das PDF: {', '.join(sorted(without_pdf))}")
+    if failed:
+        print(f"Fehlgeschlagene Kennzeichen: {', '.join(failed)}")
+    
+    if ok:
+        print(f"Alle {len(all_codes)} Kennzeichen wurden genau einmal gebaut ({len(reports)} Shards).")
+    return ok
+
+def main(codes=None, shard=None, exclude_done=False, dry_run=False, force=False,
+         output_dir=BOOKS_DIR, manifest_path=MANIFEST_PATH, pipeline=False,
+         render_workers=None, latex_workers=None, queue_size=2, max_editions_per_worker=None,
+         max_worker_rss_mb=None, max_images=None):
     """
     Hauptfunktion zum Ausführen des Skripts.
+    
+    Args:
+        codes (list, optional): Nur diese Kennzeichen bauen (None = alle Kennzeichen der CSV-Datei)
+        shard (tuple, optional): (i, n) - nur die Kennzeichen des i-ten von n Shards bauen
+        exclude_done (bool): Kennzeichen überspringen, deren fertiges PDF bereits existiert
+        dry_run (bool): Zeigt nur an, welche Stufen neu gebaut würden.
+        force (bool): Baut alle Stufen neu, unabhängig vom Build-Manifest.
+        output_dir (str): Ausgabeordner für die fertigen PDFs
+        manifest_path (str): Pfad zum Build-Manifest
+        pipeline (bool): Bücher überlappend bauen (siehe batch_pipeline.py): Rendern im Prozess-Pool,
+                         xelatex als asynchrone Unterprozesse, begrenzte Warteschlangen dazwischen
+        render_workers (int, optional): Anzahl der Render-Prozesse der Pipeline
+        latex_workers (int, optional): Anzahl der gleichzeitigen xelatex-Läufe der Pipeline
+        queue_size (int): Maximale Anzahl wartender Bücher zwischen zwei Stufen der Pipeline
+        max_editions_per_worker (int, optional): Render-Worker der Pipeline nach so vielen Editionen
+                                                 durch einen neuen Prozess ersetzen
+        max_worker_rss_mb (float, optional): Render-Worker ersetzen, sobald sein Arbeitsspeicher
+                                             diese Grenze (in MB) überschreitet
+        max_images (int, optional): Höchstens so viele Kartenseiten pro Render-Worker gleichzeitig
+                                    in voller Auflösung
+    
+    Returns:
+        bool: True, wenn alle ausgewählten Bücher erfolgreich gebaut wurden
     """
     print("KFZ-Kennzeichen Sammelbuch Generator für alle Kennzeichen")
     print("=======================================================")
     
     # Lade die Kennzeichen aus der CSV-Datei
-    codes = load_csv_data(CSV_PATH)
-    if not codes:
+    code_to_region = load_csv_data(CSV_PATH)
+    if not code_to_region:
         print("Fehler: Keine Kennzeichen gefunden.")
-        return
+        return False
+    all_codes = list(code_to_region)
+    print(f"\nEs wurden {len(all_codes)} Kennzeichen gefunden.")
     
     # Erstelle den Ausgabeordner für alle Bücher
-    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "all_books")
     os.makedirs(output_dir, exist_ok=True)
     
-    # Frage den Benutzer, ob alle Bücher generiert werden sollen
-    print(f"\nEs wurden {len(codes)} Kennzeichen gefunden.")
-    user_input = input(f"Möchten Sie für alle {len(codes)} Kennzeichen ein Buch generieren? (j/n): ")
+    selected_codes, done_codes = select_codes(all_codes, codes, shard, exclude_done, output_dir)
+    if selected_codes is None:
+        return False
     
-    if user_input.lower() not in ['j', 'ja', 'y', 'yes']:
-        # Frage nach einem bestimmten Kennzeichen oder einer Teilmenge
-        user_input = input("Geben Sie ein einzelnes Kennzeichen oder eine Anzahl ein (z.B. '10' für die ersten 10): ")
-        
-        if user_input.isdigit():
-            # Begrenze die Anzahl der zu generierenden Bücher
-            num_codes = min(int(user_input), len(codes))
-            codes = codes[:num_codes]
-            print(f"Generiere Bücher für die ersten {num_codes} Kennzeichen.")
-        else:
-            # Suche nach dem angegebenen Kennzeichen
-            user_code = user_input.upper()
-            if user_code in codes:
-                codes = [user_code]
-                print(f"Generiere Buch nur für das Kennzeichen {user_code}.")
-            else:
-                print(f"Kennzeichen {user_code} nicht gefunden. Breche ab.")
-                return
+    # Bestimme anhand des Build-Manifests, welche Stufen veraltet sind
+    config = load_config()
+    manifest = load_manifest(manifest_path)
+    plan = plan_builds(selected_codes, manifest, config, force)
+    print_build_plan(plan, len(selected_codes))
+    
+    # Teuerste Bücher zuerst, geschätzt aus den Zeitmessungen früherer Läufe
+    # Im sequentiellen Build lädt jedes Buch die Daten, in der Pipeline jeder Render-Worker einmal
+    records = stage_timing.load_records(stage_timing.timings_dir())
+    costs, measured = estimate_costs(plan, records, per_book_load=not pipeline)
+    plan = order_longest_first(plan, costs)
+    if pipeline:
+        from batch_pipeline import default_workers
+        workers = render_workers or default_workers()[0]
+        overhead = load_seconds(records)
+    else:
+        workers = 1
+        overhead = 0.0
+    if plan:
+        print(f"Geschätzte Dauer: {format_duration(overhead + sum(costs.values()) / workers)} "
+              f"({measured} von {len(plan)} Editionen mit eigener Zeitmessung)")
+        print("Teuerste Editionen zuerst: " + ", ".join(
+            f"{code} ({costs[code]:.0f} s)" for code in list(plan)[:5]))
+    
+    if dry_run:
+        print("\nTrockenlauf: Es wird nichts gebaut.")
+        return True
+    
+    # Der Bericht hält fest, welche Kennzeichen dieser Shard gebaut hat
+    report_path = shard_report_path(output_dir, shard)
+    report = {
+        "shard": list(shard) if shard else [1, 1],
+        "built": [],
+        # Mit --exclude-done übersprungene Bücher sind fertig und fehlen beim Zusammenführen nicht
+        "up_to_date": done_codes + [code for code in selected_codes if code not in plan],
+        "failed": [],
+    }
+    write_shard_report(report_path, report)
     
     # Generiere die Bücher
-    print(f"\nGeneriere {len(codes)} Bücher...")
+    print(f"\nGeneriere {len(plan)} Bücher...")
     
-    # Verwende einen Fortschrittsbalken
-    with tqdm(total=len(codes), desc="Fortschritt") as pbar:
-        # Sequentielle Verarbeitung (sicherer, aber langsamer)
-        for code in codes:
-            success = generate_book_for_code(code)
+    # Verwende einen Fortschrittsbalken, die Restzeit kommt aus den geschätzten Kosten
+    eta = BatchEta(costs, workers, overhead)
+    with tqdm(total=len(plan), desc="Fortschritt",
+              bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}{postfix}]") as pbar:
+        pbar.set_postfix_str(eta.describe())
+        def finish_book(code, stages, success, maps_dir="output_maps"):
             if success:
                 # Verschiebe die generierten Dateien in den Ausgabeordner
-                # Das Format sollte jetzt kfz_sammelbuch_CODE_final.pdf sein
-                pdf_file = f"kfz_sammelbuch_{code}_final.pdf"
-                if os.path.exists(pdf_file):
-                    target_path = os.path.join(output_dir, pdf_file)
-                    os.rename(pdf_file, target_path)
-                    print(f"PDF {pdf_file} in {output_dir} verschoben.")
-                else:
-                    # Suche nach Dateien mit dem Kennzeichen im Namen
-                    found = False
-                    for file in os.listdir():
-                        if "_final.pdf" in file and code in file:
-                            target_path = os.path.join(output_dir, file)
-                            os.rename(file, target_path)
-                            print(f"PDF {file} in {output_dir} verschoben.")
-                            found = True
-                            break
-                    
-                    if not found:
-                        print(f"Warnung: Keine PDF-Datei für Kennzeichen {code} gefunden.")
-                        
+                if "final" in stages:
+                    move_final_pdf(code, output_dir)
+                record_book(manifest, code, stages, config, output_dir, manifest_path, maps_dir)
+                report["built"].append(code)
+            else:
+                report["failed"].append(code)
+            write_shard_report(report_path, report)
+            eta.done(code, success)
+            pbar.set_postfix_str(eta.describe(), refresh=False)
             pbar.update(1)
-    
-    # Zähle die erfolgreich generierten Bücher
-    generated_files = [f for f in os.listdir(output_dir) if f.endswith("_final.pdf")]
+        
+        if pipeline:
+            from batch_pipeline import build_all, DEFAULT_MAX_EDITIONS_PER_WORKER
+            if max_editions_per_worker is None:
+                max_editions_per_worker = DEFAULT_MAX_EDITIONS_PER_WORKER
+            build_all(plan, finish_book, render_workers, latex_workers, queue_size,
+                      max_editions_per_worker, max_worker_rss_mb, max_images)
+        else:
+            # Sequentielle Verarbeitung (sicherer, aber langsamer)
+            for code, stale in plan.items():
+                stages = list(stale)
+                finish_book(code, stages, generate_book_for_code(code, stages=stages), edition_map_dir(code))
     
     print("\n=======================================================")
-    print(f"Fertig! {len(generated_files)} von {len(codes)} Büchern wurden erfolgreich generiert.")
+    print(f"Fertig! {len(report['built'])} von {len(plan)} Büchern wurden erfolgreich generiert "
+          f"({len(report['up_to_date'])} waren bereits aktuell).")
+    if report["failed"]:
+        print(f"Fehlgeschlagen: {', '.join(report['failed'])}")
     print(f"Die PDFs befinden sich im Verzeichnis: {output_dir}")
     print("=======================================================")
+    return not report["failed"]
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generiert Sammelbücher für alle Kennzeichen")
+    selection = parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--codes", type=str,
+                           help="Kommagetrennte Liste der zu bauenden Kennzeichen, z.B. 'HH,M,B'")
+    selection.add_argument("--all", action="store_true",
+                           help="Bücher für alle Kennzeichen der CSV-Datei bauen")
+    selection.add_argument("--merge", action="store_true",
+                           help="Shard-Berichte zusammenführen und prüfen, dass jedes Kennzeichen genau einmal gebaut wurde")
+    parser.add_argument("--shard", type=str,
+                        help="Nur den i-ten von n Shards bauen (Format 'i/n', z.B. '2/4')")
+    parser.add_argument("--exclude-done", action="store_true",
+                        help="Kennzeichen überspringen, deren fertiges PDF bereits im Ausgabeordner liegt")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Zeigt nur an, welche Stufen neu gebaut würden")
+    parser.add_argument("--force", action="store_true",
+                        help="Baut alle Stufen neu, unabhängig vom Build-Manifest")
+    parser.add_argument("--output-dir", type=str, default=BOOKS_DIR,
+                        help="Ausgabeordner für die fertigen PDFs")
+    parser.add_argument("--manifest", type=str, default=MANIFEST_PATH,
+                        help="Pfad zum Build-Manifest")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Bücher überlappend bauen: Rendern im Prozess-Pool, gleichzeitig xelatex für fertige Vorlagen")
+    parser.add_argument("--render-workers", type=int,
+                        help="Anzahl der Render-Prozesse der Pipeline (Standard: die Hälfte der Kerne)")
+    parser.add_argument("--latex-workers", type=int,
+                        help="Anzahl der gleichzeitigen xelatex-Läufe der Pipeline (Standard: die übrigen Kerne)")
+    parser.add_argument("--queue-size", type=int, default=2,
+                        help="Maximale Anzahl wartender Bücher zwischen zwei Stufen der Pipeline")
+    parser.add_argument("--max-editions-per-worker", type=int,
+                        help="Render-Worker der Pipeline nach so vielen Editionen ersetzen (Standard: 20, 0 = nie)")
+    parser.add_argument("--max-worker-rss", type=float,
+                        help="Render-Worker der Pipeline ersetzen, sobald er mehr als so viele MB Arbeitsspeicher belegt")
+    parser.add_argument("--max-images", type=int,
+                        help="Höchstens so viele Kartenseiten pro Render-Worker gleichzeitig in voller Auflösung rastern")
+    
+    args = parser.parse_args()
+    
+    if args.merge:
+        code_to_region = load_csv_data(CSV_PATH)
+        success = bool(code_to_region) and merge_shard_reports(list(code_to_region), args.output_dir)
+        sys.exit(0 if success else 1)
+    
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    codes = None
+    if args.codes:
+        codes = [code.strip().upper() for code in args.codes.split(",") if code.strip()]
+    
+    success = main(codes=codes, shard=shard, exclude_done=args.exclude_done, dry_run=args.dry_run,
+                   force=args.force, output_dir=args.output_dir, manifest_path=args.manifest,
+                   pipeline=args.pipeline, render_workers=args.render_workers,
+                   latex_workers=args.latex_workers, queue_size=args.queue_size,
+                   max_editions_per_worker=args.max_editions_per_worker,
+                   max_worker_rss_mb=args.max_worker_rss, max_images=args.max_images)
+    sys.exit(0 if success else 1)
@@ -9,6 +9,8 @@ import os
 from normalizer import normalize_text
 import random
 from book_sections import generate_license_section
+from locator_maps import code_locator_maps, locator_graphic
+from plate_atlas import load_plate_atlas
 
 # Konstanten
 CODES_PER_PAGE = 20    # Anzahl der Kennzeichen pro Seite für reguläre Kennzeichen
@@ -905,8 +907,12 @@ def generate_puzzle_section(regular_codes, code_to_name, config=None, home_print
     # Generiere Buchstabenrätsel
     letter_puzzle_content, letter_solution_text = generate_letter_finding_puzzle(regular_codes, code_to_name, config)
     
-    # Generiere Worträtsel
-    word_puzzle_content, word_solution_text = generate_word_puzzles(regular_codes, code_to_name, home_printer)
+    # Generiere Worträtsel (im Entwurfsmodus entfällt die Suche nach Wörtern, nur ein Platzhalter)
+    if config and config.get('draft'):
+        word_puzzle_content = r"\fbox{Worträtsel (im Entwurf ausgelassen)}" + "\n"
+        word_solution_text = ""
+    else:
+        word_puzzle_content, word_solution_text = generate_word_puzzles(regular_codes, code_to_name, home_printer)
     
     # Generiere Verbindungsrätsel
     matching_puzzle_content, matching_solution_text = generate_matching_puzzle(regular_codes, code_to_name, config)
@@ -960,22 +966,62 @@ def generate_puzzle_section(regular_codes, code_to_name, config=None, home_print
     
     return puzzle_content
 
+def plate_label(code, plate_atlas):
+    """
+    Gibt das Kennzeichen für die Checkliste zurück: als Bild aus dem Atlas, falls vorhanden, sonst fett als Text.
+    """
+    if plate_atlas and code in plate_atlas["plates"]:
+        return r"\kfzplate{" + code + "}"
+    return r"\textbf{" + code + "}"
+
+def reset_document_state():
+    """
+    Setzt die Merker zurück, welche Infoboxen im Dokument bereits gezeigt wurden, damit mehrere
+    Dokumente im selben Prozess (z.B. im Watch-Modus) gleich aufgebaut werden.
+    """
+    global largest_region_shown, special_fact_shown
+    used_extreme_positions.clear()
+    used_letter_matching_codes.clear()
+    largest_region_shown = False
+    special_fact_shown = False
+
 def generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_state, code_to_other_codes, gdf, code_to_region, code_to_name_multi=None, config=None, output_file="kfz_sammelbuch.tex"):
     """
     Generiert eine LaTeX-Vorlage für das Sammelbuch mit Kennzeichen zum Ankreuzen.
     """
+    reset_document_state()
+    
     # Berechne die Anzahl der Seiten
     num_regular_pages = (len(regular_codes) + CODES_PER_PAGE - 1) // CODES_PER_PAGE
     num_rare_pages = (len(rare_codes) + RARE_CODES_PER_PAGE - 1) // RARE_CODES_PER_PAGE
     
-    latex_content = r"""\documentclass[a4paper]{article}
-% Font setup for XeLaTeX to use Futura
+    # Im Entwurfsmodus: Karten aus output_maps/draft, Kennzeichen und Lagekarten nur als Text,
+    # "draft" markiert zu lange Zeilen (die Karten bleiben mit graphicx "final" sichtbar)
+    from map_creator import map_output_dir, home_region_map_name
+    
+    draft = bool(config and config.get('draft'))
+    map_dir = map_output_dir(config).replace(os.sep, "/")
+    
+    if draft:
+        code_to_locator = {}
+        plate_atlas = None
+    else:
+        # Kleine Lagekarte für jedes Kennzeichen mit Region (einmal als Atlas gerendert, dann aus cache/)
+        code_to_locator = code_locator_maps(gdf, regular_codes + rare_codes, code_to_region)
+        
+        # Kennzeichen-Bilder aus einem gemeinsamen Atlas (ohne cairosvg werden die Kennzeichen als Text gesetzt)
+        plate_backend = config.get('plate_backend', 'svg') if config else 'svg'
+        plate_atlas = load_plate_atlas(regular_codes + rare_codes, backend=plate_backend)
+    
+    latex_content = r"\documentclass[" + ("a4paper,draft" if draft else "a4paper") + "]{article}\n"
+    latex_content += r"""% Font setup for XeLaTeX to use Futura
 \usepackage{fontspec}
 \setmainfont{Futura}
 \setsansfont{Futura}
 \usepackage[ngerman]{babel}
-\usepackage{graphicx}
-\usepackage{geometry}
+"""
+    latex_content += (r"\usepackage[final]{graphicx}" if draft else r"\usepackage{graphicx}") + "\n"
+    latex_content += r"""\usepackage{geometry}
 \usepackage{tabularx}
 \usepackage{booktabs}
 \usepackage{array}
@@ -993,7 +1039,13 @@ def generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_sta
 \usepackage{hyperref}
 \usepackage{tcolorbox}
 \tcbuselibrary{skins}
-
+"""
+    
+    # Makros zum Ausschneiden der Kennzeichen aus dem Atlas
+    if plate_atlas:
+        latex_content += r"\input{" + plate_atlas["macros"] + "}\n"
+    
+    latex_content += r"""
 \geometry{a4paper, margin=1.5cm}
 \setlength{\columnsep}{1cm}
 
@@ -1014,6 +1066,15 @@ def generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_sta
 \clearpage
 """
     
+    # Füge die vergrößerte Karte der Home-Region ein, wenn build_maps sie erstellt (dieselbe
+    # Bedingung wie in create_home_region_map, die Stufe "tex" läuft ggf. vor den Karten)
+    home_code = str(config.get('home', '')).strip() if config else ''
+    if home_region_map_name(gdf, code_to_region, config) is not None:
+        latex_content += r"\section{Deine Umgebung}" + "\n\n"
+        latex_content += r"\begin{center}" + "\n"
+        latex_content += r"\includegraphics[width=\textwidth,height=0.8\textheight,keepaspectratio]{" + f"{map_dir}/kfz_umgebung_{home_code}.png" + "}\n"
+        latex_content += r"\end{center}" + "\n\n"
+    
     # Füge die Karten und Checklisten ein
     for page in range(1, num_regular_pages + 1):
         
@@ -1039,14 +1100,16 @@ def generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_sta
         # Füge die Kennzeichen in die Liste ein
         for code in page_codes:
             region_name = normalize_text(code_to_name.get(code, ''))
-            latex_content += r"\item \checkbox~\textbf{" + code + r"} " + region_name + "\n"
+            locator = locator_graphic(code_to_locator[code]) if code in code_to_locator else ""
+            plate = plate_label(code, plate_atlas)
+            latex_content += r"\item \checkbox~" + locator + plate + " " + region_name + "\n"
         
         latex_content += r"\end{enumerate}" + "\n"
         latex_content += r"\end{multicols}" + "\n\n"
         
         # Füge die Deutschlandkarte unter der Liste ein
         latex_content += r"\begin{center}" + "\n"
-        latex_content += r"\includegraphics[width=0.8\textwidth,height=0.5\textheight,keepaspectratio]{" + f"output_maps/kfz_karte_seite_{page:02d}.png" + "}\n"
+        latex_content += r"\includegraphics[width=0.8\textwidth,height=0.5\textheight,keepaspectratio]{" + f"{map_dir}/kfz_karte_seite_{page:02d}.png" + "}\n"
         latex_content += r"\end{center}" + "\n\n"
         
         # Füge den Informationskasten hinzu, falls vorhanden
@@ -1079,7 +1142,9 @@ def generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_sta
             # Füge die Kennzeichen in die Liste ein
             for code in page_codes:
                 region_name = normalize_text(code_to_name.get(code, ''))
-                latex_content += r"\item \checkbox~\textbf{" + code + r"} " + region_name + "\n"
+                locator = locator_graphic(code_to_locator[code]) if code in code_to_locator else ""
+                plate = plate_label(code, plate_atlas)
+                latex_content += r"\item \checkbox~" + locator + plate + " " + region_name + "\n"
             
             latex_content += r"\end{enumerate}" + "\n"
             
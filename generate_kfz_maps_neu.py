@@ -10,19 +10,17 @@ import sys
 import subprocess
 import shutil
 import json
-import pandas as pd
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import fiona
 import re
-import PyPDF2
-from PIL import Image
-import io
+
+# pandas, geopandas, fiona, matplotlib und PyPDF2 werden erst in den Funktionen importiert,
+# die sie brauchen, damit z.B. die Stufen pdf und final ohne die Geodaten-Bibliotheken starten.
 
 # Import der Home-Printer-Version der LaTeX-Generierung
 from generate_home_print_latex_template import generate_latex_template
 from normalizer import normalize_text
-from map_creator import create_map_pages_for_home_printer, create_map_pages_for_professional_print
+from build_manifest import BOOK_STAGES
+import stage_timing
+from stage_timing import stage
 
 
 # Funktion zum Bearbeiten des PDFs
@@ -41,7 +39,16 @@ def process_pdf(pdf_path, output_path="kfz_sammelbuch_final.pdf", config=None, h
         home_code = config.get('home', '')
     title_image_path = ""
     
+    # Im Entwurfsmodus zuerst das Titelbild aus output_maps/draft. Hat das Home-Kennzeichen keine
+    # Region, entsteht es dort unter dem allgemeinen Namen (siehe create_book_title_image).
+    draft_title_images = ["output_maps/draft/kfz_titelbild.pdf"]
     if home_code:
+        draft_title_images.insert(0, f"output_maps/draft/kfz_titelbild_{home_code}.pdf")
+    draft_title_image = next((path for path in draft_title_images if os.path.exists(path)), None)
+    if config is not None and config.get('draft') and draft_title_image:
+        title_image_path = draft_title_image
+        print(f"Verwende das Titelbild des Entwurfs: {title_image_path}")
+    elif home_code:
         region_title_image = f"output_maps/kfz_titelbild_{home_code}.pdf"
         if os.path.exists(region_title_image):
             title_image_path = region_title_image
@@ -98,12 +105,6 @@ def process_pdf(pdf_path, output_path="kfz_sammelbuch_final.pdf", config=None, h
     print(f"Bearbeitetes PDF gespeichert als: {output_path}")
     return output_path
 
-import numpy as np
-import matplotlib.patches as patches
-from shapely.geometry import Point
-import re
-import random
-
 # Konstanten
 SHAPEFILE_PATH = "kfz250.utm32s.shape/kfz250/KFZ250.shp"
 CSV_PATH = "kfz-kennz-d.csv"
@@ -120,6 +121,8 @@ def load_shapefile(shapefile_path):
     Lädt ein Shapefile und gibt ein GeoDataFrame zurück.
     Versucht verschiedene Kodierungen, falls die Standardkodierung fehlschlägt.
     """
+    import geopandas as gpd
+
     print("Versuche Shapefile zu laden...")
     
     # Versuche zuerst mit UTF-8
@@ -141,6 +144,7 @@ def load_shapefile(shapefile_path):
     # Versuche mit fiona direkt
     try:
         print("Versuche mit fiona zu laden...")
+        import fiona
         with fiona.open(shapefile_path) as f:
             gdf = gpd.GeoDataFrame.from_features(f, crs=f.crs)
         print("Shapefile erfolgreich mit fiona geladen")
@@ -160,7 +164,14 @@ def load_config():
     """
     config = {
         "home": None,
-        "version": "Version 1.1.0 Aalen Ostalbkreis"
+        "version": "Version 1.1.0 Aalen Ostalbkreis",
+        "hybrid_print": False,  # Professionelles Layout: Hintergrund gerastert, Regionen und Labels als Vektoren
+        "map_threads": 1,  # Anzahl der Threads, auf die die Kartenseiten verteilt werden
+        "max_full_res_images": None,  # Höchstens so viele Kartenseiten gleichzeitig in voller Auflösung rastern (None = unbegrenzt)
+        "map_engine": "matplotlib",  # Heimdrucker-Karten mit "matplotlib" oder direkt mit "cairo" zeichnen
+        "plate_backend": "svg",  # Kennzeichen-Atlas mit "svg" (cairosvg) oder "font" (PIL und EuroPlate.ttf) erzeugen
+        "title_vector": False,  # Titelbild als Vektorgrafik statt als Bild mit 300 dpi setzen
+        "draft": False  # Entwurfsmodus: Karten mit wenig dpi, ein xelatex-Lauf, keine Worträtsel (--draft)
     }
     config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
     
@@ -191,6 +202,8 @@ def load_octoate_csv_data(csv_path):
     
     Die Octoate CSV hat ein einfacheres Format mit nur zwei Spalten: Kennzeichen und Regionsname
     """
+    import pandas as pd
+
     print(f"Lade Octoate CSV-Datei: {csv_path}")
     try:
         # Lese die CSV-Datei
@@ -249,6 +262,8 @@ def load_csv_data(csv_path):
     Lädt die CSV-Datei mit den KFZ-Kennzeichen und gibt zwei Dictionaries zurück:
     Kennzeichen zu Regionsnamen und Kennzeichen zu Bundesland
     """
+    import pandas as pd
+
     print(f"Lade CSV-Datei: {csv_path}")
     try:
         # Lese die CSV-Datei
@@ -444,9 +459,10 @@ def extract_kfz_codes(gdf):
     
     return regular_codes, rare_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, code_to_name_multi
 
-def compile_latex_document(tex_file):
+def compile_latex_document(tex_file, runs=2):
     """
     Kompiliert ein LaTeX-Dokument zu PDF mit XeLaTeX für Futura-Schriftart.
+    Mit runs=1 (Entwurfsmodus) stimmt das Inhaltsverzeichnis erst ab dem zweiten Entwurf.
     """
     # Prüfe, ob xelatex installiert ist
     if shutil.which("xelatex") is None:
@@ -455,14 +471,15 @@ def compile_latex_document(tex_file):
     
     try:
         # Führe xelatex zweimal aus, um Inhaltsverzeichnis korrekt zu erstellen
-        for _ in range(2):
+        for run in range(runs):
             # Verwende text=False, um die Ausgabe als Binärdaten zu behandeln
-            process = subprocess.run(
-                ["xelatex", "-interaction=nonstopmode", tex_file],
-                capture_output=True,
-                text=False,  # Wichtig: Behandle die Ausgabe als Binärdaten
-                check=False
-            )
+            with stage("xelatex", run=run + 1):
+                process = subprocess.run(
+                    ["xelatex", "-interaction=nonstopmode", tex_file],
+                    capture_output=True,
+                    text=False,  # Wichtig: Behandle die Ausgabe als Binärdaten
+                    check=False
+                )
             
             if process.returncode != 0:
                 print("Fehler beim Kompilieren des LaTeX-Dokuments")
@@ -497,10 +514,31 @@ def find_multi_region_codes(code_to_name):
     return multi_region_codes
 
 
-def main(home_code=None, output_suffix="", debug_multi_regions=False):
+def main(home_code=None, output_suffix="", debug_multi_regions=False, stages=None, draft=False, data=None, map_dir=None):
     """
     Hauptfunktion zum Erstellen des Sammelbuchs und der Karten.
+    
+    Args:
+        home_code (str, optional): Das Kennzeichen, das als Home markiert werden soll.
+        output_suffix (str, optional): Ein Suffix für die Ausgabedateien.
+        debug_multi_regions (bool): Zeigt Kennzeichen mit mehreren Regionen an.
+        stages (list, optional): Auszuführende Stufen aus BOOK_STAGES (maps, tex, pdf, final).
+                                 Standardmäßig werden alle Stufen ausgeführt.
+        draft (bool): Entwurfsmodus für eine schnelle Vorschau: Karten und Titelbild mit wenig
+                      Auflösung in output_maps/draft, ein xelatex-Lauf, keine Suche nach
+                      Worträtseln. Die Dateien bekommen das Suffix "_draft".
+        data (dict, optional): Bereits geladenes Shapefile und Kennzeichen (siehe load_book_data),
+                               z.B. aus dem Watch-Modus (watch_build.py)
+        map_dir (str, optional): Verzeichnis der Karten statt output_maps (z.B. pro Edition, damit
+                                 mehrere Bücher gleichzeitig gebaut werden können)
     """
+    if stages is None:
+        stages = BOOK_STAGES
+    unknown_stages = [stage for stage in stages if stage not in BOOK_STAGES]
+    if unknown_stages:
+        print(f"Fehler: Unbekannte Stufen: {', '.join(unknown_stages)}")
+        return False
+
     print("KFZ-Kennzeichen Kartengenerator für Kinderbuch")
     print("=============================================\n")
     
@@ -513,10 +551,86 @@ def main(home_code=None, output_suffix="", debug_multi_regions=False):
     if home_code:
         config['home'] = str(home_code).strip()
         print(f"Home-Kennzeichen überschrieben: {config['home']}")
+    if draft:
+        config['draft'] = True
+    if map_dir:
+        config['map_dir'] = map_dir
+    if config.get('draft'):
+        output_suffix += "_draft"
+        print("Entwurfsmodus: Karten mit wenig Auflösung, ein xelatex-Lauf, keine Worträtsel")
     print(f"Home-Code in main: {config['home']}")
+    print(f"Auszuführende Stufen: {', '.join(stages)}")
+    stage_timing.configure(edition=config['home'])
+
+    home_code = config.get('home', '')
+    if home_printer:
+        tex_file_name = f"kfz_sammelbuch_{home_code}{output_suffix}_printerfriendly.tex"
+    else:
+        tex_file_name = f"kfz_sammelbuch_{home_code}{output_suffix}.tex"
+    
+    # Karten und LaTeX-Vorlage brauchen das Shapefile, die übrigen Stufen nur die Dateien davor
+    if 'maps' in stages or 'tex' in stages:
+        build_maps_and_tex(config, tex_file_name, home_printer, stages, debug_multi_regions, data)
+    
+    # Kompiliere das LaTeX-Dokument zu PDF
+    if 'pdf' in stages:
+        pdf_file = compile_latex_document(tex_file_name, runs=1 if config.get('draft') else 2)
+    else:
+        pdf_file = tex_file_name.replace(".tex", ".pdf")
+    
+    # Bearbeite das PDF (füge Titelbild hinzu, etc.)
+    if 'final' not in stages:
+        return bool(pdf_file)
+    if pdf_file and os.path.exists(pdf_file):
+        home_suffix = f"_{config['home']}" if config.get('home') else ""
+        if home_printer:
+            final_pdf = f"kfz_sammelbuch{home_suffix}{output_suffix}_printerfriendly_final.pdf"
+        else:
+            final_pdf = f"kfz_sammelbuch{home_suffix}{output_suffix}_final.pdf"
+        with stage("pdf_postprocess"):
+            process_pdf(pdf_file, final_pdf, config, home_printer)
+        print(f"\nFertiges Buch erstellt: {final_pdf}")
+        return True
+    else:
+        print("\nFehler: LaTeX-Kompilierung fehlgeschlagen oder PDF-Datei wurde nicht gefunden.")
+        return False
+
+
+def create_book_title_image(gdf, config):
+    """
+    Erstellt das Titelbild für das Home-Kennzeichen der Konfiguration, wie es process_pdf erwartet.
+    Im Entwurfsmodus entsteht es als Vektorgrafik in output_maps/draft, sonst in output_maps
+    (als Vektorgrafik, wenn "title_vector" gesetzt ist).
+    """
+    from create_title_image import extract_codes_from_shapefile, create_title_image
+    from map_creator import OUTPUT_DIR, DRAFT_DIR
 
-    # Lade das Shapefile
-    gdf = load_shapefile(SHAPEFILE_PATH)
+    home_code = config.get('home') or None
+    all_codes, code_to_region, code_to_geometry, region_to_codes = extract_codes_from_shapefile(gdf)
+    if home_code not in code_to_region:
+        home_code = None
+    output_dir = DRAFT_DIR if config.get('draft') else OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"kfz_titelbild_{home_code}.pdf" if home_code else "kfz_titelbild.pdf")
+    
+    # Bevorzuge den Namen aus der CSV-Datei (wie generate_all_books.py)
+    csv_region_name = load_csv_data(CSV_PATH)[0].get(home_code) if home_code else None
+    return create_title_image(gdf, all_codes, code_to_region, code_to_geometry, region_to_codes,
+                              output_path, home_code, csv_region_name,
+                              vector=bool(config.get('draft') or config.get('title_vector')))
+
+
+def load_book_data(gdf=None, debug_multi_regions=False):
+    """
+    Lädt das Shapefile (falls kein gdf übergeben wurde) und extrahiert die Kennzeichen.
+    
+    Returns:
+        dict: "gdf" und "codes" (Rückgabe von extract_kfz_codes, Kennzeichen sortiert)
+    """
+    if gdf is None:
+        # Lade das Shapefile
+        with stage("shapefile_load"):
+            gdf = load_shapefile(SHAPEFILE_PATH)
     
     # Debug: Zeige die Spalten und ein Beispiel an
     print("\nSpalten im GeoDataFrame:", list(gdf.columns))
@@ -526,7 +640,8 @@ def main(home_code=None, output_suffix="", debug_multi_regions=False):
     print("\n")
     
     # Extrahiere die KFZ-Kennzeichen und Zuordnungen
-    regular_codes, rare_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, code_to_name_multi = extract_kfz_codes(gdf)
+    with stage("code_extraction"):
+        regular_codes, rare_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, code_to_name_multi = extract_kfz_codes(gdf)
     
     # Debug: Finde und zeige Kennzeichen mit mehreren Regionen
     if debug_multi_regions or True:  # Immer aktiviert für Debugging
@@ -540,36 +655,65 @@ def main(home_code=None, output_suffix="", debug_multi_regions=False):
     regular_codes.sort()
     rare_codes.sort()
     
-    # Erstelle die Karten für die regulären Kennzeichen
-    if home_printer:
-        create_map_pages_for_home_printer(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config)
-    else:
-        create_map_pages_for_professional_print(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config)
-    
-    # Erstelle die LaTeX-Vorlage
-    home_code = config.get('home', '')
-    if home_printer:
-        tex_file_name = f"kfz_sammelbuch_{home_code}{output_suffix}_printerfriendly.tex"
-        tex_file = generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_state, code_to_other_codes, gdf, code_to_region, code_to_name_multi, config, output_file=tex_file_name)
-    else:
-        tex_file_name = f"kfz_sammelbuch_{home_code}{output_suffix}.tex"
-        tex_file = generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_state, code_to_other_codes, gdf, code_to_region, code_to_name_multi, config, output_file=tex_file_name)
-    
-    # Kompiliere das LaTeX-Dokument zu PDF
-    pdf_file = compile_latex_document(tex_file)
-    
-    # Bearbeite das PDF (füge Titelbild hinzu, etc.)
-    if pdf_file and os.path.exists(pdf_file):
-        home_suffix = f"_{config['home']}" if config.get('home') else ""
+    return {"gdf": gdf, "codes": (regular_codes, rare_codes, code_to_region, code_to_name, code_to_state,
+                                  code_to_other_codes, code_to_name_multi)}
+
+
+def build_maps(config, home_printer, data):
+    """
+    Erstellt die Kartenseiten und die Karte der Home-Region (Stufe "maps").
+    """
+    from map_creator import create_map_pages_for_home_printer, create_map_pages_for_professional_print, create_home_region_map
+    from region_renderer import RegionRenderer
+
+    gdf = data["gdf"]
+    regular_codes, rare_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, code_to_name_multi = data["codes"]
+    with stage("maps"):
+        # Pfade und Farben der Regionen einmal, für die Kartenseiten und die Umgebungskarte
+        renderer = RegionRenderer(gdf)
         if home_printer:
-            final_pdf = f"kfz_sammelbuch{home_suffix}{output_suffix}_printerfriendly_final.pdf"
+            create_map_pages_for_home_printer(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config,
+                                              renderer=renderer)
         else:
-            final_pdf = f"kfz_sammelbuch{home_suffix}{output_suffix}_final.pdf"
-        process_pdf(pdf_file, final_pdf, config, home_printer)
-        print(f"\nFertiges Buch erstellt: {final_pdf}")
-    else:
-        print("\nFehler: LaTeX-Kompilierung fehlgeschlagen oder PDF-Datei wurde nicht gefunden.")
+            create_map_pages_for_professional_print(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config)
+        
+        # Vergrößerte Karte der Home-Region und ihrer Nachbarn ("Deine Umgebung")
+        if home_printer and config.get('home'):
+            with stage("home_region_map"):
+                create_home_region_map(gdf, code_to_region, code_to_name, config, renderer=renderer)
+
 
+def build_tex(config, tex_file_name, data):
+    """
+    Erstellt die LaTeX-Vorlage (Stufe "tex"). Die Karten werden nur über ihre Pfade eingebunden,
+    die Stufe hängt also nicht von den Karten ab.
+    """
+    gdf = data["gdf"]
+    regular_codes, rare_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, code_to_name_multi = data["codes"]
+    with stage("latex"):
+        generate_latex_template(regular_codes, rare_codes, code_to_name, code_to_state, code_to_other_codes, gdf, code_to_region, code_to_name_multi, config, output_file=tex_file_name)
+
+
+def build_maps_and_tex(config, tex_file_name, home_printer, stages, debug_multi_regions=False, data=None):
+    """
+    Lädt das Shapefile und erstellt die Karten und/oder die LaTeX-Vorlage.
+    Mit data (Rückgabe von load_book_data) werden Shapefile und Kennzeichen nicht neu geladen.
+    """
+    if data is None:
+        data = load_book_data(debug_multi_regions=debug_multi_regions)
+    
+    # Erstelle die Karten für die regulären Kennzeichen
+    if 'maps' in stages:
+        build_maps(config, home_printer, data)
+        
+        # Im Entwurfsmodus entsteht auch das Titelbild (als Vektorgrafik) in output_maps/draft
+        if config.get('draft'):
+            with stage("title_image"):
+                create_book_title_image(data["gdf"], config)
+    
+    # Erstelle die LaTeX-Vorlage
+    if 'tex' in stages:
+        build_tex(config, tex_file_name, data)
 
 
 if __name__ == "__main__":
@@ -578,8 +722,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="KFZ-Kennzeichen Kartengenerator für Kinderbuch")
     parser.add_argument("--home", type=str, help="Das Kennzeichen, das als Home markiert werden soll")
     parser.add_argument("--suffix", type=str, default="", help="Ein Suffix für die Ausgabedateien")
+    parser.add_argument("--stages", type=str, default=",".join(BOOK_STAGES),
+                        help="Kommagetrennte Liste der auszuführenden Stufen (maps, tex, pdf, final)")
+    parser.add_argument("--draft", action="store_true",
+                        help="Schnelle Vorschau: Karten mit wenig Auflösung, ein xelatex-Lauf, keine Worträtsel")
+    parser.add_argument("--map-dir", type=str, help="Verzeichnis der Karten (Standard: output_maps)")
     
     args = parser.parse_args()
     
-    main(home_code=args.home, output_suffix=args.suffix)
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    success = main(home_code=args.home, output_suffix=args.suffix, stages=stages, draft=args.draft,
+                   map_dir=args.map_dir)
+    sys.exit(0 if success else 1)
 
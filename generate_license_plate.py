@@ -6,11 +6,128 @@ Nimmt ein Kennzeichen als Parameter und ersetzt den Text im SVG.
 
 import sys
 import os
+import re
+import hashlib
+import tempfile
+from functools import lru_cache
 from lxml import etree
-import cairosvg
 import argparse
 
-def generate_license_plate(kennzeichen, svg_path=None, output_path=None, font_path=None):
+# Namespace für SVG
+SVG_NAMESPACES = {'svg': 'http://www.w3.org/2000/svg'}
+
+# Verzeichnis für die vorgerasterten Vorlagen (ohne Kennzeichen) des Schrift-Backends
+FRAME_CACHE_DIR = os.path.join("cache", "plate_frames")
+
+def plate_template_path(kennzeichen):
+    """
+    Gibt die passende SVG-Vorlage für die Länge des Kennzeichens zurück
+    (raw1.svg, raw2.svg oder raw3.svg, für längere Kennzeichen ebenfalls raw3.svg).
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    length = min(max(len(kennzeichen), 1), 3)
+    return os.path.join(base_dir, f"raw{length}.svg")
+
+def set_plate_text(root, kennzeichen):
+    """
+    Ersetzt den Text im Textelement der Gruppe "Kenz" einer SVG-Vorlage.
+    """
+    # Finde das Textelement mit der ID "Kenz"
+    kenz_group = root.xpath('//svg:g[@id="Kenz"]', namespaces=SVG_NAMESPACES)[0]
+    text_element = kenz_group.xpath('.//svg:text', namespaces=SVG_NAMESPACES)[0]
+    text_element.text = kennzeichen
+
+@lru_cache(maxsize=None)
+def plate_text_layout(svg_path):
+    """
+    Liest die Position und Größe des Kennzeichen-Textes aus einer SVG-Vorlage.
+    
+    Returns:
+        tuple: (x, y der Grundlinie, Schriftgröße) in Einheiten der viewBox,
+               (Breite, Höhe) der viewBox
+    """
+    root = etree.parse(svg_path).getroot()
+    kenz_group = root.xpath('//svg:g[@id="Kenz"]', namespaces=SVG_NAMESPACES)[0]
+    text_element = kenz_group.xpath('.//svg:text', namespaces=SVG_NAMESPACES)[0]
+    
+    # Verschiebungen aller Gruppen zwischen Text und Wurzel aufsummieren (die Vorlagen
+    # verwenden nur matrix(1,0,0,1,dx,dy))
+    x = float(text_element.get('x').replace('px', ''))
+    y = float(text_element.get('y').replace('px', ''))
+    for ancestor in text_element.iterancestors():
+        match = re.match(r'matrix\(1,0,0,1,([-\d.]+),([-\d.]+)\)', (ancestor.get('transform') or '').replace(' ', ''))
+        if match:
+            x += float(match.group(1))
+            y += float(match.group(2))
+    
+    font_size = float(re.search(r'font-size:([\d.]+)px', text_element.get('style')).group(1))
+    _, _, width, height = (float(v) for v in root.get('viewBox').split())
+    return (x, y, font_size), (width, height)
+
+@lru_cache(maxsize=None)
+def plate_frame(svg_path, height):
+    """
+    Gibt die Vorlage ohne Kennzeichen als RGBA-Bild mit der gewünschten Höhe zurück.
+    Das Bild wird einmal mit cairosvg gerastert und in cache/plate_frames/ abgelegt.
+    """
+    from PIL import Image
+    
+    with open(svg_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    frame_path = os.path.join(FRAME_CACHE_DIR, f"{os.path.splitext(os.path.basename(svg_path))[0]}_{digest}_{height}.png")
+    if not os.path.exists(frame_path):
+        tree = etree.parse(svg_path, etree.XMLParser(remove_blank_text=True))
+        set_plate_text(tree.getroot(), '')
+        _, (view_width, view_height) = plate_text_layout(svg_path)
+        
+        import cairosvg
+        os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+        temp_path = frame_path + f".{os.getpid()}.tmp"
+        cairosvg.svg2png(bytestring=etree.tostring(tree), write_to=temp_path,
+                         output_width=int(round(height * view_width / view_height)), output_height=height)
+        os.replace(temp_path, frame_path)
+    
+    with Image.open(frame_path) as frame:
+        return frame.convert('RGBA')
+
+@lru_cache(maxsize=None)
+def _plate_font(font_path, size):
+    from PIL import ImageFont
+    return ImageFont.truetype(font_path, size)
+
+def render_plate_image(kennzeichen, height=190, svg_path=None, font_path=None):
+    """
+    Schnelles Backend: setzt das Kennzeichen mit PIL und EuroPlate.ttf auf die vorgerasterte
+    Vorlage, statt für jedes Kennzeichen das ganze SVG mit cairosvg zu rastern.
+    
+    Args:
+        kennzeichen (str): Das Kennzeichen (z.B. "HH")
+        height (int): Höhe des Bildes in Pixeln (190 entspricht der viewBox der Vorlagen)
+        svg_path (str, optional): Pfad zur SVG-Vorlage, sonst nach Länge des Kennzeichens
+        font_path (str, optional): Pfad zur Schriftartdatei, sonst EuroPlate.ttf
+    
+    Returns:
+        PIL.Image.Image: Das Kennzeichen als RGBA-Bild
+    """
+    from PIL import ImageDraw
+    
+    if svg_path is None:
+        svg_path = plate_template_path(kennzeichen)
+    if font_path is None:
+        font_path = "EuroPlate.ttf"
+    if not os.path.isabs(font_path) and not os.path.exists(font_path):
+        font_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), font_path)
+    
+    (x, y, font_size), (_, view_height) = plate_text_layout(svg_path)
+    scale = height / view_height
+    
+    image = plate_frame(svg_path, height).copy()
+    draw = ImageDraw.Draw(image)
+    draw.text((x * scale, y * scale), kennzeichen, fill='black',
+              font=_plate_font(font_path, font_size * scale), anchor='ls')
+    return image
+
+def generate_license_plate(kennzeichen, svg_path=None, output_path=None, font_path=None, backend='svg', height=None):
     """
     Generiert ein Kennzeichen-PNG aus einer SVG-Vorlage.
     Wählt automatisch die passende SVG-Vorlage basierend auf der Länge des Kennzeichens.
@@ -21,7 +138,10 @@ def generate_license_plate(kennzeichen, svg_path=None, output_path=None, font_pa
                                  basierend auf der Länge des Kennzeichens ausgewählt.
         output_path (str, optional): Pfad für die Ausgabedatei. Wenn nicht angegeben, 
                                      wird 'kennzeichen_[KENNZEICHEN].png' verwendet.
-        font_path (str, optional): Pfad zur Schriftartdatei
+        font_path (str, optional): Pfad zur Schriftartdatei (nur für backend="font")
+        backend (str): "svg" rastert die ganze Vorlage mit cairosvg, "font" setzt den Text
+                       mit PIL auf die vorgerasterte Vorlage (siehe render_plate_image)
+        height (int, optional): Höhe des Bildes in Pixeln, sonst die Größe der viewBox
     
     Returns:
         str: Pfad zur erzeugten PNG-Datei
@@ -30,18 +150,14 @@ def generate_license_plate(kennzeichen, svg_path=None, output_path=None, font_pa
     if output_path is None:
         output_path = f"kennzeichen_{kennzeichen}.png"
     
+    if backend == 'font':
+        render_plate_image(kennzeichen, height or 190, svg_path, font_path).save(output_path)
+        print(f"Kennzeichen '{kennzeichen}' wurde als '{output_path}' gespeichert.")
+        return output_path
+    
     # Wähle die passende SVG-Vorlage basierend auf der Länge des Kennzeichens
     if svg_path is None:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        if len(kennzeichen) == 1:
-            svg_path = os.path.join(base_dir, "raw1.svg")
-        elif len(kennzeichen) == 2:
-            svg_path = os.path.join(base_dir, "raw2.svg")
-        elif len(kennzeichen) == 3:
-            svg_path = os.path.join(base_dir, "raw3.svg")
-        else:
-            # Für längere Kennzeichen verwenden wir raw3.svg
-            svg_path = os.path.join(base_dir, "raw3.svg")
+        svg_path = plate_template_path(kennzeichen)
         print(f"Verwende SVG-Vorlage: {svg_path} für Kennzeichen mit {len(kennzeichen)} Zeichen")
     
     # SVG-Datei einlesen
@@ -49,25 +165,27 @@ def generate_license_plate(kennzeichen, svg_path=None, output_path=None, font_pa
     tree = etree.parse(svg_path, parser)
     root = tree.getroot()
     
-    # Namespace für SVG
-    namespaces = {'svg': 'http://www.w3.org/2000/svg'}
-    
-    # Finde das Textelement mit der ID "Kenz"
-    kenz_group = root.xpath('//svg:g[@id="Kenz"]', namespaces=namespaces)[0]
-    text_element = kenz_group.xpath('.//svg:text', namespaces=namespaces)[0]
-    
     # Ersetze den Text
-    text_element.text = kennzeichen
-    
-    # Temporäre SVG-Datei erstellen
-    temp_svg_path = f"temp_{kennzeichen}.svg"
-    tree.write(temp_svg_path, pretty_print=True, xml_declaration=True, encoding="utf-8")
+    set_plate_text(root, kennzeichen)
     
-    # SVG in PNG mit Transparenz konvertieren
-    cairosvg.svg2png(url=temp_svg_path, write_to=output_path)
-    
-    # Temporäre SVG-Datei löschen
-    os.remove(temp_svg_path)
+    # Temporäre SVG-Datei erstellen (eindeutiger Name pro Aufruf, da mehrere Prozesse
+    # gleichzeitig Kennzeichen im selben Arbeitsverzeichnis erzeugen können)
+    fd, temp_svg_path = tempfile.mkstemp(prefix=f"temp_{kennzeichen}_", suffix=".svg", dir=".")
+    os.close(fd)
+    try:
+        tree.write(temp_svg_path, pretty_print=True, xml_declaration=True, encoding="utf-8")
+        
+        # SVG in PNG mit Transparenz konvertieren (cairosvg lädt libcairo, daher erst hier)
+        import cairosvg
+        if height:
+            _, (view_width, view_height) = plate_text_layout(svg_path)
+            cairosvg.svg2png(url=temp_svg_path, write_to=output_path,
+                             output_width=int(round(height * view_width / view_height)), output_height=height)
+        else:
+            cairosvg.svg2png(url=temp_svg_path, write_to=output_path)
+    finally:
+        # Temporäre SVG-Datei löschen
+        os.remove(temp_svg_path)
     
     print(f"Kennzeichen '{kennzeichen}' wurde als '{output_path}' gespeichert.")
     return output_path
@@ -80,10 +198,13 @@ def main():
     parser.add_argument('--output', help='Pfad für die Ausgabedatei')
     parser.add_argument('--font', default='EuroPlate.ttf',
                         help='Pfad zur Schriftartdatei')
+    parser.add_argument('--backend', choices=['svg', 'font'], default='svg',
+                        help='svg: ganze Vorlage mit cairosvg rastern, font: Text mit PIL auf die vorgerasterte Vorlage setzen')
+    parser.add_argument('--height', type=int, help='Höhe des Bildes in Pixeln')
     
     args = parser.parse_args()
     
-    generate_license_plate(args.kennzeichen, args.svg, args.output, args.font)
+    generate_license_plate(args.kennzeichen, args.svg, args.output, args.font, args.backend, args.height)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zwischenspeicher für Geodaten, die für jede Karte gleich sind.
+
+Hintergrundebenen: Europa-Küstenlinie, Wasser, Deutschland-Umriss und Seen werden einmal
+geladen, nach EPSG:25832 umprojiziert und auf den festen Kartenausschnitt um Deutschland
+zugeschnitten.
+
+Regionspfade: Die Geometrien der KFZ-Regionen werden einmal vereinfacht und in
+matplotlib-Pfade (Stützpunkte und Pfadcodes, MultiPolygone als zusammengesetzte Pfade)
+umgewandelt.
+
+Regionsfarben: Aus den Nachbarschaften der Regionen (einmal mit einem STRtree berechnet)
+wird eine Färbung über die Farbpalette bestimmt, in der benachbarte Regionen möglichst
+unterschiedliche Farben bekommen.
+
+Alles wird im Speicher und in cache/ auf der Festplatte abgelegt, sodass alle Seiten,
+alle Editionen und alle Worker-Prozesse dieselben Daten verwenden.
+"""
+
+import os
+import json
+import pickle
+import hashlib
+
+from build_manifest import file_hash
+
+CACHE_DIR = "cache"  # Verzeichnis für zwischengespeicherte Geodaten
+CACHE_VERSION = 1
+TARGET_EPSG = 25832  # CRS der KFZ-Regionen
+
+# Hintergrundebenen: Name -> (Datei in basisdaten/, CRS der Datei)
+BACKGROUND_LAYERS = {
+    "europecoastline": ("europecoastline.shp", 25832),
+    "secondbackground": ("secondbackground.shp", 25832),
+    "germany": ("germanyshape.shp", 25832),
+    "lakes": ("lakes.shp", 4326),
+}
+
+# Erweiterung des Kartenausschnitts um den Umriss Deutschlands (Anteil von Breite bzw. Höhe).
+# Rechts bleibt mehr Platz für die Labels.
+VIEWPORT_MARGINS = {"left": 0.01, "right": 0.39, "bottom": 0.2, "top": 0.2}
+
+# Zusätzlicher Rand beim Zuschneiden, damit an den Kanten des Ausschnitts nichts abgeschnitten wirkt
+CLIP_PADDING = 0.05
+
+# Toleranz in Metern für die Vereinfachung der Regionen. Bei 300 dpi entspricht ein Pixel
+# auf der A4-Karte etwa 300 m, die Vereinfachung ist also nicht sichtbar.
+SIMPLIFY_TOLERANCE = 50.0
+REGION_PATHS_VERSION = 1
+
+# Regionen, die weniger als diesen Abstand in Metern voneinander entfernt sind, gelten als
+# benachbart (kleine Lücken zwischen den Grenzen im Shapefile werden so überbrückt)
+ADJACENCY_DISTANCE = 1.0
+REGION_COLORS_VERSION = 1
+
+# Zwischenspeicher im Speicher: Basisverzeichnis -> (Schlüssel, Ebenen)
+_background_cache = {}
+
+# Zwischenspeicher im Speicher: Schlüssel -> Regionspfade
+_region_paths_cache = {}
+
+# Zwischenspeicher im Speicher: Schlüssel -> Farbindizes der Regionen
+_region_colors_cache = {}
+
+
+def compute_viewport(germany_bounds):
+    """
+    Berechnet den Kartenausschnitt (minx, miny, maxx, maxy) aus den Grenzen Deutschlands.
+    """
+    minx, miny, maxx, maxy = germany_bounds
+    width = maxx - minx
+    height = maxy - miny
+    return (minx - width * VIEWPORT_MARGINS["left"],
+            miny - height * VIEWPORT_MARGINS["bottom"],
+            maxx + width * VIEWPORT_MARGINS["right"],
+            maxy + height * VIEWPORT_MARGINS["top"])
+
+
+def _layer_files(path):
+    """
+    Gibt alle Dateien eines Shapefiles zurück (.shp, .shx, .dbf, .prj, .cpg), soweit vorhanden.
+    """
+    stem = os.path.splitext(path)[0]
+    return [stem + ext for ext in (".shp", ".shx", ".dbf", ".prj", ".cpg") if os.path.exists(stem + ext)]
+
+
+def background_cache_key(base_dir="."):
+    """
+    Berechnet den Schlüssel des Caches aus den Hashes der Quelldateien und den Parametern des Zuschnitts.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": CACHE_VERSION, "epsg": TARGET_EPSG, "margins": VIEWPORT_MARGINS,
+                         "padding": CLIP_PADDING, "layers": BACKGROUND_LAYERS}, sort_keys=True).encode("utf-8"))
+    for name, (file_name, _) in sorted(BACKGROUND_LAYERS.items()):
+        path = os.path.join(base_dir, "basisdaten", file_name)
+        files = _layer_files(path)
+        if not files:
+            raise FileNotFoundError(f"Hintergrundebene nicht gefunden: {path}")
+        for layer_file in files:
+            h.update(os.path.basename(layer_file).encode("utf-8"))
+            h.update((file_hash(os.path.abspath(layer_file)) or "missing").encode("utf-8"))
+    return h.hexdigest()
+
+
+def _read_layer(path, epsg):
+    """
+    Lädt eine Hintergrundebene mit fiona und projiziert sie nach TARGET_EPSG.
+    """
+    import fiona
+    import geopandas as gpd
+
+    with fiona.open(path) as f:
+        layer = gpd.GeoDataFrame.from_features(f, crs=f.crs)
+    layer = layer.set_crs(epsg=epsg, allow_override=True)
+    if epsg != TARGET_EPSG:
+        layer = layer.to_crs(epsg=TARGET_EPSG)
+    return layer
+
+
+def _build_background_layers(base_dir):
+    """
+    Lädt alle Hintergrundebenen und schneidet sie auf den Kartenausschnitt zu.
+
+    Returns:
+        tuple: (viewport, dict Name -> Liste von Shapely-Geometrien)
+    """
+    from shapely.geometry import box
+
+    layers = {}
+    for name, (file_name, epsg) in BACKGROUND_LAYERS.items():
+        layers[name] = _read_layer(os.path.join(base_dir, "basisdaten", file_name), epsg)
+        print(f"{file_name} geladen ({len(layers[name])} Geometrien)")
+
+    viewport = compute_viewport(layers["germany"].total_bounds)
+    minx, miny, maxx, maxy = viewport
+    pad_x = (maxx - minx) * CLIP_PADDING
+    pad_y = (maxy - miny) * CLIP_PADDING
+    clip_box = box(minx - pad_x, miny - pad_y, maxx + pad_x, maxy + pad_y)
+
+    geometries = {}
+    for name, layer in layers.items():
+        clipped = layer.geometry.intersection(clip_box)
+        geometries[name] = [geom for geom in clipped if geom is not None and not geom.is_empty]
+    return tuple(float(v) for v in viewport), geometries
+
+
+def _to_gdf(geometries):
+    import geopandas as gpd
+    return gpd.GeoDataFrame(geometry=list(geometries), crs=f"EPSG:{TARGET_EPSG}")
+
+
+def load_background_layers(base_dir="."):
+    """
+    Gibt die zugeschnittenen Hintergrundebenen zurück. Sie werden nur beim ersten Aufruf
+    (oder wenn sich die Quelldateien geändert haben) neu berechnet, sonst aus dem Speicher
+    oder aus cache/ geladen.
+
+    Returns:
+        dict: "viewport" -> (minx, miny, maxx, maxy) sowie für jede Ebene aus BACKGROUND_LAYERS
+              ein GeoDataFrame in EPSG:25832
+    """
+    import shapely
+
+    key = background_cache_key(base_dir)
+    cached = _background_cache.get(os.path.abspath(base_dir))
+    if cached and cached[0] == key:
+        return cached[1]
+
+    cache_path = os.path.join(base_dir, CACHE_DIR, f"background_layers_{key[:16]}.pkl")
+    data = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("key") != key:
+                data = None
+            else:
+                print(f"Hintergrundebenen aus dem Cache geladen: {cache_path}")
+        except Exception as e:
+            print(f"Fehler beim Laden des Caches {cache_path}: {e}")
+            data = None
+
+    if data is None:
+        print("Lade und schneide die Hintergrundebenen zu...")
+        viewport, geometries = _build_background_layers(base_dir)
+        data = {
+            "key": key,
+            "viewport": viewport,
+            "layers": {name: [shapely.to_wkb(geom) for geom in geoms] for name, geoms in geometries.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+            print(f"Hintergrundebenen im Cache gespeichert: {cache_path}")
+        except OSError as e:
+            print(f"Fehler beim Speichern des Caches {cache_path}: {e}")
+
+    layers = {"viewport": tuple(data["viewport"])}
+    for name, wkb_list in data["layers"].items():
+        layers[name] = _to_gdf(shapely.from_wkb(wkb_list))
+    _background_cache[os.path.abspath(base_dir)] = (key, layers)
+    return layers
+
+
+def _update_with_geometries(h, geometries):
+    import numpy as np
+    import shapely
+
+    for wkb in shapely.to_wkb(np.asarray(geometries, dtype=object)):
+        h.update(wkb if wkb is not None else b"none")
+
+
+def region_paths_key(geometries, tolerance=SIMPLIFY_TOLERANCE):
+    """
+    Berechnet den Schlüssel des Pfad-Caches aus den Geometrien (WKB) und der Toleranz.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": REGION_PATHS_VERSION, "tolerance": tolerance}).encode("utf-8"))
+    _update_with_geometries(h, geometries)
+    return h.hexdigest()
+
+
+def _build_region_paths(geometries, tolerance):
+    """
+    Vereinfacht die Regionen und wandelt sie in zusammenhängende Pfad-Arrays um.
+    """
+    import numpy as np
+    import shapely
+    from region_renderer import geometry_to_path, paths_to_arrays
+
+    geometries = np.asarray(geometries, dtype=object)
+    simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    vertices, codes, offsets = paths_to_arrays([geometry_to_path(geom) for geom in simplified])
+
+    # Zentroide aus den unvereinfachten Geometrien, damit die Labels genau gleich liegen
+    centroids = np.full((len(geometries), 2), np.nan)
+    valid = np.array([geom is not None and not geom.is_empty for geom in geometries], dtype=bool)
+    if valid.any():
+        centroids[valid] = shapely.get_coordinates(shapely.centroid(geometries[valid]))
+
+    outline = None
+    if valid.any():
+        union = shapely.union_all(geometries[valid])
+        outline = geometry_to_path(shapely.simplify(union, tolerance, preserve_topology=True))
+    return {
+        "vertices": vertices,
+        "codes": codes,
+        "offsets": offsets,
+        "centroids": centroids,
+        "outline_vertices": outline.vertices if outline is not None else None,
+        "outline_codes": outline.codes if outline is not None else None,
+    }
+
+
+def load_region_paths(geometries, base_dir=".", tolerance=SIMPLIFY_TOLERANCE):
+    """
+    Gibt die vorberechneten Pfade der Regionen zurück. Sie werden nur berechnet, wenn sie
+    weder im Speicher noch in cache/ vorliegen.
+
+    Returns:
+        dict: vertices, codes, offsets (Pfad der Zeile i: offsets[i]:offsets[i + 1]),
+              centroids (n, 2) sowie outline_vertices/outline_codes für den Umriss
+    """
+    key = region_paths_key(geometries, tolerance)
+    if key in _region_paths_cache:
+        return _region_paths_cache[key]
+
+    cache_path = os.path.join(base_dir, CACHE_DIR, f"region_paths_{key[:16]}.pkl")
+    data = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("key") != key:
+                data = None
+        except Exception as e:
+            print(f"Fehler beim Laden des Caches {cache_path}: {e}")
+            data = None
+
+    if data is None:
+        print("Berechne die Pfade der Regionen...")
+        data = _build_region_paths(geometries, tolerance)
+        data["key"] = key
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+            print(f"Pfade der Regionen im Cache gespeichert: {cache_path}")
+        except OSError as e:
+            print(f"Fehler beim Speichern des Caches {cache_path}: {e}")
+
+    _region_paths_cache[key] = data
+    return data
+
+
+def region_adjacency(geometries, distance=ADJACENCY_DISTANCE):
+    """
+    Bestimmt die Nachbarn jeder Region mit einem STRtree (statt alle Paare mit touches zu prüfen).
+
+    Returns:
+        list: Für jede Zeile die Menge der Zeilen benachbarter Regionen
+    """
+    import numpy as np
+    from shapely import STRtree
+
+    geometries = np.asarray(geometries, dtype=object)
+    valid = np.array([geom is not None and not geom.is_empty for geom in geometries], dtype=bool)
+    neighbors = [set() for _ in range(len(geometries))]
+    rows = np.flatnonzero(valid)
+    if len(rows) == 0:
+        return neighbors
+
+    tree = STRtree(geometries[rows])
+    left, right = tree.query(geometries[rows], predicate="dwithin", distance=distance)
+    for i, j in zip(rows[left].tolist(), rows[right].tolist()):
+        if i != j:
+            neighbors[i].add(j)
+            neighbors[j].add(i)
+    return neighbors
+
+
+def color_regions(neighbors, palette):
+    """
+    Färbt den Nachbarschaftsgraphen mit den Farben der Palette (gierig, Regionen mit den
+    meisten Nachbarn zuerst). Jede Region bekommt die Farbe, die sich am stärksten von den
+    Farben ihrer bereits gefärbten Nachbarn unterscheidet; bei Gleichstand die bisher am
+    seltensten verwendete Farbe, damit die ganze Palette genutzt wird.
+
+    Returns:
+        numpy.ndarray: Index in die Palette für jede Zeile
+    """
+    import numpy as np
+
+    palette = np.asarray(palette, dtype=float)[:, :3]
+    # Abstände zwischen allen Farben der Palette (RGB)
+    distances = np.sqrt(((palette[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2))
+    colors = np.full(len(neighbors), -1, dtype=np.int64)
+    usage = np.zeros(len(palette), dtype=np.int64)
+
+    order = sorted(range(len(neighbors)), key=lambda row: (-len(neighbors[row]), row))
+    for row in order:
+        neighbor_colors = [colors[n] for n in neighbors[row] if colors[n] >= 0]
+        if neighbor_colors:
+            closeness = distances[:, neighbor_colors].min(axis=1)
+        else:
+            closeness = np.full(len(palette), np.inf)
+        # Größter Abstand zu den Nachbarn, dann seltenste Farbe, dann kleinster Index
+        best = min(range(len(palette)), key=lambda c: (-closeness[c], usage[c], c))
+        colors[row] = best
+        usage[best] += 1
+    return colors
+
+
+def region_colors_key(geometries, palette, distance=ADJACENCY_DISTANCE):
+    """
+    Berechnet den Schlüssel der Farbtabelle aus den Geometrien (WKB), der Palette und dem Abstand.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": REGION_COLORS_VERSION, "distance": distance,
+                         "palette": [[round(float(v), 6) for v in color] for color in palette]}).encode("utf-8"))
+    _update_with_geometries(h, geometries)
+    return h.hexdigest()
+
+
+def load_region_colors(geometries, palette, base_dir=".", distance=ADJACENCY_DISTANCE):
+    """
+    Gibt die Farbtabelle der Regionen zurück (Index in die Palette für jede Zeile). Sie wird
+    nur berechnet, wenn sie weder im Speicher noch in cache/ vorliegt, und ist damit für alle
+    Kartenseiten, das Titelbild und alle Editionen gleich.
+    """
+    key = region_colors_key(geometries, palette, distance)
+    if key in _region_colors_cache:
+        return _region_colors_cache[key]
+
+    cache_path = os.path.join(base_dir, CACHE_DIR, f"region_colors_{key[:16]}.pkl")
+    data = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("key") != key:
+                data = None
+        except Exception as e:
+            print(f"Fehler beim Laden des Caches {cache_path}: {e}")
+            data = None
+
+    if data is None:
+        print("Berechne die Nachbarschaften und Farben der Regionen...")
+        neighbors = region_adjacency(geometries, distance)
+        data = {"key": key, "colors": color_regions(neighbors, palette)}
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+            print(f"Farben der Regionen im Cache gespeichert: {cache_path}")
+        except OSError as e:
+            print(f"Fehler beim Speichern des Caches {cache_path}: {e}")
+
+    _region_colors_cache[key] = data["colors"]
+    return data["colors"]
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kleine Lagekarten ("Locator") für die Checklisten.
+Jede Region bekommt ein briefmarkengroßes Bild von Deutschland, auf dem sie rot markiert ist.
+Statt eine Figur pro Region zu rendern, werden alle Markierungen in einem Durchgang in ein
+großes Raster (Atlas) gezeichnet: jede Region in ihre eigene Zelle, alle Zellen in einer
+PathCollection. Die Grundkarte wird nur einmal in Zellengröße gerastert und unter jede Zelle
+gelegt, danach werden die Zellen als einzelne PNG-Dateien ausgeschnitten.
+
+Die Bilder liegen in cache/locator_maps_<schlüssel>/ und werden nur neu gerendert, wenn sich
+die Geometrien der Regionen oder die Größe ändern.
+"""
+
+import os
+import json
+import math
+import hashlib
+
+LOCATOR_VERSION = 1
+LOCATOR_HEIGHT_PX = 64  # Höhe einer Lagekarte in Pixeln
+LOCATOR_DPI = 300  # Auflösung der Lagekarten (64 px entsprechen etwa 5,4 mm)
+LOCATOR_PADDING = 0.03  # Rand um Deutschland (Anteil der Höhe)
+HIGHLIGHT_COLOR = '#d62728'
+
+# Zwischenspeicher im Speicher: Schlüssel -> {Index der Region (als String) -> Pfad}
+_locator_cache = {}
+
+
+def locator_maps_key(geometries, height_px=LOCATOR_HEIGHT_PX):
+    """
+    Berechnet den Schlüssel der Lagekarten aus den Geometrien (WKB) und der Bildhöhe.
+    """
+    from geo_cache import _update_with_geometries
+
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": LOCATOR_VERSION, "height": height_px, "dpi": LOCATOR_DPI,
+                         "padding": LOCATOR_PADDING, "color": HIGHLIGHT_COLOR}).encode("utf-8"))
+    _update_with_geometries(h, geometries)
+    return h.hexdigest()
+
+
+def _render_figure(width_px, height_px, xlim, ylim, draw):
+    """
+    Rendert eine Figur mit exakt width_px x height_px Pixeln und einer randlosen Achse
+    und gibt das RGBA-Bild als float-Array (0..1) zurück.
+    """
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    # Ein kleiner Zuschlag, damit die Rundung auf ganze Pixel nicht einen Pixel verliert
+    fig = Figure(figsize=((width_px + 1e-3) / LOCATOR_DPI, (height_px + 1e-3) / LOCATOR_DPI), dpi=LOCATOR_DPI)
+    fig.patch.set_alpha(0.0)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    draw(ax)
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba(), dtype=np.float32) / 255.0
+
+
+def render_locator_atlas(renderer, height_px=LOCATOR_HEIGHT_PX):
+    """
+    Rendert die Lagekarten aller Regionen in einem Durchgang.
+
+    Rückgabe: (Grundkarte als RGBA-Array einer Zelle, Atlas als RGBA-Array, Anzahl der Spalten,
+    Zellenbreite, Zellenhöhe). Zelle i liegt in Zeile i // Spalten und Spalte i % Spalten.
+    """
+    import numpy as np
+    from matplotlib.transforms import Affine2D
+    from region_renderer import make_collection
+
+    # Ausschnitt um Deutschland, eine Zelle entspricht diesem Ausschnitt
+    minx, miny, maxx, maxy = renderer.bounds
+    pad = (maxy - miny) * LOCATOR_PADDING
+    minx, miny, maxx, maxy = minx - pad, miny - pad, maxx + pad, maxy + pad
+    cell_w, cell_h = maxx - minx, maxy - miny
+    width_px = max(1, int(round(height_px * cell_w / cell_h)))
+
+    # Grundkarte einmal in Zellengröße: Regionen hellgrau, Umriss dunkel
+    def draw_base(ax):
+        renderer.draw(ax, facecolors='#e6e6e6', edgecolors='none')
+        renderer.draw_outline(ax, edgecolor='#555555', linewidth=0.3)
+    base = _render_figure(width_px, height_px, (minx, maxx), (miny, maxy), draw_base)
+
+    # Alle Regionen in ein quadratisches Raster von Zellen verschieben
+    count = len(renderer.paths)
+    cols = max(1, math.ceil(math.sqrt(count)))
+    rows = max(1, math.ceil(count / cols))
+    paths = []
+    offsets = []
+    for i, (path, centroid) in enumerate(zip(renderer.paths, renderer.centroids)):
+        if path is None:
+            continue
+        # Zeile 0 liegt oben, die y-Achse zeigt nach oben
+        dx = (i % cols) * cell_w - minx
+        dy = (rows - 1 - i // cols) * cell_h - miny
+        paths.append(path.transformed(Affine2D().translate(dx, dy)))
+        offsets.append((centroid.x + dx, centroid.y + dy) if centroid is not None and not centroid.is_empty
+                       else (np.nan, np.nan))
+
+    def draw_atlas(ax):
+        ax.add_collection(make_collection(paths, HIGHLIGHT_COLOR))
+        # Ein Punkt am Zentroid, damit auch kleine Regionen (Städte) sichtbar sind
+        ax.scatter(*np.array(offsets).T, s=1.5, color=HIGHLIGHT_COLOR, linewidths=0, zorder=2)
+    atlas = _render_figure(width_px * cols, height_px * rows, (0, cols * cell_w), (0, rows * cell_h), draw_atlas)
+    return base, atlas, cols, width_px, height_px
+
+
+def load_locator_maps(renderer, base_dir=".", height_px=LOCATOR_HEIGHT_PX):
+    """
+    Gibt die Lagekarten aller Regionen zurück (Index der Region als String -> Pfad der PNG-Datei).
+    Die Bilder werden nur gerendert, wenn sie weder im Speicher noch in cache/ vorliegen.
+    """
+    import numpy as np
+    from PIL import Image
+    from geo_cache import CACHE_DIR
+
+    key = locator_maps_key(renderer.geometries, height_px)
+    if key in _locator_cache:
+        return _locator_cache[key]
+
+    locator_dir = os.path.join(CACHE_DIR, f"locator_maps_{key[:16]}")
+    index_path = os.path.join(base_dir, locator_dir, "index.json")
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                locators = json.load(f)
+            if all(os.path.exists(os.path.join(base_dir, path)) for path in locators.values()):
+                _locator_cache[key] = locators
+                return locators
+        except Exception as e:
+            print(f"Fehler beim Laden des Caches {index_path}: {e}")
+
+    print(f"Rendere die Lagekarten für {len(renderer.paths)} Regionen...")
+    base, atlas, cols, width_px, height_px = render_locator_atlas(renderer, height_px)
+    os.makedirs(os.path.join(base_dir, locator_dir), exist_ok=True)
+
+    locators = {}
+    for i, index in enumerate(renderer.index):
+        row, col = divmod(i, cols)
+        cell = atlas[row * height_px:(row + 1) * height_px, col * width_px:(col + 1) * width_px]
+
+        # Markierung über die Grundkarte legen (weißer Hintergrund für den Druck)
+        alpha = cell[..., 3:4]
+        image = cell[..., :3] * alpha + base[..., :3] * base[..., 3:4] * (1 - alpha) \
+            + (1 - base[..., 3:4]) * (1 - alpha)
+        path = os.path.join(locator_dir, f"region_{index}.png")
+        # Atomar schreiben, damit parallele Worker nie eine halb geschriebene Lagekarte lesen
+        image_path = os.path.join(base_dir, path)
+        temp_path = image_path + f".{os.getpid()}.tmp"
+        Image.fromarray(np.round(image * 255).astype(np.uint8), "RGB").save(temp_path, format="PNG")
+        os.replace(temp_path, image_path)
+        locators[str(index)] = path.replace(os.sep, "/")
+
+    # Der Index wird zuletzt geschrieben und markiert den Cache als vollständig
+    temp_path = index_path + f".{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(locators, f, sort_keys=True)
+    os.replace(temp_path, index_path)
+
+    _locator_cache[key] = locators
+    return locators
+
+
+def code_locator_maps(gdf, codes, code_to_region, base_dir="."):
+    """
+    Gibt die Lagekarte jedes Kennzeichens mit Region zurück (Kennzeichen -> Pfad der PNG-Datei).
+    """
+    from region_renderer import RegionRenderer
+
+    renderer = RegionRenderer(gdf, base_dir=base_dir)
+    locators = load_locator_maps(renderer, base_dir)
+    return {code: locators[str(code_to_region[code].name)] for code in codes
+            if code in code_to_region and str(code_to_region[code].name) in locators}
+
+
+def locator_graphic(path):
+    """
+    Gibt den LaTeX-Befehl für eine Lagekarte in einer Zeile der Checkliste zurück.
+    """
+    return r"\raisebox{-0.35em}{\includegraphics[height=1.3em]{" + path + "}}~"
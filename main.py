@@ -2,122 +2,257 @@
 # -*- coding: utf-8 -*-
 """
 Hauptskript für die Erstellung des KFZ-Kennzeichen Sammelbuchs
-Führt zuerst create_title_image.py und dann generate_kfz_maps_neu.py aus
+Führt die Stufen eines Buchs als Graph aus (siehe build_manifest.STAGE_DEPENDENCIES):
+Titelbild, Kartenseiten und LaTeX-Vorlage hängen nicht voneinander ab und laufen gleichzeitig,
+xelatex wartet auf Karten und Vorlage, die Nachbearbeitung auf Titelbild und PDF.
 """
 
 import os
 import sys
-import subprocess
-import importlib.util
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-def run_script(script_path):
+from build_manifest import STAGES, STAGE_DEPENDENCIES
+
+# Shapefile, Kennzeichen und Konfiguration des Buchs im aktuellen Prozess. Die Worker erben sie
+# beim fork vom Hauptprozess; ohne fork (Windows, macOS) lädt jeder Worker sie einmal selbst.
+_book = None
+
+
+def prepare_book(home_code=None, output_suffix=""):
     """
-    Führt ein Python-Skript aus, entweder durch direkten Import oder als Subprocess
+    Lädt Konfiguration, Shapefile und Kennzeichen eines Buchs (einmal pro Prozess).
     """
-    print(f"\n{'=' * 50}")
-    print(f"Führe {script_path} aus...")
-    print(f"{'=' * 50}\n")
-    
+    global _book
+    if _book is not None and _book["key"] == (home_code, output_suffix):
+        return _book
+
+    import stage_timing
+    from generate_kfz_maps_neu import load_config, load_book_data
+
+    config = load_config()
+    if home_code:
+        config['home'] = str(home_code).strip()
+    stage_timing.configure(edition=config['home'])
+    home_suffix = f"_{config['home']}" if config.get('home') else ""
+    _book = {
+        "key": (home_code, output_suffix),
+        "config": config,
+        "data": load_book_data(),
+        "tex_file": f"kfz_sammelbuch_{config['home']}{output_suffix}_printerfriendly.tex",
+        "final_pdf": f"kfz_sammelbuch{home_suffix}{output_suffix}_printerfriendly_final.pdf",
+    }
+    return _book
+
+
+def _title_stage(book):
+    from generate_kfz_maps_neu import create_book_title_image
+    from stage_timing import stage
+    with stage("title_image"):
+        return bool(create_book_title_image(book["data"]["gdf"], book["config"]))
+
+
+def _maps_stage(book):
+    from generate_kfz_maps_neu import build_maps
+    build_maps(book["config"], True, book["data"])
+    return True
+
+
+def _tex_stage(book):
+    from generate_kfz_maps_neu import build_tex
+    build_tex(book["config"], book["tex_file"], book["data"])
+    return os.path.exists(book["tex_file"])
+
+
+def _pdf_stage(book):
+    from generate_kfz_maps_neu import compile_latex_document
+    return bool(compile_latex_document(book["tex_file"]))
+
+
+def _final_stage(book):
+    from generate_kfz_maps_neu import process_pdf
+    from stage_timing import stage
+    with stage("pdf_postprocess"):
+        process_pdf(book["tex_file"].replace(".tex", ".pdf"), book["final_pdf"], book["config"], True)
+    return True
+
+
+STAGE_FUNCTIONS = {
+    "title": _title_stage,
+    "maps": _maps_stage,
+    "tex": _tex_stage,
+    "pdf": _pdf_stage,
+    "final": _final_stage,
+}
+
+
+def run_stage(name, home_code=None, output_suffix=""):
+    """
+    Führt eine Stufe in einem Worker-Prozess aus.
+
+    Returns:
+        tuple: (Erfolg, Startzeit, Endzeit)
+    """
+    book = prepare_book(home_code, output_suffix)
+    start = time.time()
     try:
-        # Versuche, das Skript als Modul zu importieren und auszuführen
-        spec = importlib.util.spec_from_file_location("module.name", script_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        
-        # Wenn das Skript eine main-Funktion hat, führe diese aus
-        if hasattr(module, 'main'):
-            module.main()
-            
-        print(f"\n{script_path} erfolgreich ausgeführt.")
-        return True
-    except Exception as e:
-        print(f"Fehler beim Ausführen von {script_path} als Modul: {e}")
-        print("Versuche, das Skript als Subprocess auszuführen...")
-        
-        try:
-            # Führe das Skript als Subprocess aus
-            result = subprocess.run([sys.executable, script_path], check=True)
-            print(f"\n{script_path} erfolgreich als Subprocess ausgeführt.")
-            return result.returncode == 0
-        except subprocess.CalledProcessError as e:
-            print(f"Fehler beim Ausführen von {script_path} als Subprocess: {e}")
-            return False
-
-def main(home_code=None, output_suffix=""):
+        success = STAGE_FUNCTIONS[name](book)
+    except Exception:
+        traceback.print_exc()
+        success = False
+    return success, start, time.time()
+
+
+def run_stage_graph(stages, dependencies, submit, max_workers):
+    """
+    Führt Stufen aus, sobald alle ihre Abhängigkeiten erfolgreich waren. Jede Stufe läuft genau
+    einmal; schlägt sie fehl, werden die von ihr abhängigen Stufen übersprungen.
+
+    Args:
+        stages (list): Auszuführende Stufen in topologischer Reihenfolge
+        dependencies (dict): Stufe -> Liste der Stufen, von denen sie abhängt
+        submit (callable): submit(executor, name) gibt ein Future mit (Erfolg, Start, Ende) zurück
+        max_workers (int): Anzahl der gleichzeitig laufenden Stufen
+
+    Returns:
+        dict: Stufe -> {"success", "start", "end"} bzw. {"skipped": True}
     """
-    Hauptfunktion, die die Skripte in der richtigen Reihenfolge ausführt
-    
+    results = {}
+    pending = list(stages)
+    running = {}
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        while pending or running:
+            for name in list(pending):
+                deps = [dep for dep in dependencies.get(name, []) if dep in stages]
+                if any(dep in results and not results[dep].get("success") for dep in deps):
+                    print(f"Überspringe {name}: abhängige Stufe fehlgeschlagen")
+                    results[name] = {"skipped": True}
+                    pending.remove(name)
+                elif all(dep in results for dep in deps):
+                    print(f"Starte Stufe {name}")
+                    running[submit(executor, name)] = name
+                    pending.remove(name)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    success, start, end = future.result()
+                except Exception as e:
+                    print(f"Fehler in Stufe {name}: {e}")
+                    success, start, end = False, None, None
+                results[name] = {"success": success, "start": start, "end": end}
+                print(f"Stufe {name} {'fertig' if success else 'fehlgeschlagen'}")
+    return results
+
+
+def critical_path(results, dependencies, offset=0.0):
+    """
+    Bestimmt den kritischen Pfad: die Kette abhängiger Stufen mit der längsten Gesamtdauer.
+
+    Args:
+        results (dict): Rückgabe von run_stage_graph
+        dependencies (dict): Stufe -> Abhängigkeiten
+        offset (float): Zeit vor dem Graphen (Laden der Daten), die jeder Pfad enthält
+
+    Returns:
+        tuple: (Liste der Stufen, Dauer in Sekunden)
+    """
+    timed = {name: r["end"] - r["start"] for name, r in results.items() if r.get("start") is not None}
+    finish = {}
+    previous = {}
+    for name in STAGES:
+        if name not in timed:
+            continue
+        deps = [dep for dep in dependencies.get(name, []) if dep in finish]
+        before = max(deps, key=lambda dep: finish[dep]) if deps else None
+        previous[name] = before
+        finish[name] = timed[name] + (finish[before] if before else offset)
+    if not finish:
+        return [], offset
+
+    last = max(finish, key=finish.get)
+    path = []
+    while last:
+        path.append(last)
+        last = previous[last]
+    return path[::-1], finish[path[0]]
+
+
+def print_timing_report(results, dependencies, book_start, load_seconds):
+    """
+    Gibt Start, Dauer und den kritischen Pfad der Stufen aus.
+    """
+    print(f"\n{'Stufe':<8} {'Start':>8} {'Dauer':>8}")
+    print(f"{'daten':<8} {0.0:>7.1f}s {load_seconds:>7.1f}s")
+    for name in STAGES:
+        result = results.get(name)
+        if result is None:
+            continue
+        if result.get("start") is None:
+            print(f"{name:<8} {'-':>8} {'-':>8}  {'übersprungen' if result.get('skipped') else 'fehlgeschlagen'}")
+            continue
+        print(f"{name:<8} {result['start'] - book_start:>7.1f}s {result['end'] - result['start']:>7.1f}s"
+              f"{'' if result['success'] else '  fehlgeschlagen'}")
+
+    path, path_seconds = critical_path(results, dependencies, load_seconds)
+    stage_sum = load_seconds + sum(r["end"] - r["start"] for r in results.values() if r.get("start") is not None)
+    print(f"\nKritischer Pfad: {' -> '.join(['daten'] + path)} ({path_seconds:.1f} s)")
+    print(f"Gesamtdauer: {time.time() - book_start:.1f} s, Summe aller Stufen: {stage_sum:.1f} s")
+
+
+def main(home_code=None, output_suffix="", jobs=None):
+    """
+    Hauptfunktion, die die Stufen des Buchs als Graph ausführt
+
     Args:
         home_code (str, optional): Das Kennzeichen, das als Home markiert werden soll.
         output_suffix (str, optional): Ein Suffix für die Ausgabedateien.
+        jobs (int, optional): Anzahl der gleichzeitig laufenden Stufen (Standard: bis zu 3,
+                              begrenzt durch die Anzahl der Prozessorkerne)
     """
     print("KFZ-Kennzeichen Sammelbuch Generator")
     print("===================================")
-    
-    # Kommandozeilenparameter für generate_kfz_maps_neu.py
-    cmd_args = []
-    
-    # Aktuelles Verzeichnis
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Pfade zu den Skripten
-    title_image_script = os.path.join(current_dir, "create_title_image.py")
-    generate_maps_script = os.path.join(current_dir, "generate_kfz_maps_neu.py")
-    
-    # Prüfe, ob die Skripte existieren
-    if not os.path.exists(title_image_script):
-        print(f"FEHLER: {title_image_script} nicht gefunden!")
-        return False
-    
-    if not os.path.exists(generate_maps_script):
-        print(f"FEHLER: {generate_maps_script} nicht gefunden!")
-        return False
-    
-    # Führe die Skripte nacheinander aus
-    title_success = run_script(title_image_script)
-    if not title_success:
-        print("FEHLER: Erstellung des Titelbilds fehlgeschlagen!")
-        return False
-    
-    # Bereite Kommandozeilenparameter vor
-    if home_code:
-        cmd_args.extend(["--home", home_code])
-    if output_suffix:
-        cmd_args.extend(["--suffix", output_suffix])
-    
-    # Führe das Skript mit den Parametern aus
-    if cmd_args:
-        try:
-            cmd = [sys.executable, generate_maps_script] + cmd_args
-            result = subprocess.run(cmd, check=True)
-            maps_success = result.returncode == 0
-        except subprocess.CalledProcessError as e:
-            print(f"Fehler beim Ausführen von {generate_maps_script} mit Parametern: {e}")
-            maps_success = False
-    else:
-        maps_success = run_script(generate_maps_script)
-    
-    if not maps_success:
-        print("FEHLER: Erstellung des Sammelbuchs fehlgeschlagen!")
+
+    # Shapefile und Kennzeichen einmal laden, die Stufen teilen sie sich
+    book_start = time.time()
+    book = prepare_book(home_code, output_suffix)
+    load_seconds = time.time() - book_start
+
+    jobs = jobs or max(1, min(3, os.cpu_count() or 1))
+    results = run_stage_graph(
+        STAGES, STAGE_DEPENDENCIES,
+        lambda executor, name: executor.submit(run_stage, name, home_code, output_suffix),
+        jobs)
+    print_timing_report(results, STAGE_DEPENDENCIES, book_start, load_seconds)
+
+    failed = [name for name in STAGES if not results.get(name, {}).get("success")]
+    if failed:
+        print(f"FEHLER: Erstellung des Sammelbuchs fehlgeschlagen (Stufen: {', '.join(failed)})!")
         return False
-    
+
     print("\n===================================")
     print("Sammelbuch erfolgreich erstellt!")
-    home_suffix = f"_{home_code}" if home_code else ""
-    pdf_name = f"kfz_sammelbuch{home_suffix}{output_suffix}_final.pdf"
-    print(f"Das fertige PDF finden Sie unter: {pdf_name}")
+    print(f"Das fertige PDF finden Sie unter: {book['final_pdf']}")
     print("===================================")
-    
+
     return True
 
 if __name__ == "__main__":
     import argparse
-    
+
     parser = argparse.ArgumentParser(description="KFZ-Kennzeichen Sammelbuch Generator")
     parser.add_argument("--home", type=str, help="Das Kennzeichen, das als Home markiert werden soll")
     parser.add_argument("--suffix", type=str, default="", help="Ein Suffix für die Ausgabedateien")
-    
+    parser.add_argument("--jobs", type=int, help="Anzahl der gleichzeitig laufenden Stufen")
+
     args = parser.parse_args()
-    
-    success = main(home_code=args.home, output_suffix=args.suffix)
+
+    success = main(home_code=args.home, output_suffix=args.suffix, jobs=args.jobs)
     sys.exit(0 if success else 1)
@@ -1,8 +1,12 @@
 import os
-import matplotlib.pyplot as plt
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import geopandas as gpd
 import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.backends.backend_pdf import PdfPages
 from matplotlib.patches import Circle
 from reportlab.pdfgen import canvas
@@ -10,6 +14,10 @@ from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.units import cm
 from reportlab.lib import colors
 from normalizer import normalize_text
+from stage_timing import stage
+from memory_guard import configure_image_slots, full_res_image
+from region_renderer import RegionRenderer, draw_geometries
+from geo_cache import CACHE_DIR, load_background_layers, background_cache_key
 
 OUTPUT_DIR = "output_maps"  # Verzeichnis für die Ausgabedateien
 CODES_PER_PAGE = 20    # Anzahl der Kennzeichen pro Seite für reguläre Kennzeichen
@@ -19,8 +27,68 @@ CSV_PATH = "kfz-kennz-d.csv"
 CSV_PATH_OCTOATE = "kfzkennzeichen-deutschland.csv"
 PAGE_WIDTH = 8.27  # DIN-A4 Breite in Zoll
 PAGE_HEIGHT = 11.69  # DIN-A4 Höhe in Zoll
+PRINT_DPI = 300  # Auflösung für den professionellen Druck
+DRAFT_DPI = 60  # Auflösung der Karten im Entwurfsmodus (--draft)
+DRAFT_DIR = os.path.join(OUTPUT_DIR, "draft")  # Karten und Titelbild des Entwurfsmodus
+DRAFT_INDEX = os.path.join(DRAFT_DIR, "thumbnails.json")  # Schlüssel der Karten im Entwurfsmodus
 
-def create_right_page_map(ax, gdf, page_codes, code_to_region, code_to_name, code_to_other_codes, home_code=None):
+# Bereits geladene Hintergrundbilder des Hybrid-Modus (Pfade -> Bilder)
+_background_rasters = {}
+
+def map_output_dir(config=None):
+    """
+    Gibt das Verzeichnis der Karten zurück: "map_dir" aus der Konfiguration, falls gesetzt
+    (z.B. ein Verzeichnis pro Edition in der Batch-Pipeline), im Entwurfsmodus ("draft")
+    output_maps/draft, damit die Karten des fertigen Buchs nicht überschrieben werden.
+    """
+    if config and config.get('map_dir'):
+        return config['map_dir']
+    return DRAFT_DIR if config and config.get('draft') else OUTPUT_DIR
+
+
+def map_dpi(config=None):
+    """
+    Gibt die Auflösung der Heimdrucker-Karten zurück (im Entwurfsmodus DRAFT_DPI).
+    """
+    return DRAFT_DPI if config and config.get('draft') else 300
+
+
+def draft_page_keys(renderer, pages, code_to_name, code_to_other_codes, home_code=None, engine='matplotlib'):
+    """
+    Berechnet für jede Seite des Entwurfs einen Schlüssel aus den Geometrien, dem Code der
+    Karten, dem Home-Kennzeichen und den Kennzeichen und Labels der Seite.
+    Seiten mit unverändertem Schlüssel werden im Entwurfsmodus nicht neu gerendert.
+    
+    Rückgabe: {Seitennummer: Schlüssel}
+    """
+    from build_manifest import file_hash
+    from geo_cache import region_paths_key
+    
+    base = hashlib.sha256(json.dumps({
+        "dpi": DRAFT_DPI, "engine": engine, "home": home_code,
+        "geometries": region_paths_key(renderer.geometries),
+        "code": [file_hash(name) for name in ("map_creator.py", "cairo_map_renderer.py", "region_renderer.py",
+                                              "geo_cache.py")],
+    }, sort_keys=True).encode("utf-8"))
+    keys = {}
+    for page, page_codes in pages:
+        h = base.copy()
+        labels = [(code, home_printer_label_text(code, code_to_name, code_to_other_codes)) for code in page_codes]
+        h.update(json.dumps(labels, ensure_ascii=False).encode("utf-8"))
+        keys[page] = h.hexdigest()
+    return keys
+
+
+def region_color_table(renderer):
+    """
+    Gibt die Farbtabelle der Regionen zurück (Index als String -> Farbe). Die Farben stammen aus
+    einer einmal berechneten Färbung des Nachbarschaftsgraphen (geo_cache.load_region_colors),
+    sodass benachbarte Regionen unterschiedliche Farben haben und jede Region auf allen Seiten
+    und in allen Editionen dieselbe Farbe bekommt.
+    """
+    return {str(index): color for index, color in zip(renderer.index, renderer.region_colors())}
+
+def create_right_page_map(ax, gdf, page_codes, code_to_region, code_to_name, code_to_other_codes, home_code=None, background_rasters=None, renderer=None):
     # Debug: Zeige den Home-Code
     print(f"Home-Code in create_right_page_map: {home_code}")
     """
@@ -34,147 +102,146 @@ def create_right_page_map(ax, gdf, page_codes, code_to_region, code_to_name, cod
     - code_to_name: Dictionary, das KFZ-Codes auf Regionsnamen abbildet
     - code_to_other_codes: Dictionary, das KFZ-Codes auf weitere Codes der Region abbildet
     - home_code: Der Code der Heimatregion (optional)
+    - background_rasters: Vorgerenderte Hintergrundbilder aus render_background_rasters (optional).
+      Dann werden Europa, Wasser, Deutschland und Seen als Bild statt als Vektoren gezeichnet.
+    - renderer: RegionRenderer mit den vorberechneten Pfaden der Regionen (optional, wird sonst erstellt)
+    """
+    base = create_right_page_base(ax, gdf, code_to_region, home_code, background_rasters, renderer)
+    if base:
+        draw_right_page_codes(ax, base, page_codes, code_to_region, code_to_name, code_to_other_codes, home_code)
+    
+    # Entferne Achsen
+    ax.set_axis_off()
+
+
+def create_right_page_base(ax, gdf, code_to_region, home_code=None, background_rasters=None, renderer=None):
+    """
+    Zeichnet die Teile der rechten Seite, die für alle Seiten gleich sind: Hintergrund,
+    eine (noch leere) Collection für die hervorgehobenen Regionen, den Home-Marker und die Seen.
+    
+    Rückgabe: Dictionary mit 'renderer', 'highlights' (die Collection der Regionen) und
+    'region_to_color' (Farbtabelle der Regionen) oder None, wenn die Hintergrundebenen nicht
+    geladen werden konnten.
     """
     # Setze die Hintergrundfarbe der Achse und entferne alle Achsen und Ränder
     ax.set_facecolor('#4a79a5')  # Blauer Hintergrund
     ax.set_axis_off()
     ax.set_frame_on(False)
     
-    # Lade zusätzliche Shapefiles für den Kartenhintergrund
+    # Hintergrundebenen (einmal geladen, umprojiziert und auf den Ausschnitt zugeschnitten)
     base_dir = '.'
-    europecoastline_path = os.path.join(base_dir, 'basisdaten', 'europecoastline.shp')
-    secondbackground_path = os.path.join(base_dir, 'basisdaten', 'secondbackground.shp')
-    germany_path = os.path.join(base_dir, 'basisdaten', 'germanyshape.shp')
-    lakes_path = os.path.join(base_dir, 'basisdaten', 'lakes.shp')
     
     try:
-        # Lade die Shapefiles mit der Methode aus create_title_image.py
-        print(f"Versuche Shapefiles zu laden...")
-        
-        # Importiere fiona hier, um Konflikte zu vermeiden
-        import fiona
-        
-        # Lade die Shapefiles mit fiona.open
-        with fiona.open(europecoastline_path) as f:
-            europecoastline_gdf = gpd.GeoDataFrame.from_features(f, crs=f.crs)
-        print("europecoastline.shp geladen")
-        
-        with fiona.open(secondbackground_path) as f:
-            secondbackground_gdf = gpd.GeoDataFrame.from_features(f, crs=f.crs)
-        print("secondbackground.shp geladen")
-        
-        with fiona.open(germany_path) as f:
-            germany_gdf = gpd.GeoDataFrame.from_features(f, crs=f.crs)
-        print("germanyshape.shp geladen")
-        
-        with fiona.open(lakes_path) as f:
-            lakes_gdf = gpd.GeoDataFrame.from_features(f, crs=f.crs)
-        print("lakes.shp geladen")
-        
-        # Stelle sicher, dass alle Shapefiles das gleiche CRS haben
-        # Verwende EPSG:25832 als gemeinsames CRS, da die KFZ-Regionen in diesem CRS sind
-        europecoastline_gdf.set_crs(epsg=25832, inplace=True, allow_override=True)
-        
-        secondbackground_gdf.set_crs(epsg=25832, inplace=True, allow_override=True)
-        
-        germany_gdf.set_crs(epsg=25832, inplace=True, allow_override=True)
-        
-        lakes_gdf.set_crs(epsg=4326, inplace=True, allow_override=True)
-        lakes_gdf = lakes_gdf.to_crs(epsg=25832)
+        layers = load_background_layers(base_dir)
+        europecoastline_gdf = layers['europecoastline']
+        secondbackground_gdf = layers['secondbackground']
+        germany_gdf = layers['germany']
+        lakes_gdf = layers['lakes']
         
         # Stelle sicher, dass auch das gdf mit den KFZ-Regionen im richtigen CRS ist
         if gdf.crs is None or gdf.crs.to_epsg() != 25832:
             gdf = gdf.set_crs(epsg=25832, allow_override=True)
-        
-        print("Zusätzliche Shapefiles erfolgreich geladen")
+        if renderer is None:
+            renderer = RegionRenderer(gdf)
         
         # Setze den Hintergrund auf Blau (#4a79a5)
         ax.set_facecolor('#4a79a5')
         
-        # Zeichne die Hintergrundebenen
-        europecoastline_gdf.plot(ax=ax, color='#e9e6be', edgecolor='none')  # Helles Europa
-        secondbackground_gdf.plot(ax=ax, color='#4a79a5', edgecolor='none')  # Wasser
-        germany_gdf.plot(ax=ax, color='#dcd798', edgecolor='none')  # Dunklerer Hintergrund für Deutschland
+        # Zoom auf Deutschland, mit Platz rechts für die Labels (siehe geo_cache.VIEWPORT_MARGINS)
+        minx, miny, maxx, maxy = layers['viewport']
+        
+        # Zeichne die Hintergrundebenen (gerastert erst nach den Regionen, siehe unten)
+        if not background_rasters:
+            draw_geometries(ax, list(europecoastline_gdf.geometry), '#e9e6be')  # Helles Europa
+            draw_geometries(ax, list(secondbackground_gdf.geometry), '#4a79a5')  # Wasser
+            draw_geometries(ax, list(germany_gdf.geometry), '#dcd798')  # Dunklerer Hintergrund für Deutschland
         
-        # Zoom auf Deutschland - Vergrößere die Karte, damit Deutschland mehr Platz einnimmt
-        # Hole die Grenzen von Deutschland
-        minx, miny, maxx, maxy = germany_gdf.total_bounds
-        # Erweitere die Grenzen um einen Faktor, um etwas Kontext zu behalten
-        width = maxx - minx
-        height = maxy - miny
-        # Erweitere die Grenzen um 20% in jede Richtung, aber verschiebe nach links für Platz für Labels
-        minx -= width * 0.01  # Weniger Platz links (um ca. 1 cm nach links verschieben)
-        maxx += width * 0.39  # Mehr Platz rechts für Labels
-        miny -= height * 0.2
-        maxy += height * 0.2
-        # Setze die Grenzen der Karte
         ax.set_xlim(minx, maxx)
         ax.set_ylim(miny, maxy)
         
-        # Erstelle eine Farbpalette mit kräftigen, unterscheidbaren Farben
-        base_colors = []
-        for cmap_name in ['tab10', 'tab20', 'Dark2', 'Set1', 'Set2', 'Paired']:
-            cmap = plt.cm.get_cmap(cmap_name)
-            base_colors.extend([cmap(i) for i in np.linspace(0, 1, cmap.N)])
+        # Eine Collection für die hervorgehobenen Regionen, die pro Seite nur neu befüllt wird
+        highlights = renderer.highlight_collection(ax, linewidths=0.5)
+        
+        # Markiere die Home-Region, falls konfiguriert (unabhängig von page_codes)
+        if home_code and home_code in code_to_region:
+            home_region = code_to_region[home_code]
+            home_region_name = home_region.get('NAME', '')
+            if isinstance(home_region_name, pd.Series) and not home_region_name.empty:
+                home_region_name = home_region_name.iloc[0]
+            
+            home_rows = renderer.rows_for_name(home_region_name)
+            if home_rows:
+                print(f"Home-Region gefunden: {home_code}")
+                home_centroid = renderer.centroids[home_rows[0]]
+                ax.scatter(home_centroid.x, home_centroid.y, s=120, color='blue', marker='o', 
+                          edgecolors='black', linewidths=1.5, zorder=10)
+        
+        # Zeichne die Seen über der Karte (über den Regionen, unter den Verbindungslinien)
+        if background_rasters:
+            ax.imshow(background_rasters['background'], extent=(minx, maxx, miny, maxy),
+                      aspect='auto', interpolation='none', zorder=0)
+            ax.imshow(background_rasters['lakes'], extent=(minx, maxx, miny, maxy),
+                      aspect='auto', interpolation='none', zorder=1.5)
+        else:
+            draw_geometries(ax, list(lakes_gdf.geometry), '#4a79a5', zorder=1.5)
         
-        # Filtere Grautöne heraus
-        filtered_colors = []
-        for color in base_colors:
-            r, g, b = color[:3]
-            if max(abs(r-g), abs(r-b), abs(g-b)) > 0.15:
-                filtered_colors.append(color)
+        # Entferne die Achsen und stelle sicher, dass die Karte den gesamten verfügbaren Platz nutzt
+        ax.set_axis_off()
+        # Verwende 'datalim' statt 'equal', um die Daten an die Achsengröße anzupassen
+        ax.set_aspect('auto', adjustable='datalim')
         
-        # Stelle sicher, dass wir genügend Farben haben
-        while len(filtered_colors) < len(page_codes):
-            filtered_colors.extend(filtered_colors)
+        return {'renderer': renderer, 'highlights': highlights, 'region_to_color': region_color_table(renderer)}
         
-        # Erstelle ein Wörterbuch, um Regionen konsistente Farben zuzuweisen
-        region_to_color = {}
+    except Exception as e:
+        print(f"Fehler beim Laden der zusätzlichen Shapefiles: {e}")
+        print("Verwende nur die Hauptkarte ohne Hintergrundebenen")
+        return None
+
+
+def draw_right_page_codes(ax, base, page_codes, code_to_region, code_to_name, code_to_other_codes, home_code=None):
+    """
+    Zeichnet die Teile der rechten Seite, die sich von Seite zu Seite ändern: die Farben der
+    Regionen dieser Seite, die Verbindungslinien und die Labels.
+    
+    Parameter:
+    - base: Rückgabe von create_right_page_base
+    """
+    renderer = base['renderer']
+    
+    try:
+        # Feste Farbe jeder Region aus der Farbtabelle
+        region_to_color = base['region_to_color']
         
         # Sammle die Zentroide und Codes für die Labels
         centroids_and_codes = []
         
+        # Regionen und Farben, die auf dieser Seite hervorgehoben werden
+        highlight_rows = []
+        highlight_colors = []
+        
         # Zeichne die Regionen für die Kennzeichen dieser Seite
         for code in page_codes:
             if code in code_to_region:
                 region = code_to_region[code]
                 
-                # Weise dieser Region eine Farbe zu, falls noch nicht geschehen
                 region_id = str(region.name)
-                if region_id not in region_to_color:
-                    color_idx = len(region_to_color) % len(filtered_colors)
-                    region_to_color[region_id] = filtered_colors[color_idx]
                 
                 # Zeichne die Region mit der zugewiesenen Farbe
                 region_name = region.get('NAME', '')
                 if isinstance(region_name, pd.Series) and not region_name.empty:
                     region_name = region_name.iloc[0]
                 
-                region_geom = gdf[gdf['NAME'] == region_name]
-                if not region_geom.empty:
-                    region_geom.plot(ax=ax, color=region_to_color[region_id], 
-                                    edgecolor='black', linewidth=0.5, alpha=0.7)
+                region_rows = renderer.rows_for_name(region_name)
+                if region_rows:
+                    highlight_rows.extend(region_rows)
+                    highlight_colors.extend([region_to_color[region_id]] * len(region_rows))
                     
-                    # Berechne den Zentroid für Labels
-                    centroid = region_geom.geometry.centroid.iloc[0]
+                    # Zentroid für Labels
+                    centroid = renderer.centroids[region_rows[0]]
                     centroids_and_codes.append((centroid, code, region_to_color[region_id]))
         
-        # Markiere die Home-Region, falls konfiguriert (unabhängig von page_codes)
-        if home_code and home_code in code_to_region:
-            home_region = code_to_region[home_code]
-            home_region_name = home_region.get('NAME', '')
-            if isinstance(home_region_name, pd.Series) and not home_region_name.empty:
-                home_region_name = home_region_name.iloc[0]
-            
-            home_region_geom = gdf[gdf['NAME'] == home_region_name]
-            if not home_region_geom.empty:
-                print(f"Home-Region gefunden: {home_code}")
-                home_centroid = home_region_geom.geometry.centroid.iloc[0]
-                ax.scatter(home_centroid.x, home_centroid.y, s=120, color='blue', marker='o', 
-                          edgecolors='black', linewidths=1.5, zorder=10)
-        
-        # Zeichne die Seen über der Karte
-        lakes_gdf.plot(ax=ax, color='#4a79a5', edgecolor='none')
+        # Setze die Regionen dieser Seite in die Collection ein
+        renderer.set_highlights(base['highlights'], highlight_rows, highlight_colors, edgecolor='black', alpha=0.7)
         
         # Füge Labels am rechten Rand hinzu
         # Bestimme die Grenzen der Karte
@@ -269,23 +336,121 @@ def create_right_page_map(ax, gdf, page_codes, code_to_region, code_to_name, cod
                              boxstyle='round,pad=0.8',
                              edgecolor=color, linewidth=1.0))
         
-        # Entferne die Achsen und stelle sicher, dass die Karte den gesamten verfügbaren Platz nutzt
-        ax.set_axis_off()
-        # Verwende 'datalim' statt 'equal', um die Daten an die Achsengröße anzupassen
-        ax.set_aspect('auto', adjustable='datalim')
-        
     except Exception as e:
-        print(f"Fehler beim Laden der zusätzlichen Shapefiles: {e}")
-        print("Verwende nur die Hauptkarte ohne Hintergrundebenen")
+        print(f"Fehler beim Zeichnen der Kennzeichen: {e}")
+
+
+def remove_page_artists(ax, static_artists):
+    """
+    Entfernt alle Artists einer Achse, die nicht zur Grundkarte gehören (Verbindungslinien,
+    Marker und Labels der zuletzt gespeicherten Seite).
+    """
+    for artist in ax.get_children():
+        if artist not in static_artists:
+            artist.remove()
+
+
+def render_background_rasters(width, height, dpi=PRINT_DPI, base_dir='.'):
+    """
+    Rastert die statischen Hintergrundebenen der Karte einmal in Druckauflösung.
+    Es entstehen zwei Bilder in der Größe der rechten Kartenhälfte: der Hintergrund
+    (Wasser, Europa, Deutschland) und eine transparente Ebene mit den Seen, die über
+    den Regionen liegt. Die Bilder werden in cache/ abgelegt und für alle Seiten und
+    Editionen wiederverwendet.
     
-    # Entferne Achsen
-    ax.set_axis_off()
+    Parameter:
+    - width, height: Größe der Kartenachse in Zoll
+    - dpi: Auflösung der Bilder
+    
+    Rückgabe: Dictionary mit den Bildern als Arrays ('background', 'lakes')
+    """
+    key = background_cache_key(base_dir)[:16]
+    cache_dir = os.path.join(base_dir, CACHE_DIR)
+    paths = {
+        'background': os.path.join(cache_dir, f"background_raster_{key}_{width:.2f}x{height:.2f}_{dpi}.png"),
+        'lakes': os.path.join(cache_dir, f"lakes_raster_{key}_{width:.2f}x{height:.2f}_{dpi}.png"),
+    }
+    
+    memo_key = tuple(paths.values())
+    if memo_key in _background_rasters:
+        return _background_rasters[memo_key]
+    
+    if not all(os.path.exists(path) for path in paths.values()):
+        print(f"Rastere die Hintergrundebenen mit {dpi} dpi...")
+        layers = load_background_layers(base_dir)
+        minx, miny, maxx, maxy = layers['viewport']
+        os.makedirs(cache_dir, exist_ok=True)
+        
+        for name, path in paths.items():
+            fig = Figure(figsize=(width, height))
+            FigureCanvasAgg(fig)
+            ax = fig.add_axes([0, 0, 1, 1])
+            ax.set_axis_off()
+            if name == 'background':
+                fig.patch.set_facecolor('#4a79a5')
+                ax.set_facecolor('#4a79a5')
+                draw_geometries(ax, list(layers['europecoastline'].geometry), '#e9e6be')
+                draw_geometries(ax, list(layers['secondbackground'].geometry), '#4a79a5')
+                draw_geometries(ax, list(layers['germany'].geometry), '#dcd798')
+            else:
+                fig.patch.set_alpha(0)
+                ax.patch.set_alpha(0)
+                draw_geometries(ax, list(layers['lakes'].geometry), '#4a79a5')
+            ax.set_xlim(minx, maxx)
+            ax.set_ylim(miny, maxy)
+            ax.set_aspect('auto')
+            temp_path = path + f".{os.getpid()}.tmp.png"
+            fig.savefig(temp_path, dpi=dpi, transparent=(name == 'lakes'), pad_inches=0)
+            os.replace(temp_path, path)
+    
+    # Als 8-Bit-Bilder laden, der Hintergrund ohne Alphakanal (kleiner im PDF)
+    rasters = {name: (imread(path) * 255).round().astype(np.uint8) for name, path in paths.items()}
+    rasters['background'] = rasters['background'][:, :, :3]
+    _background_rasters[memo_key] = rasters
+    return rasters
 
 
-def create_map_pages_for_professional_print(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config=None):
+def render_pages_in_threads(render_pages, pages, threads=1):
+    """
+    Rendert Seiten mit render_pages(seiten), bei threads > 1 verteilt auf einen Thread-Pool.
+    Jeder Thread baut seine eigene Figur auf (Figure und FigureCanvasAgg, ohne den globalen
+    Zustand von pyplot). Die Agg-Rasterung und das Schreiben der Bilder geben das GIL
+    größtenteils frei, sodass die Threads tatsächlich parallel arbeiten.
+    
+    Parameter:
+    - render_pages: Funktion, die eine Liste von (Seitennummer, Kennzeichen) rendert und
+      eine Liste von (Seitennummer, Datei) zurückgibt
+    - pages: Liste von (Seitennummer, Kennzeichen der Seite)
+    - threads: Anzahl der Threads
+    
+    Rückgabe: Liste von (Seitennummer, Datei), sortiert nach Seitennummer
+    """
+    if not pages:
+        return []
+    threads = max(1, min(int(threads or 1), len(pages)))
+    if threads == 1:
+        return render_pages(pages)
+    
+    # Verteile die Seiten reihum, damit jeder Thread ähnlich viele Seiten bekommt
+    chunks = [pages[i::threads] for i in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(render_pages, chunks))
+    return sorted((item for result in results for item in result), key=lambda item: item[0])
+
+
+def create_map_pages_for_professional_print(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config=None, hybrid=None, threads=None):
     """
     Erstellt ein professionelles Drucklayout im DIN A3 Querformat mit blauem Hintergrund.
     Die linke Seite enthält eine Checkliste, die rechte Seite eine Europakarte mit Deutschland im Zentrum.
+    
+    Im Hybrid-Modus (hybrid=True oder "hybrid_print": true in der Konfiguration) wird der statische
+    Hintergrund einmal gerastert und als Bild eingebettet. Nur die hervorgehobenen Regionen,
+    Verbindungslinien und Labels bleiben Vektoren, wodurch die Seiten-PDFs deutlich kleiner werden.
+    Jedes Seiten-PDF enthält eine eigene Kopie des Rasters (im synthetischen Datensatz 150 KB von
+    168 KB pro Seite), siehe benchmarks/compare_professional_print.py.
+    
+    Mit threads > 1 (oder "map_threads" in der Konfiguration) werden die Seiten auf mehrere
+    Threads verteilt, siehe render_pages_in_threads.
     """
     # Erstelle den Ausgabeordner, falls er nicht existiert
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -299,289 +464,556 @@ def create_map_pages_for_professional_print(gdf, regular_codes, code_to_region,
     a3_width = PAGE_WIDTH * 2   # 420mm in Zoll
     a3_height = PAGE_HEIGHT  # 297mm in Zoll
     
-    # Liste für die Pfade der erstellten PDFs
-    pdf_paths = []
-    
     # Hole den Home-Code aus der Konfiguration, falls vorhanden
     home_code = None
     if config and 'home' in config and config['home']:
         home_code = str(config['home']).strip()
     
     print(f"Home-Code in create_map_pages_for_professional_print: {home_code}")
-    # Erstelle eine Seite für jede Gruppe von Kennzeichen
+    
+    # Hybrid-Modus: Hintergrund einmal rastern und für alle Seiten verwenden
+    if hybrid is None:
+        hybrid = bool(config and config.get('hybrid_print', False))
+    background_rasters = None
+    if hybrid:
+        try:
+            background_rasters = render_background_rasters(a3_width / 2, a3_height)
+        except Exception as e:
+            print(f"Fehler beim Rastern der Hintergrundebenen: {e}")
+            print("Verwende Vektor-Hintergrund")
+    
+    # Wandle alle Regionen einmal in Pfade um und lade die Hintergrundebenen, bevor
+    # mehrere Threads gleichzeitig auf die Zwischenspeicher zugreifen
+    renderer = RegionRenderer(gdf)
+    try:
+        load_background_layers('.')
+    except Exception:
+        pass  # Der Fehler wird beim Zeichnen der Karte gemeldet
+    
+    # Bestimme die Kennzeichen für jede Seite
+    pages = []
     for page in range(1, num_pages + 1):
-        print(f"Erstelle Seite {page} von {num_pages}")
-        
-        # Bestimme die Kennzeichen für diese Seite
         start_idx = (page - 1) * CODES_PER_PAGE
         end_idx = min(start_idx + CODES_PER_PAGE, len(regular_codes))
-        page_codes = regular_codes[start_idx:end_idx]
-        
-        # Definiere den Dateinamen für diese Seite
-        pdf_path = os.path.join(OUTPUT_DIR, f"kfz_professional_print_seite_{page:02d}.pdf")
-        pdf_paths.append(pdf_path)
-        
-        # Erstelle eine Figur im A3 Querformat mit blauem Hintergrund
-        fig = plt.figure(figsize=(a3_width, a3_height), facecolor='#4a79a5')
-        
-        # Erstelle zwei Subplots nebeneinander (linke und rechte Seite) ohne Abstände
-        gs = fig.add_gridspec(1, 2, width_ratios=[1, 1], wspace=0)
-        
-        # Linke Seite (wird später für die Checkliste verwendet)
-        ax_left = fig.add_subplot(gs[0, 0])
-        ax_left.set_facecolor('#4a79a5')  # Blauer Hintergrund
-        ax_left.set_axis_off()
-        ax_left.set_frame_on(False)
-        ax_left.set_position([0, 0, 0.5, 1])  # Nutze die linke Hälfte der Figur vollständig
-        
-        # Rechte Seite (Karte)
-        ax_right = fig.add_subplot(gs[0, 1])
-        ax_right.set_position([0.5, 0, 0.5, 1])  # Nutze die rechte Hälfte der Figur vollständig
-        
-        # Erstelle die Karte auf der rechten Seite
-        create_right_page_map(ax_right, gdf, page_codes, code_to_region, code_to_name, code_to_other_codes, home_code)
-        
-        # Speichere die Figur als PDF ohne jegliche Ränder
-        # Verwende keine Anpassungen, die Ränder hinzufügen könnten
-        fig.tight_layout(pad=0, h_pad=0, w_pad=0)
-        fig.subplots_adjust(left=0, right=1, top=1, bottom=0, wspace=0, hspace=0)
-        
-        # Speichere exakt mit den Abmessungen der Figur, ohne jegliche Ränder
-        fig.savefig(pdf_path, format='pdf', facecolor='#4a79a5', 
-                   bbox_inches=None, pad_inches=0, dpi=300)
-        plt.close(fig)
+        pages.append((page, regular_codes[start_idx:end_idx]))
+    
+    def render(chunk):
+        return render_professional_print_pages(chunk, num_pages, gdf, renderer, code_to_region, code_to_name,
+                                               code_to_other_codes, home_code, background_rasters)
+    
+    # Rendere die Seiten, bei "map_threads" > 1 verteilt auf mehrere Threads
+    if threads is None:
+        threads = config.get('map_threads', 1) if config else 1
+    pdf_paths = [path for _, path in render_pages_in_threads(render, pages, threads)]
     
     print(f"Professionelle Drucklayouts gespeichert als: {', '.join(pdf_paths)}")
     # Keine Rückgabe notwendig
 
-def create_map_pages_for_home_printer(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config=None):
+
+def render_professional_print_pages(pages, num_pages, gdf, renderer, code_to_region, code_to_name, code_to_other_codes, home_code=None, background_rasters=None):
+    """
+    Rendert Seiten des professionellen Drucklayouts in einer eigenen Figur.
+    Die Figur wird nur einmal aufgebaut: Hintergrund, Regionen und Home-Marker bleiben für alle
+    Seiten bestehen, pro Seite werden nur die Farben der Regionen getauscht und die Labels neu gezeichnet.
+    
+    Parameter:
+    - pages: Liste von (Seitennummer, Kennzeichen der Seite)
+    - num_pages: Gesamtzahl der Seiten (für die Ausgabe)
+    
+    Rückgabe: Liste von (Seitennummer, Pfad des PDFs)
+    """
+    # Definiere die Größe für DIN A3 Querformat (420mm × 297mm)
+    a3_width = PAGE_WIDTH * 2   # 420mm in Zoll
+    a3_height = PAGE_HEIGHT  # 297mm in Zoll
+    
+    # Erstelle eine Figur im A3 Querformat mit blauem Hintergrund (ohne pyplot, damit
+    # mehrere Threads gleichzeitig eigene Figuren rendern können)
+    fig = Figure(figsize=(a3_width, a3_height), facecolor='#4a79a5')
+    FigureCanvasAgg(fig)
+    
+    # Erstelle zwei Subplots nebeneinander (linke und rechte Seite) ohne Abstände
+    gs = fig.add_gridspec(1, 2, width_ratios=[1, 1], wspace=0)
+    
+    # Linke Seite (wird später für die Checkliste verwendet)
+    ax_left = fig.add_subplot(gs[0, 0])
+    ax_left.set_facecolor('#4a79a5')  # Blauer Hintergrund
+    ax_left.set_axis_off()
+    ax_left.set_frame_on(False)
+    ax_left.set_position([0, 0, 0.5, 1])  # Nutze die linke Hälfte der Figur vollständig
+    
+    # Rechte Seite (Karte)
+    ax_right = fig.add_subplot(gs[0, 1])
+    ax_right.set_position([0.5, 0, 0.5, 1])  # Nutze die rechte Hälfte der Figur vollständig
+    
+    # Zeichne die Teile der Karte, die auf allen Seiten gleich sind
+    base = create_right_page_base(ax_right, gdf, code_to_region, home_code, background_rasters, renderer)
+    ax_right.set_axis_off()
+    
+    # Verwende keine Anpassungen, die Ränder hinzufügen könnten
+    fig.tight_layout(pad=0, h_pad=0, w_pad=0)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0, wspace=0, hspace=0)
+    
+    # Alles, was jetzt auf der Karte liegt, bleibt; alles, was eine Seite hinzufügt, wird danach entfernt
+    static_artists = set(ax_right.get_children())
+    
+    pdf_paths = []
+    for page, page_codes in pages:
+        with stage("map_page", page=page, layout="professional_print"):
+            print(f"Erstelle Seite {page} von {num_pages}")
+            
+            # Definiere den Dateinamen für diese Seite
+            pdf_path = os.path.join(OUTPUT_DIR, f"kfz_professional_print_seite_{page:02d}.pdf")
+            pdf_paths.append((page, pdf_path))
+            
+            # Färbe die Regionen dieser Seite ein und zeichne Verbindungslinien und Labels
+            if base:
+                draw_right_page_codes(ax_right, base, page_codes, code_to_region, code_to_name, code_to_other_codes, home_code)
+            
+            # Speichere exakt mit den Abmessungen der Figur, ohne jegliche Ränder
+            fig.savefig(pdf_path, format='pdf', facecolor='#4a79a5', 
+                       bbox_inches=None, pad_inches=0, dpi=PRINT_DPI)
+            
+            # Entferne Linien und Labels dieser Seite für die nächste Seite
+            remove_page_artists(ax_right, static_artists)
+    
+    return pdf_paths
+
+def create_map_pages_for_home_printer(gdf, regular_codes, code_to_region, code_to_name, code_to_state, code_to_other_codes, config=None, threads=None, engine=None, renderer=None):
     """
     Erstellt Kartenbilder für die regulären KFZ-Kennzeichen, aufgeteilt auf mehrere Seiten.
     Wenn ein Home-Kennzeichen konfiguriert ist, wird es auf jeder Karte mit einem roten Kreis markiert.
+    
+    Mit threads > 1 (oder "map_threads" in der Konfiguration) werden die Seiten auf mehrere
+    Threads verteilt, siehe render_pages_in_threads.
+    
+    Mit engine="cairo" (oder "map_engine": "cairo" in der Konfiguration) werden die Seiten direkt
+    mit Cairo gezeichnet (siehe cairo_map_renderer). Ist Cairo nicht verfügbar, wird matplotlib verwendet.
+    
+    Im Entwurfsmodus ("draft" in der Konfiguration) entstehen die Seiten mit DRAFT_DPI in output_maps/draft.
+    
+    "max_full_res_images" in der Konfiguration begrenzt, wie viele Seiten gleichzeitig in voller
+    Auflösung gerastert werden (siehe memory_guard).
+    
+    Mit renderer (RegionRenderer für gdf) werden dessen Pfade und Farben verwendet, z.B. dieselben
+    wie für create_home_region_map.
     """
     # Erstelle den Ausgabeordner, falls er nicht existiert
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    output_dir = map_output_dir(config)
+    dpi = map_dpi(config)
+    os.makedirs(output_dir, exist_ok=True)
+    if config and config.get('max_full_res_images'):
+        configure_image_slots(config['max_full_res_images'])
     
     # Berechne die Anzahl der Seiten
     num_pages = (len(regular_codes) + CODES_PER_PAGE - 1) // CODES_PER_PAGE
-    print(f"Erstelle {num_pages} Seiten mit je {CODES_PER_PAGE} regulären Kennzeichen")
+    print(f"Erstelle {num_pages} Seiten mit je {CODES_PER_PAGE} regulären Kennzeichen ({dpi} dpi)")
     
-    # Erstelle eine Farbpalette mit kräftigen, unterscheidbaren Farben
-    # Kombiniere mehrere Farbpaletten und filtere Grautöne heraus
-    base_colors = []
-    for cmap_name in ['tab10', 'tab20', 'Dark2', 'Set1', 'Set2', 'Paired']:
-        cmap = plt.cm.get_cmap(cmap_name)
-        base_colors.extend([cmap(i) for i in np.linspace(0, 1, cmap.N)])
-    
-    # Filtere Grautöne heraus (Farben, bei denen R, G und B sehr ähnlich sind)
-    filtered_colors = []
-    for color in base_colors:
-        r, g, b = color[:3]
-        # Wenn die Differenz zwischen den Farbkanälen groß genug ist, ist es kein Grauton
-        if max(abs(r-g), abs(r-b), abs(g-b)) > 0.15:
-            filtered_colors.append(color)
-    
-    # Stelle sicher, dass wir genügend Farben haben
-    while len(filtered_colors) < CODES_PER_PAGE:
-        filtered_colors.extend(filtered_colors)
-        
-    # Erstelle ein Wörterbuch, um Regionen konsistente Farben zuzuweisen
-    # Der Schlüssel ist die Region-ID (oder ein anderer eindeutiger Identifikator)
-    region_to_color = {}
+    # Wähle den Renderer für die Seiten
+    if engine is None:
+        engine = config.get('map_engine', 'matplotlib') if config else 'matplotlib'
+    render_pages = render_home_printer_pages
+    if engine == 'cairo':
+        try:
+            from cairo_map_renderer import render_home_printer_pages_cairo
+            render_pages = render_home_printer_pages_cairo
+        except (ImportError, OSError) as e:
+            print(f"Cairo ist nicht verfügbar ({e}), verwende matplotlib")
+    
+    # Wandle alle Regionen einmal in Pfade um, jede Seite zeichnet dann nur noch wenige Collections
+    if renderer is None:
+        renderer = RegionRenderer(gdf)
+    
+    # Feste Farbe jeder Region (Index als String) aus der Farbtabelle
+    region_to_color = region_color_table(renderer)
     
-    # Erstelle eine Karte für jede Seite
+    # Prüfe, ob ein Home-Kennzeichen konfiguriert ist
+    home_code = None
+    if config and 'home' in config and config['home']:
+        home_code = str(config['home']).strip()
+    
+    # Bestimme die Kennzeichen für jede Seite
+    pages = []
     for page in range(1, num_pages + 1):
-        print(f"Erstelle Karte für Seite {page} mit Kennzeichen: ", end="")
-        
-        # Bestimme die Kennzeichen für diese Seite
         start_idx = (page - 1) * CODES_PER_PAGE
         end_idx = min(start_idx + CODES_PER_PAGE, len(regular_codes))
-        page_codes = regular_codes[start_idx:end_idx]
-        
-        print(", ".join(page_codes))
-        
-        # Erstelle eine neue Figur mit DIN-A4 Größe
-        fig, ax = plt.subplots(figsize=(PAGE_WIDTH, PAGE_HEIGHT))
-        
-        # Prüfe, ob ein Home-Kennzeichen konfiguriert ist
-        home_code = None
-        if config and 'home' in config and config['home']:
-            home_code = str(config['home']).strip()
-        
-        # Zeichne die Grundkarte von Deutschland mit weißem Hintergrund und dünnen Grenzen
-        gdf.plot(ax=ax, color='white', edgecolor='lightgray', linewidth=0.3)
-        
-        # Zeichne einen dickeren Rahmen um die gesamte Deutschlandkarte
-        # Dazu erstellen wir eine Kopie des GeoDataFrames und lösen alle inneren Grenzen auf
-        germany_outline = gdf.copy()
-        germany_outline['dissolve_key'] = 1  # Gleicher Wert für alle Zeilen
-        germany_outline = germany_outline.dissolve(by='dissolve_key')
-        germany_outline.plot(ax=ax, facecolor='none', edgecolor='black', linewidth=2.0)
-        
-        # Sammle die Zentroide und Codes für diese Seite
-        centroids_and_codes = []
-        
-        # Verfolge die auf dieser Seite verwendeten Farben
-        used_colors_on_page = set()
-        color_index = 0
-        
-        # Zeichne die Regionen für die Kennzeichen dieser Seite
-        for code in page_codes:
-            # Finde die Region für dieses Kennzeichen
-            if code in code_to_region:
-                region = code_to_region[code]
-                
-                # Weise dieser Region eine Farbe zu, falls noch nicht geschehen
-                # Verwende eine eindeutige ID für die Region als Schlüssel
-                region_id = str(region.name)  # Verwende den Index als eindeutigen Schlüssel
-                if region_id not in region_to_color:
-                    # Wähle eine Farbe aus der gefilterten Liste
-                    color_idx = len(region_to_color) % len(filtered_colors)
-                    region_to_color[region_id] = filtered_colors[color_idx]
-                
-                # Zeichne die Region mit der zugewiesenen Farbe
-                region_id = str(region.name)  # Verwende den gleichen eindeutigen Schlüssel
-                region_name = region.get('NAME', '')
-                if isinstance(region_name, pd.Series) and not region_name.empty:
-                    region_name = region_name.iloc[0]  # Extrahiere den ersten Wert aus der Series
-                
-                region_geom = gdf[gdf['NAME'] == region_name]
-                if not region_geom.empty:
-                    # Zeichne die Region mit der zugewiesenen Farbe
-                    region_geom.plot(ax=ax, color=region_to_color[region_id], edgecolor='black', linewidth=0.5, alpha=0.7)
-                
-                # Berechne den Zentroid
-                centroid = region_geom.geometry.centroid.iloc[0]
+        pages.append((page, regular_codes[start_idx:end_idx]))
+    
+    # Im Entwurfsmodus werden nur Seiten gerendert, deren Inhalt sich seit dem letzten Entwurf geändert hat
+    draft_keys = None
+    if config and config.get('draft'):
+        draft_keys = draft_page_keys(renderer, pages, code_to_name, code_to_other_codes, home_code, engine)
+        try:
+            with open(DRAFT_INDEX, 'r', encoding='utf-8') as f:
+                draft_index = json.load(f)
+        except (OSError, ValueError):
+            draft_index = {}
+        pages = [(page, page_codes) for page, page_codes in pages
+                 if draft_index.get(str(page)) != draft_keys[page]
+                 or not os.path.exists(os.path.join(output_dir, f"kfz_karte_seite_{page:02d}.png"))]
+        print(f"Entwurf: {num_pages - len(pages)} Seiten unverändert, rendere {len(pages)} Seiten")
+    
+    def render(chunk):
+        return render_pages(chunk, renderer, code_to_region, code_to_name, code_to_other_codes,
+                            region_to_color, home_code, dpi=dpi, output_dir=output_dir)
+    
+    # Rendere die Seiten, bei "map_threads" > 1 verteilt auf mehrere Threads
+    if threads is None:
+        threads = config.get('map_threads', 1) if config else 1
+    render_pages_in_threads(render, pages, threads)
+    
+    # Der Index wird erst nach dem Rendern geschrieben, damit abgebrochene Seiten neu entstehen
+    if draft_keys is not None:
+        temp_path = DRAFT_INDEX + f".{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({str(page): key for page, key in draft_keys.items()}, f, sort_keys=True)
+        os.replace(temp_path, DRAFT_INDEX)
+
+
+def home_region_centroid(renderer, code_to_region, home_code):
+    """
+    Gibt den Zentroid der Home-Region zurück (oder None, wenn kein Home-Kennzeichen
+    konfiguriert ist oder seine Region nicht gefunden wird).
+    """
+    if not home_code or home_code not in code_to_region:
+        return None
+    home_region = code_to_region[home_code]
+    home_region_name = home_region.get('NAME', '')
+    if isinstance(home_region_name, pd.Series) and not home_region_name.empty:
+        home_region_name = home_region_name.iloc[0]  # Extrahiere den ersten Wert aus der Series
+    
+    home_rows = renderer.rows_for_name(home_region_name)
+    if not home_rows:
+        return None
+    return renderer.centroids[home_rows[0]]
+
+
+def collect_home_printer_page(renderer, page_codes, code_to_region, region_to_color):
+    """
+    Sammelt die Regionen einer Kartenseite für den Heimdrucker.
+    
+    Rückgabe: (Zeilen der hervorgehobenen Regionen, deren Farben,
+    Liste von (Zentroid, Code, Farbe) sortiert von Nord nach Süd)
+    """
+    centroids_and_codes = []
+    highlight_rows = []
+    highlight_colors = []
+    
+    for code in page_codes:
+        # Finde die Region für dieses Kennzeichen
+        if code in code_to_region:
+            region = code_to_region[code]
+            
+            # Zeichne die Region mit der zugewiesenen Farbe
+            region_id = str(region.name)  # Verwende den Index als eindeutigen Schlüssel
+            region_name = region.get('NAME', '')
+            if isinstance(region_name, pd.Series) and not region_name.empty:
+                region_name = region_name.iloc[0]  # Extrahiere den ersten Wert aus der Series
+            
+            region_rows = renderer.rows_for_name(region_name)
+            if region_rows:
+                # Merke die Region mit der zugewiesenen Farbe vor
+                highlight_rows.extend(region_rows)
+                highlight_colors.extend([region_to_color[region_id]] * len(region_rows))
                 
                 # Füge den Zentroid und den Code hinzu
-                region_id = str(region.name)  # Verwende den gleichen eindeutigen Schlüssel
+                centroid = renderer.centroids[region_rows[0]]
                 centroids_and_codes.append((centroid, code, region_to_color[region_id]))
-        
-        # Stelle sicher, dass das Ausgabeverzeichnis existiert
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        
-        # Bestimme die Grenzen der Karte        
-        bounds = gdf.total_bounds
-        
-        # Berechne die Position für die Labels am rechten Rand
-        text_x = bounds[2] + 0.1  # Rechter Rand + Abstand
-        
-        # Sortiere Zentroide von Nord nach Süd
-        centroids_and_codes.sort(key=lambda x: -x[0].y)  # Sortiere nach y-Koordinate (absteigend)
-        
-        # Berechne den vertikalen Abstand zwischen den Labels
-        y_range = bounds[3] - bounds[1]
-        
-        # Berechne den vertikalen Abstand zwischen den Labels
-        label_spacing = y_range / (len(centroids_and_codes) + 1)
-        
-        # Füge Labels für jede Region hinzu, sortiert von Nord nach Süd
-        for i, (centroid, code, color) in enumerate(centroids_and_codes):
-            # Berechne die y-Position für das Label
-            text_y = bounds[3] - (i + 1) * label_spacing
+    
+    # Sortiere Zentroide von Nord nach Süd
+    centroids_and_codes.sort(key=lambda x: -x[0].y)  # Sortiere nach y-Koordinate (absteigend)
+    return highlight_rows, highlight_colors, centroids_and_codes
+
+
+def home_printer_label_text(code, code_to_name, code_to_other_codes):
+    """
+    Erstellt den Text eines Labels für den Heimdrucker: Code und Name der Region,
+    darunter die weiteren Kennzeichen in Zeilen mit maximal 30 Zeichen.
+    """
+    region_name = code_to_name.get(code, '')
+    region_name = normalize_text(region_name)
+    
+    # Hauptkennzeichen und Regionsname
+    if region_name:
+        main_label = f"{code} - {region_name}"
+    else:
+        main_label = code
+        
+    # Weitere Kennzeichen mit Zeilenumbruch bei Bedarf
+    other_codes = code_to_other_codes.get(code, [])
+    if other_codes:
+        # Gruppiere die Codes in Zeilen mit maximal 30 Zeichen
+        grouped_codes = []
+        current_line = []
+        current_length = 0
+        
+        for c in other_codes:
+            # Prüfe, ob das nächste Kennzeichen in die aktuelle Zeile passt
+            if current_length + len(c) + 2 > 30:  # +2 für Komma und Leerzeichen
+                grouped_codes.append(', '.join(current_line))
+                current_line = [c]
+                current_length = len(c)
+            else:
+                current_line.append(c)
+                current_length += len(c) + 2  # Komma und Leerzeichen
+        
+        # Füge die letzte Zeile hinzu
+        if current_line:
+            grouped_codes.append(', '.join(current_line))
+        
+        # Erstelle den Text mit Zeilenumbrüchen
+        if len(grouped_codes) == 1:
+            other_codes_text = f"Weitere Kennzeichen: {grouped_codes[0]}"
+        else:
+            other_codes_text = "Weitere Kennzeichen:\n" + "\n".join(grouped_codes)
+    else:
+        other_codes_text = ""
+    
+    # Erstelle einen einzigen Text mit allen Informationen
+    label_text = main_label
+    if other_codes_text:
+        label_text += '\n' + other_codes_text
+    return label_text
+
+
+def render_home_printer_pages(pages, renderer, code_to_region, code_to_name, code_to_other_codes, region_to_color, home_code=None, dpi=300, output_dir=OUTPUT_DIR):
+    """
+    Rendert Kartenbilder für den Heimdrucker in einer eigenen Figur.
+    Die Figur wird nur einmal aufgebaut: Grundkarte, Regionen und Home-Marker bleiben für alle
+    Seiten bestehen, pro Seite werden nur die Farben der Regionen getauscht und die Labels neu gezeichnet.
+    
+    Parameter:
+    - pages: Liste von (Seitennummer, Kennzeichen der Seite)
+    - region_to_color: Farbe jeder Region (Index als String)
+    - dpi, output_dir: Auflösung und Verzeichnis der Bilder
+    
+    Rückgabe: Liste von (Seitennummer, Pfad des Bildes)
+    """
+    # Erstelle eine Figur mit DIN-A4 Größe (ohne pyplot, damit mehrere Threads
+    # gleichzeitig eigene Figuren rendern können)
+    fig = Figure(figsize=(PAGE_WIDTH, PAGE_HEIGHT))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    
+    # Zeichne die Grundkarte von Deutschland mit weißem Hintergrund und dünnen Grenzen
+    renderer.draw(ax, facecolors='white', edgecolors='lightgray', linewidths=0.3)
+    
+    # Zeichne einen dickeren Rahmen um die gesamte Deutschlandkarte (einmal berechnet)
+    renderer.draw_outline(ax, edgecolor='black', linewidth=2.0)
+    
+    # Eine Collection für die hervorgehobenen Regionen, die pro Seite nur neu befüllt wird
+    highlights = renderer.highlight_collection(ax, linewidths=0.5)
+    
+    # Zeichne das Home-Kennzeichen auf der Karte, falls konfiguriert (ohne Label)
+    home_centroid = home_region_centroid(renderer, code_to_region, home_code)
+    if home_centroid is not None:
+        # Zeichne einen auffälligen roten Kreis für die Home-Region
+        ax.scatter(home_centroid.x, home_centroid.y, s=120, color='red', marker='o', 
+                  edgecolors='black', linewidths=1.5, zorder=10)
+    
+    # Bestimme die Grenzen der Karte
+    bounds = renderer.bounds
+    
+    # Entferne Achsen und setze Grenzen
+    ax.set_axis_off()
+    ax.set_aspect('equal')
+    
+    # Erweitere die Grenzen, um Platz für die Labels zu schaffen
+    ax.set_xlim(bounds[0] - 0.1, bounds[2] + 1.0)
+    ax.set_ylim(bounds[1] - 0.1, bounds[3] + 0.1)
+    
+    # Alles, was jetzt auf der Karte liegt, bleibt; alles, was eine Seite hinzufügt, wird danach entfernt
+    static_artists = set(ax.get_children())
+    
+    output_files = []
+    for page, page_codes in pages:
+        with stage("map_page", page=page, layout="home_printer"):
+            print(f"Erstelle Karte für Seite {page} mit Kennzeichen: " + ", ".join(page_codes))
             
-            # Setze den Text für das Label
-            code_text = code
-            is_home = False
-            if home_code and home_code == str(code).strip():
-                is_home = True
+            # Regionen, Farben und Zentroide der Kennzeichen dieser Seite (Zentroide von Nord nach Süd)
+            highlight_rows, highlight_colors, centroids_and_codes = collect_home_printer_page(
+                renderer, page_codes, code_to_region, region_to_color)
             
-            # Zeichne eine dickere schwarze Linie vom Zentroid zum Label
-            ax.plot([centroid.x, text_x - 0.2], [centroid.y, text_y], 
-                   color='black', linewidth=1.0, zorder=2)
+            # Setze die Regionen dieser Seite in die Collection ein
+            renderer.set_highlights(highlights, highlight_rows, highlight_colors, edgecolor='black', alpha=0.7)
             
-            # Wenn es das Home-Kennzeichen ist, zeichne einen auffälligen Marker
-            if is_home:
-                # Zeichne einen roten Kreis um den Zentroid
-                ax.scatter(centroid.x, centroid.y, s=120, color='red', marker='o', edgecolors='black', linewidths=1.5, zorder=10)
+            # Berechne die Position für die Labels am rechten Rand
+            text_x = bounds[2] + 0.1  # Rechter Rand + Abstand
             
-            # Zeichne zuerst den farbigen Punkt (außerhalb des Labels)
-            circle_x = text_x - 0.05
-            ax.scatter(circle_x, text_y, s=100, color=color, alpha=0.9, 
-                      edgecolor='black', linewidth=0.5, zorder=10)
+            # Berechne den vertikalen Abstand zwischen den Labels
+            y_range = bounds[3] - bounds[1]
             
-            # Füge den Text hinzu - Code und Name (falls vorhanden)
-            region_name = code_to_name.get(code, '')
-            region_name = normalize_text(region_name)
+            # Berechne den vertikalen Abstand zwischen den Labels
+            label_spacing = y_range / (len(centroids_and_codes) + 1)
             
-            # Hauptkennzeichen und Regionsname
-            if region_name:
-                main_label = f"{code_text} - {region_name}"
-            else:
-                main_label = code_text
+            # Füge Labels für jede Region hinzu, sortiert von Nord nach Süd
+            for i, (centroid, code, color) in enumerate(centroids_and_codes):
+                # Berechne die y-Position für das Label
+                text_y = bounds[3] - (i + 1) * label_spacing
                 
-            # Weitere Kennzeichen mit Zeilenumbruch bei Bedarf
-            other_codes = code_to_other_codes.get(code, [])
-            if other_codes:
-                # Gruppiere die Codes in Zeilen mit maximal 30 Zeichen
-                grouped_codes = []
-                current_line = []
-                current_length = 0
+                is_home = bool(home_code and home_code == str(code).strip())
                 
-                for c in other_codes:
-                    # Prüfe, ob das nächste Kennzeichen in die aktuelle Zeile passt
-                    if current_length + len(c) + 2 > 30:  # +2 für Komma und Leerzeichen
-                        grouped_codes.append(', '.join(current_line))
-                        current_line = [c]
-                        current_length = len(c)
-                    else:
-                        current_line.append(c)
-                        current_length += len(c) + 2  # Komma und Leerzeichen
+                # Zeichne eine dickere schwarze Linie vom Zentroid zum Label
+                ax.plot([centroid.x, text_x - 0.2], [centroid.y, text_y], 
+                       color='black', linewidth=1.0, zorder=2)
                 
-                # Füge die letzte Zeile hinzu
-                if current_line:
-                    grouped_codes.append(', '.join(current_line))
+                # Wenn es das Home-Kennzeichen ist, zeichne einen auffälligen Marker
+                if is_home:
+                    # Zeichne einen roten Kreis um den Zentroid
+                    ax.scatter(centroid.x, centroid.y, s=120, color='red', marker='o', edgecolors='black', linewidths=1.5, zorder=10)
                 
-                # Erstelle den Text mit Zeilenumbrüchen
-                if len(grouped_codes) == 1:
-                    other_codes_text = f"Weitere Kennzeichen: {grouped_codes[0]}"
-                else:
-                    other_codes_text = "Weitere Kennzeichen:\n" + "\n".join(grouped_codes)
-            else:
-                other_codes_text = ""
-            
-            # Erstelle einen einzigen Text mit allen Informationen
-            label_text = main_label
-            if other_codes_text:
-                label_text += '\n' + other_codes_text
+                # Zeichne zuerst den farbigen Punkt (außerhalb des Labels)
+                circle_x = text_x - 0.05
+                ax.scatter(circle_x, text_y, s=100, color=color, alpha=0.9, 
+                          edgecolor='black', linewidth=0.5, zorder=10)
+                
+                # Code, Name und weitere Kennzeichen der Region
+                label_text = home_printer_label_text(code, code_to_name, code_to_other_codes)
+                
+                # Füge dann das Label hinzu (rechts vom Punkt)
+                ax.text(text_x, text_y, label_text, 
+                       fontsize=6, ha='left', va='center', 
+                       multialignment='left',
+                       bbox=dict(facecolor='white', alpha=0.9, 
+                                 boxstyle='round,pad=0.8',
+                                 edgecolor=color, linewidth=1.0))
             
-            # Füge dann das Label hinzu (rechts vom Punkt)
-            ax.text(text_x, text_y, label_text, 
-                   fontsize=6, ha='left', va='center', 
-                   multialignment='left',
-                   bbox=dict(facecolor='white', alpha=0.9, 
-                             boxstyle='round,pad=0.8',
-                             edgecolor=color, linewidth=1.0))
-        
-        # Zeichne das Home-Kennzeichen auf der Karte, falls konfiguriert
-        if home_code and home_code in code_to_region:
-            home_region = code_to_region[home_code]
-            home_region_name = home_region.get('NAME', '')
-            if isinstance(home_region_name, pd.Series) and not home_region_name.empty:
-                home_region_name = home_region_name.iloc[0]  # Extrahiere den ersten Wert aus der Series
+            # Speichere die Karte
+            output_file = os.path.join(output_dir, f"kfz_karte_seite_{page:02d}.png")
+            with full_res_image():
+                fig.savefig(output_file, dpi=dpi, bbox_inches='tight')
+            output_files.append((page, output_file))
             
-            home_geom = gdf[gdf['NAME'] == home_region_name]
+            # Entferne Linien und Labels dieser Seite für die nächste Seite
+            remove_page_artists(ax, static_artists)
             
-            if not home_geom.empty:
-                # Berechne den Zentroid der Home-Region
-                centroid = home_geom.geometry.centroid.iloc[0]
-                
-                # Zeichne einen auffälligen roten Kreis für die Home-Region
-                ax.scatter(centroid.x, centroid.y, s=120, color='red', marker='o', 
-                          edgecolors='black', linewidths=1.5, zorder=10)
-                
-                # Kein Label für die Home-Region hinzufügen, wie gewünscht
-        
-        # Entferne Achsen und setze Grenzen
-        ax.set_axis_off()
-        
-        # Erweitere die Grenzen, um Platz für die Labels zu schaffen
-        ax.set_xlim(bounds[0] - 0.1, bounds[2] + 1.0)
-        ax.set_ylim(bounds[1] - 0.1, bounds[3] + 0.1)
-        
-        # Speichere die Karte
-        output_file = os.path.join(OUTPUT_DIR, f"kfz_karte_seite_{page:02d}.png")
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
-        plt.close(fig)
-        
-        print(f"Karte gespeichert als: {output_file}")
\ No newline at end of file
+            print(f"Karte gespeichert als: {output_file}")
+    
+    return output_files
+
+
+def home_region_map_name(gdf, code_to_region, config=None):
+    """
+    Gibt den Namen der Home-Region zurück, wenn create_home_region_map für diese Konfiguration
+    eine Umgebungskarte erstellt, sonst None. Die LaTeX-Vorlage bindet die Karte nur dann ein.
+    """
+    home_code = None
+    if config and 'home' in config and config['home']:
+        home_code = str(config['home']).strip()
+    if not home_code or home_code not in code_to_region:
+        return None
+    
+    home_region_name = code_to_region[home_code].get('NAME', '')
+    if isinstance(home_region_name, pd.Series) and not home_region_name.empty:
+        home_region_name = home_region_name.iloc[0]  # Extrahiere den ersten Wert aus der Series
+    if 'NAME' not in gdf.columns or not (gdf['NAME'] == home_region_name).any():
+        return None
+    return home_region_name
+
+
+def home_region_viewport(renderer, home_rows, margin=0.15):
+    """
+    Bestimmt den Kartenausschnitt um die Home-Region: das Umgebungsrechteck der Home-Region
+    und ihrer Nachbarn, um einen Rand erweitert und zu einem Quadrat ergänzt.
+    
+    Rückgabe: (minx, miny, maxx, maxy)
+    """
+    rows = set(home_rows)
+    for row in home_rows:
+        rows.update(renderer.neighbors(row))
+    
+    bounds = np.array([renderer.geometries[row].bounds for row in rows
+                       if renderer.geometries[row] is not None and not renderer.geometries[row].is_empty])
+    minx, miny = bounds[:, 0].min(), bounds[:, 1].min()
+    maxx, maxy = bounds[:, 2].max(), bounds[:, 3].max()
+    
+    # Quadratischer Ausschnitt mit Rand um die Mitte
+    half = max(maxx - minx, maxy - miny) * (0.5 + margin)
+    center_x = (minx + maxx) / 2
+    center_y = (miny + maxy) / 2
+    return center_x - half, center_y - half, center_x + half, center_y + half
+
+
+def create_home_region_map(gdf, code_to_region, code_to_name, config=None, renderer=None):
+    """
+    Erstellt eine vergrößerte Karte "Deine Umgebung" mit der Home-Region und ihren Nachbarn.
+    Gezeichnet werden nur die Regionen, die den Ausschnitt schneiden (Abfrage im STRtree des
+    RegionRenderer), mit denselben Pfaden und Farben wie auf den Kartenseiten.
+    
+    Rückgabe: Pfad des Bildes oder None, wenn kein Home-Kennzeichen konfiguriert ist oder seine
+    Region nicht im Shapefile liegt (siehe home_region_map_name)
+    """
+    home_region_name = home_region_map_name(gdf, code_to_region, config)
+    if home_region_name is None:
+        if config and config.get('home'):
+            print(f"Keine Region für das Home-Kennzeichen {config['home']} gefunden, überspringe die Umgebungskarte")
+        return None
+    home_code = str(config['home']).strip()
+    
+    if renderer is None:
+        renderer = RegionRenderer(gdf)
+    home_rows = renderer.rows_for_name(home_region_name)
+    
+    os.makedirs(map_output_dir(config), exist_ok=True)
+    
+    # Ausschnitt und die Regionen darin
+    minx, miny, maxx, maxy = home_region_viewport(renderer, home_rows)
+    visible_rows = renderer.rows_in_bbox(minx, miny, maxx, maxy)
+    region_colors = renderer.region_colors()
+    print(f"Umgebungskarte für {home_code}: {len(visible_rows)} von {len(renderer.paths)} Regionen im Ausschnitt")
+    
+    # Quadratische Figur in Seitenbreite (ohne pyplot)
+    fig = Figure(figsize=(PAGE_WIDTH, PAGE_WIDTH))
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    
+    # Umliegende Regionen in ihren Farben, die Home-Region kräftig mit schwarzem Rand
+    home_row_set = set(home_rows)
+    other_rows = [row for row in visible_rows if row not in home_row_set]
+    renderer.draw(ax, rows=other_rows, facecolors=[region_colors[row] for row in other_rows],
+                  edgecolors='white', linewidths=1.0, alpha=0.5)
+    renderer.draw(ax, rows=home_rows, facecolors=[region_colors[row] for row in home_rows],
+                  edgecolors='black', linewidths=2.5, zorder=2)
+    
+    # Beschrifte jede Region, deren Zentroid im Ausschnitt liegt, mit ihren Kennzeichen und ihrem Namen
+    visible_row_set = set(visible_rows)
+    name_to_codes = {}
+    for code, region in code_to_region.items():
+        region_name = region.get('NAME', '')
+        if isinstance(region_name, pd.Series) and not region_name.empty:
+            region_name = region_name.iloc[0]  # Extrahiere den ersten Wert aus der Series
+        name_to_codes.setdefault(region_name, []).append(code)
+    
+    # Labels nur mit etwas Abstand zum Rand, damit sie nicht abgeschnitten werden
+    inset = (maxx - minx) * 0.08
+    label_minx, label_miny, label_maxx, label_maxy = minx + inset, miny + inset, maxx - inset, maxy - inset
+    
+    for region_name, codes in name_to_codes.items():
+        region_rows = renderer.rows_for_name(region_name)
+        if not region_rows or region_rows[0] not in visible_row_set:
+            continue
+        centroid = renderer.centroids[region_rows[0]]
+        if not (label_minx < centroid.x < label_maxx and label_miny < centroid.y < label_maxy):
+            continue
+        
+        codes = sorted(codes)
+        is_home = home_code in codes
+        label_text = ", ".join(codes) + "\n" + normalize_text(code_to_name.get(codes[0], ''))
+        ax.text(centroid.x, centroid.y, label_text, fontsize=11 if is_home else 8,
+                fontweight='bold' if is_home else 'normal', ha='center', va='center',
+                multialignment='center', zorder=11,
+                bbox=dict(facecolor='white', alpha=0.8, boxstyle='round,pad=0.3', edgecolor='none'))
+    
+    # Roter Marker wie auf den Kartenseiten, knapp unter dem Label der Home-Region
+    home_centroid = renderer.centroids[home_rows[0]]
+    ax.scatter(home_centroid.x, home_centroid.y - (maxy - miny) * 0.04, s=120, color='red', marker='o',
+               edgecolors='black', linewidths=1.5, zorder=10)
+    
+    ax.set_axis_off()
+    ax.set_aspect('equal')
+    ax.set_xlim(minx, maxx)
+    ax.set_ylim(miny, maxy)
+    
+    output_file = os.path.join(map_output_dir(config), f"kfz_umgebung_{home_code}.png")
+    fig.savefig(output_file, dpi=map_dpi(config))
+    print(f"Umgebungskarte gespeichert als: {output_file}")
+    return output_file
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Speicherbegrenzung für lange Batch-Läufe.
+
+Eine Kartenseite mit 300 dpi belegt beim Rastern einen RGBA-Puffer von ca. 35 MB (DIN A4).
+Rendern mehrere Threads gleichzeitig Seiten, liegen entsprechend viele dieser Puffer im Speicher.
+full_res_image() begrenzt, wie viele Seiten ein Prozess gleichzeitig in voller Auflösung hält
+("max_full_res_images" in der Konfiguration bzw. --max-images der Batch-Pipeline).
+
+current_rss_mb() liest den aktuellen Arbeitsspeicher eines Prozesses (nur unter Linux, sonst None)
+und wird vom Watchdog der Batch-Pipeline verwendet. peak_rss_mb() und reset_peak_rss() erlauben
+stage_timing, den Spitzenwert jeder einzelnen Stufe zu messen.
+"""
+
+import threading
+from contextlib import contextmanager
+
+# Semaphore für Seiten in voller Auflösung (None = unbegrenzt)
+_image_slots = None
+_image_slot_count = None
+_slots_lock = threading.Lock()
+
+
+def _read_status_kb(field, pid="self"):
+    """
+    Liest einen Wert in kB aus /proc/<pid>/status (z.B. "VmRSS" oder "VmHWM").
+    Gibt None zurück, wenn /proc nicht verfügbar ist oder der Prozess nicht mehr existiert.
+    """
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def current_rss_mb(pid=None):
+    """
+    Gibt den aktuellen Arbeitsspeicher (RSS) eines Prozesses in MB zurück (Standard: dieser Prozess).
+    """
+    kb = _read_status_kb("VmRSS", pid or "self")
+    return kb / 1024 if kb is not None else None
+
+
+def peak_rss_mb():
+    """
+    Gibt den Spitzenwert des Arbeitsspeichers dieses Prozesses seit dem Start bzw. seit dem
+    letzten reset_peak_rss() in MB zurück (VmHWM, nur unter Linux).
+    """
+    kb = _read_status_kb("VmHWM")
+    return kb / 1024 if kb is not None else None
+
+
+def reset_peak_rss():
+    """
+    Setzt den Spitzenwert (VmHWM) auf den aktuellen Arbeitsspeicher zurück (Linux ab 4.0).
+    Gibt False zurück, wenn das nicht möglich ist.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def configure_image_slots(count):
+    """
+    Legt fest, wie viele Seiten dieser Prozess gleichzeitig in voller Auflösung rastern darf.
+    None oder 0 hebt die Begrenzung auf. Ein unveränderter Wert behält die bestehende Semaphore.
+    """
+    global _image_slots, _image_slot_count
+    count = int(count) if count else None
+    with _slots_lock:
+        if count == _image_slot_count:
+            return
+        _image_slot_count = count
+        _image_slots = threading.BoundedSemaphore(count) if count else None
+
+
+@contextmanager
+def full_res_image():
+    """
+    Belegt einen Platz für eine Seite in voller Auflösung, solange ihr Puffer existiert.
+    Ohne Begrenzung (configure_image_slots nicht aufgerufen) wartet der Block nie.
+    """
+    slots = _image_slots
+    if slots is None:
+        yield
+        return
+    with slots:
+        yield
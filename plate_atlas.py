@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sprite-Atlas der Kennzeichen für die Checklisten.
+Statt für jedes Kennzeichen eine eigene PNG-Datei mit cairosvg zu erzeugen, werden alle
+Kennzeichen in ein einziges SVG gesetzt (ein verschachteltes <svg> pro Kennzeichen aus den
+Vorlagen raw1.svg, raw2.svg und raw3.svg) und in einem Aufruf gerastert.
+
+Neben dem Bild entstehen:
+- index.json: Position jedes Kennzeichens im Atlas in Pixeln
+- plates.tex: LaTeX-Makros, die das Kennzeichen aus dem Atlas ausschneiden. Der Atlas liegt
+  in einer savebox und wird nur einmal in das PDF eingebettet, jedes \\kfzplate{HH} ist
+  nur noch ein Clip auf einen Ausschnitt davon.
+
+Alles liegt in cache/plate_atlas_<schlüssel>/ und wird nur neu erzeugt, wenn sich die
+Kennzeichen, die Vorlagen oder die Schrift ändern.
+"""
+
+import os
+import json
+import math
+import hashlib
+
+from build_manifest import file_hash
+
+PLATE_ATLAS_VERSION = 1
+PLATE_HEIGHT_PX = 72  # Höhe eines Kennzeichens im Atlas in Pixeln
+PLATE_HEIGHT_MM = 4.0  # Höhe eines Kennzeichens in der Checkliste
+PLATE_VIEWBOX = (900, 190)  # Größe der SVG-Vorlagen
+TEMPLATE_FILES = ["raw1.svg", "raw2.svg", "raw3.svg", "EuroPlate.ttf"]
+
+# Zwischenspeicher im Speicher: Schlüssel -> Index des Atlas
+_plate_atlas_cache = {}
+
+
+def plate_atlas_key(codes, height_px=PLATE_HEIGHT_PX, backend="svg"):
+    """
+    Berechnet den Schlüssel des Atlas aus den Kennzeichen, den Vorlagen, der Größe und dem Backend.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": PLATE_ATLAS_VERSION, "height": height_px, "height_mm": PLATE_HEIGHT_MM,
+                         "backend": backend, "codes": sorted(codes)}, ensure_ascii=False).encode("utf-8"))
+    for name in TEMPLATE_FILES:
+        h.update((file_hash(name) or "missing").encode("utf-8"))
+    return h.hexdigest()
+
+
+def plate_atlas_layout(codes, height_px=PLATE_HEIGHT_PX):
+    """
+    Verteilt die Kennzeichen auf ein Raster, das ungefähr quadratisch ist.
+
+    Rückgabe: (Breite, Höhe eines Kennzeichens, Breite, Höhe des Atlas, {Kennzeichen: (x, y)})
+    """
+    plate_w = int(round(height_px * PLATE_VIEWBOX[0] / PLATE_VIEWBOX[1]))
+    plate_h = height_px
+    count = max(1, len(codes))
+    cols = max(1, math.ceil(math.sqrt(count * plate_h / plate_w)))
+    rows = math.ceil(count / cols)
+    positions = {code: ((i % cols) * plate_w, (i // cols) * plate_h) for i, code in enumerate(codes)}
+    return plate_w, plate_h, cols * plate_w, rows * plate_h, positions
+
+
+def build_atlas_svg(codes, positions, plate_w, plate_h, width, height):
+    """
+    Setzt alle Kennzeichen in ein SVG. Die Grafik jeder Vorlage (Rand, Euro-Feld, Plaketten) steht
+    nur einmal unter <defs> und wird pro Kennzeichen mit <use> eingesetzt, nur die Gruppe "Kenz"
+    mit dem Text wird für jedes Kennzeichen kopiert.
+    """
+    import copy
+    from lxml import etree
+    from generate_license_plate import SVG_NAMESPACES, plate_template_path, set_plate_text
+
+    svg_ns = SVG_NAMESPACES['svg']
+    xlink_ns = "http://www.w3.org/1999/xlink"
+    atlas = etree.Element(f"{{{svg_ns}}}svg", nsmap={None: svg_ns, "xlink": xlink_ns},
+                          width=str(width), height=str(height), viewBox=f"0 0 {width} {height}")
+    defs = etree.SubElement(atlas, f"{{{svg_ns}}}defs")
+
+    parser = etree.XMLParser(remove_blank_text=True)
+    templates = {}
+    for code in codes:
+        template_path = plate_template_path(code)
+        if template_path not in templates:
+            root = etree.parse(template_path, parser).getroot()
+            kenz = root.xpath('//svg:g[@id="Kenz"]', namespaces=SVG_NAMESPACES)[0]
+            layer = kenz.getparent()
+
+            # Die Vorlage ohne die Gruppe "Kenz" wird einmal als Definition abgelegt
+            template_id = f"plate_template_{len(templates) + 1}"
+            background = copy.deepcopy(layer)
+            background.set("id", template_id)
+            background.remove(background.xpath('./svg:g[@id="Kenz"]', namespaces=SVG_NAMESPACES)[0])
+            defs.append(background)
+            templates[template_path] = (root, layer, kenz, template_id)
+        root, layer, kenz, template_id = templates[template_path]
+
+        x, y = positions[code]
+        plate = etree.SubElement(atlas, f"{{{svg_ns}}}svg", x=str(x), y=str(y),
+                                 width=str(plate_w), height=str(plate_h),
+                                 viewBox=root.get("viewBox", f"0 0 {PLATE_VIEWBOX[0]} {PLATE_VIEWBOX[1]}"))
+        if root.get("style"):
+            plate.set("style", root.get("style"))
+        etree.SubElement(plate, f"{{{svg_ns}}}use").set(f"{{{xlink_ns}}}href", f"#{template_id}")
+
+        # Der Text steht in derselben Ebene (mit derselben Transformation) wie in der Vorlage
+        text_layer = etree.SubElement(plate, f"{{{svg_ns}}}g",
+                                      {k: v for k, v in layer.attrib.items() if k != "id"})
+        code_group = copy.deepcopy(kenz)
+        set_plate_text(code_group, code)
+        text_layer.append(code_group)
+
+    return etree.tostring(atlas, xml_declaration=True, encoding="utf-8")
+
+
+def plate_macros(atlas_path, positions, plate_w, plate_h, width):
+    """
+    Erzeugt die LaTeX-Makros für den Atlas (benötigt graphicx und tikz).
+    \\kfzplate{HH} setzt das Kennzeichen HH, unbekannte Kennzeichen werden fett als Text gesetzt.
+    """
+    mm_per_px = PLATE_HEIGHT_MM / plate_h
+    lines = [
+        "% Erzeugt von plate_atlas.py",
+        r"\newsavebox{\kfzplateatlas}",
+        r"\AtBeginDocument{\sbox{\kfzplateatlas}{\includegraphics[width=" + f"{width * mm_per_px:.4f}mm" + "]{" + atlas_path + "}}}",
+        # #1 und #2: Position der oberen linken Ecke des Atlas relativ zum Kennzeichen
+        r"\newcommand{\kfzplateat}[2]{\begin{tikzpicture}[baseline=0.8mm]"
+        + r"\clip (0,0) rectangle (" + f"{plate_w * mm_per_px:.4f}mm,{PLATE_HEIGHT_MM:.4f}mm" + ");"
+        + r"\node[anchor=north west,inner sep=0pt] at (#1mm,#2mm) {\usebox{\kfzplateatlas}};"
+        + r"\end{tikzpicture}}",
+        r"\newcommand{\kfzplate}[1]{\ifcsname kfzplate@#1\endcsname\csname kfzplate@#1\endcsname\else\textbf{#1}\fi}",
+    ]
+    for code, (x, y) in sorted(positions.items()):
+        lines.append(r"\expandafter\def\csname kfzplate@" + code + r"\endcsname{\kfzplateat{"
+                     + f"{-x * mm_per_px:.4f}" + "}{" + f"{(y + plate_h) * mm_per_px:.4f}" + "}}")
+    return "\n".join(lines) + "\n"
+
+
+def render_atlas_font(codes, positions, plate_h, width, height, output_path):
+    """
+    Setzt den Atlas mit dem Schrift-Backend von generate_license_plate zusammen: jede Vorlage wird
+    nur einmal mit cairosvg gerastert, die Kennzeichen werden mit PIL daraufgesetzt.
+    """
+    from PIL import Image
+    from generate_license_plate import render_plate_image
+
+    atlas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    for code in codes:
+        atlas.paste(render_plate_image(code, plate_h), tuple(positions[code]))
+    atlas.save(output_path, format="PNG")
+
+
+def load_plate_atlas(codes, base_dir=".", height_px=PLATE_HEIGHT_PX, backend="svg"):
+    """
+    Gibt den Index des Kennzeichen-Atlas zurück und erzeugt Atlas, Index und Makros, wenn sie
+    nicht in cache/ vorliegen. Gibt None zurück, wenn cairosvg (bzw. libcairo) nicht verfügbar ist.
+
+    Mit backend="svg" wird der ganze Atlas als ein SVG gerastert, mit backend="font" werden die
+    Kennzeichen mit PIL und EuroPlate.ttf auf die vorgerasterten Vorlagen gesetzt (schneller,
+    aber mit leicht anderer Kantenglättung, siehe benchmarks/compare_plate_backends.py).
+
+    Der Index enthält "image" und "macros" (Pfade relativ zum Arbeitsverzeichnis), die Größen in
+    Pixeln und unter "plates" die Position (x, y) jedes Kennzeichens.
+    """
+    from geo_cache import CACHE_DIR
+
+    codes = sorted(set(codes))
+    key = plate_atlas_key(codes, height_px, backend)
+    if key in _plate_atlas_cache:
+        return _plate_atlas_cache[key]
+
+    atlas_dir = os.path.join(CACHE_DIR, f"plate_atlas_{key[:16]}")
+    index_path = os.path.join(base_dir, atlas_dir, "index.json")
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if all(os.path.exists(os.path.join(base_dir, index[name])) for name in ("image", "macros")):
+                _plate_atlas_cache[key] = index
+                return index
+        except Exception as e:
+            print(f"Fehler beim Laden des Caches {index_path}: {e}")
+
+    try:
+        import cairosvg
+    except (ImportError, OSError) as e:
+        print(f"cairosvg ist nicht verfügbar ({e}), die Checklisten zeigen die Kennzeichen als Text")
+        return None
+
+    print(f"Erstelle den Kennzeichen-Atlas für {len(codes)} Kennzeichen...")
+    plate_w, plate_h, width, height, positions = plate_atlas_layout(codes, height_px)
+    os.makedirs(os.path.join(base_dir, atlas_dir), exist_ok=True)
+    image_path = os.path.join(atlas_dir, "atlas.png").replace(os.sep, "/")
+    macros_path = os.path.join(atlas_dir, "plates.tex").replace(os.sep, "/")
+    # Bild und Makros atomar schreiben, damit parallele Worker nie halb geschriebene Dateien lesen
+    temp_image = os.path.join(base_dir, image_path) + f".{os.getpid()}.tmp"
+    if backend == "font":
+        render_atlas_font(codes, positions, plate_h, width, height, temp_image)
+    else:
+        svg = build_atlas_svg(codes, positions, plate_w, plate_h, width, height)
+        cairosvg.svg2png(bytestring=svg, write_to=temp_image, output_width=width, output_height=height)
+    os.replace(temp_image, os.path.join(base_dir, image_path))
+    temp_macros = os.path.join(base_dir, macros_path) + f".{os.getpid()}.tmp"
+    with open(temp_macros, "w", encoding="utf-8") as f:
+        f.write(plate_macros(image_path, positions, plate_w, plate_h, width))
+    os.replace(temp_macros, os.path.join(base_dir, macros_path))
+
+    index = {"image": image_path, "macros": macros_path, "plate_width": plate_w, "plate_height": plate_h,
+             "width": width, "height": height, "plates": {code: list(pos) for code, pos in positions.items()}}
+
+    # Der Index wird zuletzt geschrieben und markiert den Cache als vollständig
+    temp_path = index_path + f".{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, sort_keys=True)
+    os.replace(temp_path, index_path)
+
+    _plate_atlas_cache[key] = index
+    return index
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Schneller Renderer für die KFZ-Regionen.
+Alle Regionsgeometrien werden einmal in matplotlib-Pfade umgewandelt. Eine Karte
+besteht dann aus wenigen PathCollections mit einem Farbvektor pro Fläche statt aus
+einem GeoDataFrame.plot()-Aufruf pro Region. Das spart die Suche im GeoDataFrame,
+die vielen einzelnen Artists und das Neuzeichnen der Figur, das geopandas bei jedem
+plot()-Aufruf auslöst.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.path import Path
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba_array
+from shapely import STRtree
+from shapely.geometry import box
+from shapely.geometry.polygon import orient
+
+
+@lru_cache(maxsize=None)
+def _palette():
+    base_colors = []
+    for cmap_name in ['tab10', 'tab20', 'Dark2', 'Set1', 'Set2', 'Paired']:
+        cmap = colormaps.get_cmap(cmap_name)
+        base_colors.extend([cmap(i) for i in np.linspace(0, 1, cmap.N)])
+
+    # Filtere Grautöne heraus (Farben, bei denen R, G und B sehr ähnlich sind)
+    filtered_colors = []
+    for color in base_colors:
+        r, g, b = color[:3]
+        # Wenn die Differenz zwischen den Farbkanälen groß genug ist, ist es kein Grauton
+        if max(abs(r-g), abs(r-b), abs(g-b)) > 0.15:
+            filtered_colors.append(color)
+    return tuple(filtered_colors)
+
+
+def distinct_colors(count=0):
+    """
+    Gibt eine Farbpalette mit kräftigen, unterscheidbaren Farben zurück. Mehrere Farbpaletten
+    werden kombiniert und Grautöne herausgefiltert (einmal pro Prozess). Die Liste wird bei
+    Bedarf auf mindestens count Einträge verlängert.
+    """
+    filtered_colors = list(_palette())
+    while len(filtered_colors) < count:
+        filtered_colors.extend(filtered_colors)
+    return filtered_colors
+
+
+def _ring_path_parts(ring):
+    """
+    Gibt Stützpunkte und Pfadcodes eines geschlossenen Rings zurück.
+    """
+    coords = np.asarray(ring.coords)[:, :2]
+    codes = np.full(len(coords), Path.LINETO, dtype=Path.code_type)
+    codes[0] = Path.MOVETO
+    codes[-1] = Path.CLOSEPOLY
+    return coords, codes
+
+
+def geometry_to_path(geom):
+    """
+    Wandelt ein Polygon oder MultiPolygon in einen einzelnen matplotlib-Pfad um.
+    Die Ringe werden so ausgerichtet (außen gegen, innen im Uhrzeigersinn), dass Löcher
+    beim Füllen ausgespart bleiben.
+
+    Returns:
+        Path: Der Pfad oder None für leere bzw. nicht flächige Geometrien
+    """
+    if geom is None or geom.is_empty:
+        return None
+    if geom.geom_type == "Polygon":
+        polygons = [geom]
+    elif geom.geom_type in ("MultiPolygon", "GeometryCollection"):
+        polygons = [g for g in geom.geoms if g.geom_type == "Polygon" and not g.is_empty]
+    else:
+        return None
+    if not polygons:
+        return None
+
+    vertices = []
+    codes = []
+    for polygon in polygons:
+        polygon = orient(polygon, sign=1.0)
+        for ring in [polygon.exterior] + list(polygon.interiors):
+            ring_vertices, ring_codes = _ring_path_parts(ring)
+            vertices.append(ring_vertices)
+            codes.append(ring_codes)
+    return Path(np.concatenate(vertices), np.concatenate(codes))
+
+
+def paths_to_arrays(paths):
+    """
+    Legt die Stützpunkte und Pfadcodes mehrerer Pfade in zusammenhängende Arrays.
+    Leere Pfade (None) belegen einen Eintrag der Länge 0.
+
+    Returns:
+        tuple: (vertices (N, 2), codes (N,), offsets (len(paths) + 1,))
+    """
+    lengths = [len(path.vertices) if path is not None else 0 for path in paths]
+    offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    vertices = np.empty((offsets[-1], 2), dtype=np.float64)
+    codes = np.empty(offsets[-1], dtype=Path.code_type)
+    for i, path in enumerate(paths):
+        if path is not None:
+            vertices[offsets[i]:offsets[i + 1]] = path.vertices
+            codes[offsets[i]:offsets[i + 1]] = path.codes
+    return vertices, codes, offsets
+
+
+def arrays_to_paths(vertices, codes, offsets):
+    """
+    Erzeugt aus den Arrays von paths_to_arrays wieder eine Liste von Pfaden (ohne Kopie der Daten).
+    """
+    paths = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        if end > start:
+            paths.append(Path(vertices[start:end], codes[start:end], readonly=True))
+        else:
+            paths.append(None)
+    return paths
+
+
+def make_collection(paths, facecolors, edgecolors='none', linewidths=0.0, alpha=None, zorder=1):
+    """
+    Erstellt eine PathCollection aus vorberechneten Pfaden.
+
+    Args:
+        paths (list): Liste von matplotlib-Pfaden
+        facecolors: Eine Farbe oder eine Farbe pro Pfad
+        edgecolors: Randfarbe(n)
+        linewidths: Linienbreite(n)
+        alpha (float, optional): Transparenz, wird mit den Farben verrechnet
+        zorder (float): Zeichenreihenfolge
+    """
+    facecolors = to_rgba_array(facecolors)
+    if alpha is not None:
+        facecolors[:, 3] *= alpha
+    if not (isinstance(edgecolors, str) and edgecolors == 'none'):
+        edgecolors = to_rgba_array(edgecolors)
+        if alpha is not None:
+            edgecolors[:, 3] *= alpha
+    return PathCollection(paths, facecolors=facecolors, edgecolors=edgecolors,
+                          linewidths=linewidths, zorder=zorder)
+
+
+def draw_geometries(ax, geometries, facecolors, edgecolors='none', linewidths=0.0, alpha=None, zorder=1):
+    """
+    Zeichnet eine Liste von Shapely-Geometrien als eine einzige Collection.
+    facecolors kann eine Farbe oder eine Farbe pro Geometrie sein.
+    """
+    facecolors = to_rgba_array(facecolors)
+    if len(facecolors) == 1:
+        facecolors = np.repeat(facecolors, len(geometries), axis=0)
+    paths = []
+    colors = []
+    for geom, color in zip(geometries, facecolors):
+        path = geometry_to_path(geom)
+        if path is not None:
+            paths.append(path)
+            colors.append(color)
+    if not paths:
+        return None
+    collection = make_collection(paths, colors, edgecolors, linewidths, alpha, zorder)
+    ax.add_collection(collection)
+    return collection
+
+
+class RegionRenderer:
+    """
+    Hält die vorberechneten Pfade aller Regionen eines GeoDataFrames.
+    Die Pfade stammen aus dem Pfad-Cache in geo_cache (vereinfachte Geometrien, einmal
+    berechnet und in cache/ gespeichert), sodass beim Zeichnen keine Umwandlung von
+    Shapely nach matplotlib mehr nötig ist.
+
+    Beispiel:
+        renderer = RegionRenderer(gdf)
+        renderer.draw(ax, facecolors='white', edgecolors='lightgray', linewidths=0.3)
+        renderer.draw(ax, rows=renderer.rows_for_name('Ostalbkreis'), facecolors=['red'])
+    """
+
+    def __init__(self, gdf, name_column='NAME', base_dir='.'):
+        from shapely import points
+        from geo_cache import load_region_paths
+
+        data = load_region_paths(gdf.geometry, base_dir)
+        self.base_dir = base_dir
+        self.geometries = np.asarray(gdf.geometry, dtype=object)
+        self.index = list(gdf.index)
+        self.paths = arrays_to_paths(data['vertices'], data['codes'], data['offsets'])
+        self.centroids = list(points(data['centroids']))
+        self.bounds = gdf.total_bounds
+        self._outline_path = None
+        if data['outline_vertices'] is not None:
+            self._outline_path = Path(data['outline_vertices'], data['outline_codes'], readonly=True)
+        self._row_for_index = {index: row for row, index in enumerate(self.index)}
+        self._row_for_geometry = {}
+        for row, geom in enumerate(gdf.geometry):
+            if geom is not None:
+                self._row_for_geometry.setdefault(geom, row)
+        self._region_colors = {}
+        self._tree = None
+        self._rows_for_name = {}
+        if name_column in gdf.columns:
+            for row, name in enumerate(gdf[name_column]):
+                self._rows_for_name.setdefault(name, []).append(row)
+
+    def row_for_index(self, index):
+        """
+        Gibt die Zeilennummer zum Index des GeoDataFrames zurück (oder None).
+        """
+        return self._row_for_index.get(index)
+
+    def row_for_geometry(self, geom):
+        """
+        Gibt die Zeilennummer einer Geometrie aus dem GeoDataFrame zurück (oder None).
+        """
+        return self._row_for_geometry.get(geom)
+
+    def rows_for_name(self, name):
+        """
+        Gibt die Zeilennummern aller Regionen mit diesem Namen zurück.
+        """
+        return self._rows_for_name.get(name, [])
+
+    def region_colors(self, palette=None):
+        """
+        Gibt die Farbe jeder Zeile aus der Farbtabelle in geo_cache zurück (benachbarte Regionen
+        bekommen möglichst unterschiedliche Farben). Standard ist die Palette aus distinct_colors.
+        """
+        from geo_cache import load_region_colors
+
+        palette = tuple(tuple(color) for color in (palette if palette is not None else distinct_colors()))
+        if palette not in self._region_colors:
+            indices = load_region_colors(self.geometries, palette, self.base_dir)
+            self._region_colors[palette] = [palette[i] for i in indices]
+        return self._region_colors[palette]
+
+    def color_for_index(self, index, palette=None):
+        """
+        Gibt die Farbe der Region mit diesem Index des GeoDataFrames zurück (oder None).
+        """
+        row = self.row_for_index(index)
+        return self.region_colors(palette)[row] if row is not None else None
+
+    @property
+    def tree(self):
+        """
+        Räumlicher Index (STRtree) über alle Regionen, wird beim ersten Zugriff aufgebaut.
+        Leere Geometrien werden übersprungen, die Ergebnisse sind Zeilennummern.
+        """
+        if self._tree is None:
+            self._tree = STRtree(self.geometries)
+        return self._tree
+
+    def rows_in_bbox(self, minx, miny, maxx, maxy):
+        """
+        Gibt die Zeilennummern aller Regionen zurück, deren Umgebungsrechteck den Ausschnitt schneidet.
+        """
+        return sorted(self.tree.query(box(minx, miny, maxx, maxy)).tolist())
+
+    def neighbors(self, row, distance=None):
+        """
+        Gibt die Zeilennummern der Nachbarregionen einer Zeile zurück (Abstand wie bei der Farbtabelle).
+        """
+        from geo_cache import ADJACENCY_DISTANCE
+
+        geom = self.geometries[row]
+        if geom is None or geom.is_empty:
+            return []
+        distance = ADJACENCY_DISTANCE if distance is None else distance
+        rows = self.tree.query(geom, predicate="dwithin", distance=distance).tolist()
+        return sorted(r for r in rows if r != row)
+
+    @property
+    def outline_path(self):
+        """
+        Umriss aller Regionen (ohne innere Grenzen).
+        """
+        return self._outline_path
+
+    def draw(self, ax, rows=None, facecolors='white', edgecolors='none', linewidths=0.0, alpha=None, zorder=1):
+        """
+        Zeichnet die angegebenen Regionen (Standard: alle) als eine Collection.
+        facecolors kann eine Farbe oder eine Farbe pro Region sein.
+
+        Returns:
+            PathCollection: Die gezeichnete Collection oder None, wenn nichts zu zeichnen ist
+        """
+        if rows is None:
+            rows = range(len(self.paths))
+        facecolors = to_rgba_array(facecolors)
+        if len(facecolors) == 1:
+            facecolors = np.repeat(facecolors, len(rows), axis=0)
+
+        paths = []
+        colors = []
+        for row, color in zip(rows, facecolors):
+            if self.paths[row] is not None:
+                paths.append(self.paths[row])
+                colors.append(color)
+        if not paths:
+            return None
+        collection = make_collection(paths, colors, edgecolors, linewidths, alpha, zorder)
+        ax.add_collection(collection)
+        return collection
+
+    def highlight_collection(self, ax, linewidths=0.5, zorder=1):
+        """
+        Fügt eine zunächst leere Collection für die hervorgehobenen Regionen hinzu.
+        Mit set_highlights werden pro Seite nur Pfade und Farben getauscht, die Figur bleibt bestehen.
+        """
+        collection = PathCollection([], facecolors='none', edgecolors='none',
+                                    linewidths=linewidths, zorder=zorder)
+        ax.add_collection(collection)
+        return collection
+
+    def set_highlights(self, collection, rows, facecolors, edgecolor='black', alpha=0.7):
+        """
+        Ersetzt die Regionen einer Collection aus highlight_collection durch die angegebenen
+        Regionen in den angegebenen Farben (wie draw, aber ohne neue Collection).
+        """
+        paths = []
+        colors = []
+        for row, color in zip(rows, to_rgba_array(facecolors) if len(rows) else []):
+            if self.paths[row] is not None:
+                paths.append(self.paths[row])
+                colors.append(color)
+        faces = to_rgba_array(colors) if colors else np.zeros((0, 4))
+        edges = np.repeat(to_rgba_array(edgecolor), len(paths), axis=0)
+        if alpha is not None:
+            faces[:, 3] *= alpha
+            edges[:, 3] *= alpha
+        collection.set_paths(paths)
+        collection.set_facecolor(faces)
+        collection.set_edgecolor(edges)
+
+    def draw_outline(self, ax, edgecolor='black', linewidth=2.0, zorder=1):
+        """
+        Zeichnet den Umriss aller Regionen.
+        """
+        if self.outline_path is None:
+            return None
+        collection = PathCollection([self.outline_path], facecolors='none', edgecolors=edgecolor,
+                                    linewidths=linewidth, zorder=zorder)
+        ax.add_collection(collection)
+        return collection
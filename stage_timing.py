@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zeitmessung und Profiling für die einzelnen Stufen der Buch-Erstellung.
+Jede Stufe (Shapefile laden, Kennzeichen extrahieren, Titelbild, Kartenseiten,
+LaTeX, xelatex-Läufe, PDF-Nachbearbeitung) wird als JSON-Zeile pro Edition
+in timings/<KENNZEICHEN>.jsonl geschrieben.
+
+Jeder Eintrag trägt die Kennung des Laufs (run_id). Ein Prozess übernimmt sie aus KFZ_RUN_ID
+oder erzeugt eine neue und gibt sie über KFZ_RUN_ID an seine Unterprozesse weiter, sodass alle
+Einträge eines Batches dieselbe Kennung haben.
+
+Steuerung über Umgebungsvariablen:
+    KFZ_TIMINGS=0            Zeitmessung abschalten
+    KFZ_RUN_ID=<kennung>     Kennung des Laufs (Standard: Startzeit und PID des obersten Prozesses)
+    KFZ_TIMINGS_DIR=<pfad>   Verzeichnis für die JSON-Zeilen (Standard: timings)
+    KFZ_PROFILE=<stufen>     Kommagetrennte Stufen, die profiliert werden sollen ("all" für alle)
+    KFZ_PROFILER=<name>      "cprofile" (Standard) oder "pyinstrument"
+
+Auswertung über einen ganzen Batch (Standard: der letzte Lauf):
+    python stage_timing.py report [timings] [--run <kennung> | --all]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+
+from memory_guard import current_rss_mb, peak_rss_mb, reset_peak_rss
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TIMINGS_DIR = os.path.join(BASE_DIR, "timings")
+
+
+def new_run_id():
+    """
+    Erzeugt eine neue Kennung für einen Lauf (Startzeit und PID).
+    """
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+
+# Zustand des aktuellen Prozesses
+_edition = None
+_run_id = os.environ.setdefault("KFZ_RUN_ID", new_run_id())
+_timings_dir = os.environ.get("KFZ_TIMINGS_DIR", DEFAULT_TIMINGS_DIR)
+_enabled = os.environ.get("KFZ_TIMINGS", "1") != "0"
+_profile_stages = {s.strip() for s in os.environ.get("KFZ_PROFILE", "").split(",") if s.strip()}
+_profiler_name = os.environ.get("KFZ_PROFILER", "cprofile")
+_local = threading.local()  # Stufen-Stapel pro Thread (Kartenseiten können in Threads laufen)
+_write_lock = threading.Lock()
+_peak_lock = threading.Lock()
+_active_stages = 0  # Laufende Stufen in allen Threads (für den Spitzenwert pro Stufe)
+_reset_peak_mb = 0.0  # Höchster Spitzenwert vor einem Zurücksetzen (siehe _begin_stage_peak)
+_profiling_active = False
+_profile_counter = 0
+
+
+def configure(edition=None, timings_dir=None, enabled=None, profile_stages=None, profiler=None, run_id=None):
+    """
+    Setzt die Edition (das Home-Kennzeichen) und optional das Ausgabeverzeichnis, Profiling und
+    die Kennung des Laufs (wird auch an später gestartete Unterprozesse weitergegeben).
+    Nicht angegebene Werte bleiben unverändert.
+    """
+    global _edition, _timings_dir, _enabled, _profile_stages, _profiler_name, _run_id
+    if edition is not None:
+        _edition = str(edition)
+    if run_id is not None:
+        _run_id = os.environ["KFZ_RUN_ID"] = str(run_id)
+    if timings_dir is not None:
+        _timings_dir = timings_dir
+    if enabled is not None:
+        _enabled = enabled
+    if profile_stages is not None:
+        _profile_stages = set(profile_stages)
+    if profiler is not None:
+        _profiler_name = profiler
+
+
+def timings_dir():
+    """
+    Gibt das aktuelle Verzeichnis der Zeitmessungen zurück (KFZ_TIMINGS_DIR oder timings).
+    """
+    return _timings_dir
+
+
+def _peak_rss_mb():
+    """
+    Gibt den bisherigen Spitzenwert des Arbeitsspeichers (RSS) dieses Prozesses in MB zurück.
+    Dient als Ersatz, wenn der Spitzenwert einer Stufe nicht einzeln messbar ist (ohne /proc).
+    Unter Windows (ohne das resource-Modul) wird None zurückgegeben.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS liefert Bytes, Linux Kilobytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    # Unter Linux setzt das Zurücksetzen für den Spitzenwert pro Stufe auch ru_maxrss zurück
+    return max(peak / 1024, _reset_peak_mb)
+
+
+def _timings_file():
+    edition = _edition or "ohne_edition"
+    return os.path.join(_timings_dir, f"{edition}.jsonl")
+
+
+def _stage_stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _peak_frames():
+    if not hasattr(_local, "peak_frames"):
+        _local.peak_frames = []
+    return _local.peak_frames
+
+
+def _begin_stage_peak():
+    """
+    Beginnt die Messung des Spitzenspeichers einer Stufe. Der bisherige Spitzenwert geht an die
+    umgebende Stufe, danach wird er zurückgesetzt, damit er nur noch diese Stufe erfasst. Laufen in
+    anderen Threads Stufen, bleibt er stehen (der Wert der Stufe ist dann eine Obergrenze).
+    """
+    global _active_stages, _reset_peak_mb
+    frames = _peak_frames()
+    peak = peak_rss_mb()
+    with _peak_lock:
+        if frames and peak is not None:
+            frames[-1]["carried"] = max(frames[-1]["carried"], peak)
+        exact = _active_stages == len(frames)
+        if exact and peak is not None:
+            _reset_peak_mb = max(_reset_peak_mb, peak)
+        if exact and peak is not None and reset_peak_rss():
+            peak = peak_rss_mb()
+        else:
+            exact = False
+        _active_stages += 1
+    frames.append({"carried": peak or 0.0, "exact": exact})
+
+
+def _end_stage_peak():
+    """
+    Beendet die Messung des Spitzenspeichers einer Stufe.
+
+    Returns:
+        tuple: (Spitzenwert in MB oder None, ob der Wert nur für diese Stufe gilt)
+    """
+    global _active_stages
+    frames = _peak_frames()
+    frame = frames.pop()
+    peak = peak_rss_mb()
+    with _peak_lock:
+        _active_stages -= 1
+    if peak is None:
+        return None, False
+    peak = max(frame["carried"], peak)
+    if frames:
+        frames[-1]["carried"] = max(frames[-1]["carried"], peak)
+        frames[-1]["exact"] = frames[-1]["exact"] and frame["exact"]
+    return peak, frame["exact"]
+
+
+def _write_record(record, timings_file=None):
+    os.makedirs(_timings_dir, exist_ok=True)
+    with _write_lock:
+        with open(timings_file or _timings_file(), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _should_profile(name):
+    return not _profiling_active and ("all" in _profile_stages or name in _profile_stages)
+
+
+@contextmanager
+def _profiled(name):
+    """
+    Profiliert einen Block mit cProfile oder pyinstrument und speichert das Ergebnis
+    unter timings/profiles/. Verschachtelte Stufen werden nur einmal profiliert.
+    """
+    global _profiling_active, _profile_counter
+    _profile_counter += 1
+    profile_dir = os.path.join(_timings_dir, "profiles")
+    os.makedirs(profile_dir, exist_ok=True)
+    base_name = f"{_edition or 'ohne_edition'}_{name}_{os.getpid()}_{_profile_counter:03d}"
+
+    _profiling_active = True
+    try:
+        if _profiler_name == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                with open(os.path.join(profile_dir, base_name + ".html"), "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(profile_dir, base_name + ".prof"))
+    finally:
+        _profiling_active = False
+
+
+@contextmanager
+def stage(name, **meta):
+    """
+    Misst die Laufzeit (Wand- und CPU-Zeit) und den Speicherbedarf einer Stufe.
+
+    Beispiel:
+        with stage("map_page", page=3):
+            ...
+
+    Args:
+        name (str): Name der Stufe, z.B. "shapefile_load" oder "xelatex"
+        **meta: Zusätzliche Angaben, die mit in die JSON-Zeile geschrieben werden
+    """
+    if not _enabled:
+        yield
+        return
+
+    stack = _stage_stack()
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    rss_before = current_rss_mb()
+    _begin_stage_peak()
+    start_time = time.time()
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    ok = True
+    try:
+        if _should_profile(name):
+            with _profiled(name):
+                yield
+        else:
+            yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        wall = time.perf_counter() - start_wall
+        cpu = time.process_time() - start_cpu
+        rss_after = current_rss_mb()
+        stage_peak, stage_peak_exact = _end_stage_peak()
+        if stage_peak is None:
+            # Ohne /proc bleibt nur der Spitzenwert des Prozesses bis zum Ende der Stufe
+            stage_peak, stage_peak_exact = _peak_rss_mb(), False
+        stack.pop()
+        record = {
+            "edition": _edition,
+            "run_id": _run_id,
+            "stage": name,
+            "parent": parent,
+            "start": round(start_time, 3),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            # Spitzenwert während der Stufe und Änderung des aktuellen Arbeitsspeichers durch die Stufe
+            "peak_rss_mb": round(stage_peak, 1) if stage_peak is not None else None,
+            "rss_growth_mb": round(rss_after - rss_before, 1)
+                             if rss_after is not None and rss_before is not None else None,
+            "ok": ok,
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+        }
+        if stage_peak is not None and not stage_peak_exact:
+            record["peak_exact"] = False
+        if meta:
+            record["meta"] = meta
+        try:
+            _write_record(record)
+        except OSError as e:
+            print(f"Fehler beim Schreiben der Zeitmessung für {name}: {e}")
+
+
+def record(edition, name, start_time, wall_s, **meta):
+    """
+    Schreibt eine bereits gemessene oberste Stufe für eine bestimmte Edition, z.B. aus der
+    Batch-Pipeline, in der mehrere Editionen gleichzeitig im selben Prozess laufen.
+    """
+    if not _enabled:
+        return
+    entry = {
+        "edition": str(edition),
+        "run_id": _run_id,
+        "stage": name,
+        "parent": None,
+        "start": round(start_time, 3),
+        "wall_s": round(wall_s, 4),
+        "cpu_s": None,
+        "peak_rss_mb": None,
+        "rss_growth_mb": None,
+        "ok": True,
+        "pid": os.getpid(),
+        "host": socket.gethostname(),
+    }
+    if meta:
+        entry["meta"] = meta
+    try:
+        _write_record(entry, os.path.join(_timings_dir, f"{edition}.jsonl"))
+    except OSError as e:
+        print(f"Fehler beim Schreiben der Zeitmessung für {name}: {e}")
+
+
+def load_records(timings_dir=DEFAULT_TIMINGS_DIR):
+    """
+    Liest alle JSON-Zeilen aus einem Zeitmessungs-Verzeichnis (alle Läufe).
+    """
+    records = []
+    if not os.path.isdir(timings_dir):
+        return records
+    for file_name in sorted(os.listdir(timings_dir)):
+        if not file_name.endswith(".jsonl"):
+            continue
+        with open(os.path.join(timings_dir, file_name), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+    return records
+
+
+def latest_run_id(records):
+    """
+    Gibt die Kennung des zuletzt gestarteten Laufs zurück (None, wenn kein Eintrag eine hat).
+    """
+    starts = {}
+    for record in records:
+        run_id = record.get("run_id")
+        if run_id is not None:
+            starts[run_id] = min(starts.get(run_id, float("inf")), record.get("start") or 0)
+    return max(starts, key=starts.get) if starts else None
+
+
+def filter_run(records, run_id):
+    """
+    Gibt die Einträge eines Laufs zurück.
+    """
+    return [record for record in records if record.get("run_id") == run_id]
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(records):
+    """
+    Fasst die Zeitmessungen pro Stufe und pro Edition zusammen.
+
+    Returns:
+        tuple: (stage_summary, edition_totals)
+            stage_summary: Stufe -> {count, total_s, mean_s, p50_s, p95_s, max_s, max_rss_mb}
+            edition_totals: Edition -> Summe der Wandzeit der obersten Stufen
+    """
+    by_stage = {}
+    edition_totals = {}
+    for record in records:
+        by_stage.setdefault(record["stage"], []).append(record)
+        if record.get("parent") is None:
+            edition = record.get("edition") or "ohne_edition"
+            edition_totals[edition] = edition_totals.get(edition, 0.0) + record["wall_s"]
+
+    stage_summary = {}
+    for name, stage_records in by_stage.items():
+        walls = sorted(r["wall_s"] for r in stage_records)
+        rss_values = [r["peak_rss_mb"] for r in stage_records if r.get("peak_rss_mb") is not None]
+        stage_summary[name] = {
+            "count": len(walls),
+            "total_s": sum(walls),
+            "mean_s": sum(walls) / len(walls),
+            "p50_s": _percentile(walls, 0.5),
+            "p95_s": _percentile(walls, 0.95),
+            "max_s": walls[-1],
+            "max_rss_mb": max(rss_values) if rss_values else None,
+        }
+    return stage_summary, edition_totals
+
+
+def print_report(timings_dir=DEFAULT_TIMINGS_DIR, run_id=None, all_runs=False):
+    """
+    Gibt eine Zusammenfassung der Zeitmessungen eines Batches aus.
+
+    Args:
+        timings_dir (str): Verzeichnis mit den JSON-Zeilen
+        run_id (str, optional): Nur diesen Lauf auswerten (Standard: den zuletzt gestarteten)
+        all_runs (bool): Alle jemals aufgezeichneten Läufe zusammen auswerten
+    """
+    records = load_records(timings_dir)
+    if not all_runs:
+        run_id = run_id or latest_run_id(records)
+        records = filter_run(records, run_id) if run_id is not None else records
+    if not records:
+        print(f"Keine Zeitmessungen in {timings_dir} gefunden.")
+        return
+
+    stage_summary, edition_totals = summarize(records)
+    source = "alle Läufe" if all_runs or run_id is None else f"Lauf {run_id}"
+    print(f"Zeitmessungen aus {timings_dir} ({source}): {len(records)} Einträge, "
+          f"{len(edition_totals)} Editionen\n")
+    header = f"{'Stufe':<22}{'Anzahl':>8}{'Summe s':>11}{'Mittel s':>10}{'p50 s':>9}{'p95 s':>9}{'Max s':>9}{'Max RSS MB':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, s in sorted(stage_summary.items(), key=lambda item: -item[1]["total_s"]):
+        rss = f"{s['max_rss_mb']:.0f}" if s["max_rss_mb"] is not None else "-"
+        print(f"{name:<22}{s['count']:>8}{s['total_s']:>11.1f}{s['mean_s']:>10.2f}"
+              f"{s['p50_s']:>9.2f}{s['p95_s']:>9.2f}{s['max_s']:>9.2f}{rss:>12}")
+
+    totals = sorted(edition_totals.values())
+    print(f"\nZeit pro Edition: Mittel {sum(totals) / len(totals):.1f} s, "
+          f"p50 {_percentile(totals, 0.5):.1f} s, Max {totals[-1]:.1f} s")
+    slowest = sorted(edition_totals.items(), key=lambda item: -item[1])[:5]
+    print("Langsamste Editionen: " + ", ".join(f"{edition} ({total:.1f} s)" for edition, total in slowest))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Auswertung der Stufen-Zeitmessungen")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="Zeitmessungen eines Batches zusammenfassen")
+    report_parser.add_argument("timings_dir", nargs="?", default=DEFAULT_TIMINGS_DIR,
+                               help="Verzeichnis mit den JSON-Zeilen (Standard: timings)")
+    run_group = report_parser.add_mutually_exclusive_group()
+    run_group.add_argument("--run", dest="run_id", help="Nur diesen Lauf auswerten (Standard: der letzte Lauf)")
+    run_group.add_argument("--all", dest="all_runs", action="store_true", help="Alle Läufe zusammen auswerten")
+
+    args = parser.parse_args()
+
+    if args.command == "report":
+        print_report(args.timings_dir, args.run_id, args.all_runs)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Watch-Modus für ein Buch: beobachtet die Eingaben (CSV-Dateien, Shapefile, config.json,
+SVG-Vorlagen, Schrift, Python-Module) und baut bei jeder Änderung nur die Stufen neu, die von
+der geänderten Datei betroffen sind (siehe build_manifest.STAGE_INPUTS und affected_stages).
+
+Der Prozess bleibt zwischen den Builds bestehen: das Shapefile und die extrahierten Kennzeichen
+bleiben geladen (neu geladen nur, wenn sich das Shapefile bzw. die CSV-Dateien ändern), ebenso
+die Zwischenspeicher im Speicher (Pfade der Regionen, Farben, Lagekarten, Hintergründe).
+Geänderte Module werden mit importlib.reload neu geladen, zusammen mit den Modulen, die auf
+ihnen aufbauen (siehe RELOAD_ORDER).
+
+Beispiel:
+    python watch_build.py --home HH --draft
+    python watch_build.py --home HH --stages title,maps,tex
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib
+import traceback
+
+from build_manifest import STAGES, BOOK_STAGES, SHAPEFILE_INPUTS, CSV_INPUTS, watched_inputs, affected_stages, _abs_path
+
+# Module des Projekts, von den grundlegenden zu denen, die auf ihnen aufbauen. Ändert sich ein
+# Modul, werden es und alle danach stehenden (bereits geladenen) Module neu geladen; die Module
+# davor behalten ihre Zwischenspeicher.
+RELOAD_ORDER = [
+    "memory_guard", "stage_timing", "normalizer", "build_manifest", "geo_cache", "region_renderer", "locator_maps",
+    "generate_license_plate", "plate_atlas", "book_sections", "kfz_puzzle_generator", "map_creator",
+    "cairo_map_renderer", "generate_home_print_latex_template", "create_title_image", "generate_kfz_maps_neu",
+]
+
+
+def snapshot(paths):
+    """
+    Gibt für jede Datei (Größe, Änderungszeit) zurück, oder None, wenn sie fehlt.
+    """
+    state = {}
+    for path in paths:
+        try:
+            stat = os.stat(_abs_path(path))
+            state[path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            state[path] = None
+    return state
+
+
+def reload_modules(changed):
+    """
+    Lädt die geänderten Module und alle Module, die in RELOAD_ORDER danach stehen, neu.
+    Gibt die Namen der neu geladenen Module zurück.
+    """
+    names = {os.path.splitext(os.path.basename(path))[0] for path in changed if path.endswith(".py")}
+    if not names:
+        return []
+    positions = [RELOAD_ORDER.index(name) for name in names if name in RELOAD_ORDER]
+    start = min(positions) if positions else len(RELOAD_ORDER)
+    order = [name for name in names if name not in RELOAD_ORDER] + RELOAD_ORDER[start:]
+
+    reloaded = []
+    for name in order:
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+            reloaded.append(name)
+    return reloaded
+
+
+class WatchSession:
+    """
+    Hält den Zustand zwischen den Builds: Shapefile und Kennzeichen (load_book_data).
+    """
+
+    def __init__(self, home_code, output_suffix="", draft=False, stages=STAGES):
+        self.home_code = home_code
+        self.output_suffix = output_suffix
+        self.draft = draft
+        self.stages = stages
+        self.data = None
+
+    def rebuild(self, stages, changed=()):
+        """
+        Baut die angegebenen Stufen neu. Das Shapefile wird nur geladen, wenn es sich geändert hat
+        (oder noch nicht geladen ist), die Kennzeichen werden bei geänderten CSV-Dateien neu extrahiert.
+        """
+        import generate_kfz_maps_neu
+
+        changed = set(changed)
+        if self.data is None or changed & set(SHAPEFILE_INPUTS):
+            if self.data is not None:
+                # Die Vorlage merkt sich Extrempositionen und die größte Region aus den Geometrien
+                reload_modules(["generate_home_print_latex_template.py"])
+            self.data = generate_kfz_maps_neu.load_book_data()
+        elif changed & set(CSV_INPUTS):
+            self.data = generate_kfz_maps_neu.load_book_data(self.data["gdf"])
+
+        book_stages = [stage for stage in stages if stage in BOOK_STAGES]
+
+        # Im Entwurfsmodus erstellt die Kartenstufe das Titelbild bereits mit (build_maps_and_tex)
+        if "title" in stages and not (self.draft and "maps" in book_stages):
+            config = generate_kfz_maps_neu.load_config()
+            if self.home_code:
+                config["home"] = str(self.home_code).strip()
+            if self.draft:
+                config["draft"] = True
+            generate_kfz_maps_neu.create_book_title_image(self.data["gdf"], config)
+
+        if book_stages:
+            return generate_kfz_maps_neu.main(home_code=self.home_code, output_suffix=self.output_suffix,
+                                              stages=book_stages, draft=self.draft, data=self.data)
+        return True
+
+
+def watch(session, interval=1.0):
+    """
+    Baut einmal alle Stufen und danach bei jeder Änderung einer Eingabe die betroffenen Stufen neu.
+    Fehler beim Neuladen oder Bauen beenden den Watch-Modus nicht.
+    """
+    paths = watched_inputs()
+    print(f"Beobachte {len(paths)} Eingaben, Stufen: {', '.join(session.stages)}")
+    state = snapshot(paths)
+    session.rebuild(session.stages)
+
+    while True:
+        time.sleep(interval)
+        new_state = snapshot(paths)
+        changed = [path for path in paths if new_state[path] != state[path]]
+        if not changed:
+            continue
+
+        # Warten, bis die Dateien fertig geschrieben sind (Editoren speichern oft in mehreren Schritten)
+        while True:
+            time.sleep(interval / 2)
+            settled = snapshot(paths)
+            if settled == new_state:
+                break
+            changed = sorted(set(changed) | {path for path in paths if settled[path] != new_state[path]})
+            new_state = settled
+        state = new_state
+
+        stages = affected_stages(changed, session.stages)
+        print(f"\nGeändert: {', '.join(changed)}")
+        if not stages:
+            print("Keine betroffenen Stufen")
+            continue
+        print(f"Baue neu: {', '.join(stages)}")
+        start = time.perf_counter()
+        try:
+            reloaded = reload_modules(changed)
+            if reloaded:
+                print(f"Neu geladene Module: {', '.join(reloaded)}")
+            ok = session.rebuild(stages, changed)
+            print(f"{'Fertig' if ok else 'Fehlgeschlagen'} nach {time.perf_counter() - start:.1f} s, warte auf Änderungen...")
+        except Exception:
+            traceback.print_exc()
+            print("Fehler beim Neubau, warte auf Änderungen...")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Baut ein Buch bei jeder Änderung der Eingaben inkrementell neu")
+    parser.add_argument("--home", type=str, help="Das Kennzeichen, das als Home markiert werden soll")
+    parser.add_argument("--suffix", type=str, default="", help="Ein Suffix für die Ausgabedateien")
+    parser.add_argument("--stages", type=str, default=",".join(STAGES),
+                        help="Kommagetrennte Liste der Stufen, die neu gebaut werden dürfen (title, maps, tex, pdf, final)")
+    parser.add_argument("--draft", action="store_true", help="Entwurfsmodus (siehe generate_kfz_maps_neu.py --draft)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Abstand der Prüfungen in Sekunden")
+
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown_stages = [stage for stage in stages if stage not in STAGES]
+    if unknown_stages:
+        print(f"Fehler: Unbekannte Stufen: {', '.join(unknown_stages)}")
+        sys.exit(1)
+
+    try:
+        watch(WatchSession(args.home, args.suffix, args.draft, stages), args.interval)
+    except KeyboardInterrupt:
+        print("\nWatch-Modus beendet")